@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark startup: json.load of the concepts file versus the mmap-loaded
+compiled concept cache.
+
+Usage: python3 benchmarks/bench_concept_cache.py [--concepts 50000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concept_graph import synthetic_graph  # noqa: E402
+from concept_cache import cache_path, compile_concepts, load_compiled  # noqa: E402
+from concept_graph import ConceptGraph  # noqa: E402
+
+
+def write_document(path, count):
+    """A concepts file shaped like music-theory-concepts.json, with long text fields."""
+    concepts, relationships = synthetic_graph(count)
+    for n, concept in enumerate(concepts):
+        concept.update({
+            'name': f"Concept {n}",
+            'description': f"Description of concept {n}. " * 40,
+            'atomicity': 'atomic',
+            'related_concepts': concept['prerequisites'][:2],
+            'learning_objectives': [f"Objective {k} for concept {n}" for k in range(3)],
+            'examples': [f"Example {k} of concept {n}" for k in range(2)],
+            'tags': [f"tag-{n % 50}", f"tag-{n % 7}"],
+        })
+    for relationship in relationships:
+        relationship['type'] = 'requires'
+    with open(path, 'w') as f:
+        json.dump({'domain': 'benchmark', 'concepts': concepts, 'relationships': relationships}, f)
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"  {label:<34} {time.perf_counter() - start:8.3f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concepts', type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'concepts.json')
+        write_document(source, args.concepts)
+        print(f"{args.concepts:,} concepts, {os.path.getsize(source) / 2**20:.1f} MiB of JSON")
+
+        def json_graph():
+            with open(source) as f:
+                return ConceptGraph.from_data(json.load(f))
+
+        def json_names():
+            with open(source) as f:
+                return [(c['id'], c['name']) for c in json.load(f)['concepts']]
+
+        timed('json.load + ConceptGraph', json_graph)
+        timed('json.load, ids and names', json_names)
+        timed('compile cache (once per edit)', lambda: compile_concepts(source))
+        print(f"  cache size: {os.path.getsize(cache_path(source)) / 2**20:.1f} MiB")
+        timed('cached ConceptGraph', lambda: ConceptGraph.load(source))
+        timed('cached ids and names', lambda: load_compiled(source).select('id', 'name'))
+        timed('cached single concept lookup', lambda: load_compiled(source)[f"concept-{args.concepts // 2}"])
+        timed('cached full document', lambda: load_compiled(source).to_data())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark the player's concept list on large synthetic catalogs: runs the
+list functions of index.html under node against a minimal stand-in for
+the DOM, and compares them with the renderer they replaced, which built
+every row up front.
+
+Only the script side is measured: the time to build the list's HTML and
+its size, which is what the browser then parses and lays out. A browser
+spends far more on those steps than the script does, roughly in
+proportion to the HTML size.
+
+Usage: python3 benchmarks/bench_concept_list.py [--concepts 10000 100000]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The renderer before the list was virtualized: one DOM row per concept
+FULL_RENDER = r"""
+function renderAllConcepts(concepts) {
+    const grouped = {};
+    concepts.forEach(concept => {
+        const diff = concept.difficulty || 1;
+        if (!grouped[diff]) grouped[diff] = [];
+        grouped[diff].push(concept);
+    });
+    let html = '';
+    Object.keys(grouped).sort((a, b) => a - b).forEach(difficulty => {
+        html += `<div class="difficulty-group">
+            <div class="difficulty-header">Level ${difficulty}</div>`;
+        grouped[difficulty].forEach(concept => {
+            const completedClass = completedConcepts.has(concept.id) ? 'completed' : '';
+            const tags = concept.tags ? concept.tags.slice(0, 2).join(', ') : '';
+            html += `<div class="concept-item ${completedClass}" data-concept-id="${concept.id}">
+                <div class="concept-name">${concept.name}</div>
+                ${tags ? `<div class="concept-tags">${tags}</div>` : ''}
+            </div>`;
+        });
+        html += '</div>';
+    });
+    return html;
+}
+"""
+
+NODE_HARNESS = r"""
+const fs = require('fs');
+const spacer = {innerHTML: ''};
+const conceptsList = {
+    scrollTop: 0,
+    clientHeight: 800,
+    html: '',
+    set innerHTML(html) { this.html = html; spacer.innerHTML = ''; },
+    get innerHTML() { return this.html; },
+    get firstElementChild() { return this.html.startsWith('<div class="concepts-window"') ? spacer : null; },
+};
+global.document = {getElementById: () => conceptsList};
+const completedConcepts = new Set();
+const rows = html => (html.match(/class="(concept-item|difficulty-header)/g) || []).length;
+
+const concepts = JSON.parse(fs.readFileSync(process.argv[2]));
+concepts.forEach((concept, n) => { if (n % 3 === 0) completedConcepts.add(concept.id); });
+
+function time(rounds, fn) {
+    fn();
+    const start = performance.now();
+    for (let i = 0; i < rounds; i++) fn();
+    return (performance.now() - start) / rounds;
+}
+
+let html = '';
+const full = time(5, () => { html = renderAllConcepts(concepts); });
+console.log(JSON.stringify({name: 'full', ms: full, rows: rows(html), bytes: html.length}));
+
+const initial = time(5, () => renderConcepts(concepts));
+console.log(JSON.stringify({name: 'window', ms: initial, rows: rows(spacer.innerHTML), bytes: spacer.innerHTML.length}));
+
+// Jump around the list, as when dragging the scrollbar
+const height = rowOffsets[conceptRows.length];
+const positions = Array.from({length: 200}, (_, i) => Math.floor(height * i / 200));
+let k = 0;
+const scroll = time(200, () => {
+    conceptsList.scrollTop = positions[k++ % positions.length];
+    renderConceptWindow();
+    const top = rowAt(conceptsList.scrollTop);
+    if (top < renderedRange[0] || top >= renderedRange[1]) throw new Error(`row ${top} in view was not rendered`);
+});
+console.log(JSON.stringify({name: 'scroll', ms: scroll, rows: rows(spacer.innerHTML), bytes: spacer.innerHTML.length}));
+
+conceptsList.scrollTop = 0;
+renderConcepts(concepts);
+const arrow = time(1000, () => {
+    moveConceptFocus(1);
+    if (!spacer.innerHTML.includes(`focused" data-concept-id="${conceptRows[focusedRow].concept.id}"`)) {
+        throw new Error(`focused row ${focusedRow} was not rendered`);
+    }
+});
+console.log(JSON.stringify({name: 'arrow', ms: arrow, rows: rows(spacer.innerHTML), bytes: spacer.innerHTML.length}));
+"""
+
+
+def synthetic_concepts(count):
+    with open(os.path.join(REPO_DIR, 'music-theory-concepts.json')) as f:
+        data = json.load(f)
+    names = [concept['name'] for concept in data['concepts']]
+    tags = sorted({tag for concept in data['concepts'] for tag in concept['tags']})
+    rng = random.Random(1)
+    return [{'id': f"concept-{n}", 'name': f"{rng.choice(names)} {n}", 'difficulty': rng.randint(1, 5),
+             'prerequisites': [], 'tags': rng.sample(tags, 2)} for n in range(count)]
+
+
+def player_list_source():
+    """The concept list functions of index.html."""
+    with open(os.path.join(REPO_DIR, 'index.html')) as f:
+        html = f.read()
+    start = html.index('// Concept list.')
+    end = html.index('// The full record of a concept')
+    return html[start:end]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concepts', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    if not shutil.which('node'):
+        sys.exit("node not found")
+    with tempfile.TemporaryDirectory() as tmp:
+        script = os.path.join(tmp, 'list.js')
+        with open(script, 'w') as f:
+            f.write(player_list_source() + FULL_RENDER + NODE_HARNESS)
+        for count in args.concepts:
+            path = os.path.join(tmp, 'concepts.json')
+            with open(path, 'w') as f:
+                json.dump(synthetic_concepts(count), f)
+            output = subprocess.run(['node', script, path], capture_output=True, text=True, check=True).stdout
+            results = {result['name']: result for result in map(json.loads, output.splitlines())}
+            print(f"\n{count:,} concepts:")
+            for name, label in (('full', 'Every row up front'), ('window', 'Virtualized, first render'),
+                                ('scroll', 'Virtualized, per scroll'), ('arrow', 'Virtualized, per arrow key')):
+                result = results[name]
+                print(f"  {label:<28} {result['ms']:8.2f} ms  {result['rows']:>7,} rows  "
+                      f"{result['bytes'] / 1024:9,.1f} KiB of HTML")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark the memory held by the concepts as plain dicts (json.load)
+versus slotted Concept and Relationship records with interned tags.
+
+Usage: python3 benchmarks/bench_concept_record.py [--concepts 100000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concept_cache import write_document  # noqa: E402
+from concept_record import Concept, Relationship  # noqa: E402
+
+
+def retained(label, load):
+    """Report the memory still allocated once load() has returned its result."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<20} {current / 2**20:8.1f} MiB   {elapsed:6.2f} s (traced)")
+    return current, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concepts', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'concepts.json')
+        write_document(source, args.concepts)
+        print(f"{args.concepts:,} concepts, {os.path.getsize(source) / 2**20:.1f} MiB of JSON")
+
+        def as_dicts():
+            with open(source) as f:
+                data = json.load(f)
+            return data['concepts'], data['relationships']
+
+        def as_records():
+            with open(source) as f:
+                data = json.load(f)
+            return ([Concept.from_dict(c) for c in data.pop('concepts')],
+                    [Relationship.from_dict(r) for r in data.pop('relationships')])
+
+        dicts, _ = retained('dicts', as_dicts)
+        records, _ = retained('Concept records', as_records)
+        print(f"  records hold {records / dicts:.0%} of the memory of the dicts")
+
+if __name__ == '__main__':
+    main()
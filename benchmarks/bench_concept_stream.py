@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark loading a large corpus: json.load of the whole document versus
+streaming a JSON Lines file, comparing time to the first concept and peak
+memory.
+
+Usage: python3 benchmarks/bench_concept_stream.py [--concepts 50000] [--jobs 1]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concept_cache import write_document  # noqa: E402
+from concept_stream import iter_records, write_jsonl  # noqa: E402
+
+
+def measure(label, func):
+    """Run func() -> seconds to first concept, reporting total time and peak memory."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = func()
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<22} first concept {first:7.3f} s   total {total:7.3f} s   "
+          f"peak {peak / 2**20:7.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concepts', type=int, default=50_000)
+    parser.add_argument('--jobs', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'concepts.json')
+        lines = os.path.join(tmp, 'concepts.jsonl')
+        write_document(source, args.concepts)
+        with open(source) as f:
+            write_jsonl(json.load(f), lines)
+        print(f"{args.concepts:,} concepts, {os.path.getsize(lines) / 2**20:.1f} MiB of JSON Lines")
+
+        def whole_document():
+            start = time.perf_counter()
+            with open(source) as f:
+                concepts = json.load(f)['concepts']
+            first = time.perf_counter() - start
+            for concept in concepts:
+                concept['name']
+            return first
+
+        def streamed():
+            start = time.perf_counter()
+            first = None
+            for kind, record, _, _ in iter_records(lines, args.jobs):
+                if first is None and kind == 'concept':
+                    first = time.perf_counter() - start
+                record.get('name')
+            return first
+
+        measure('json.load', whole_document)
+        measure(f'JSON Lines (jobs={args.jobs})', streamed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark imsmanifest.xml generation: ElementTree + minidom pretty-printing
+versus the streaming ManifestWriter.
+
+Usage: python3 benchmarks/bench_manifest.py [--resources 100000]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from xml.dom import minidom
+from xml.etree.ElementTree import Element, SubElement, tostring
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xml_writer import IMSCC_NAMESPACES, ManifestWriter  # noqa: E402
+
+
+def synthetic_sections(resources):
+    """Yield (section_id, title, pages) with two pages per section."""
+    for n in range(resources // 2):
+        pages = [
+            (f"i{n}l", f"r{n}l", f"Lesson: Concept {n}", f"wiki_content/concept-{n}.html"),
+            (f"i{n}v", f"r{n}v", f"Video: Concept {n}", f"wiki_content/concept-{n}-video.html"),
+        ]
+        yield f"s{n}", f"Concept {n}", pages
+
+
+def minidom_manifest(resources, out):
+    """The original approach: full tree, tostring, re-parse, toprettyxml."""
+    manifest = Element('manifest')
+    manifest.set('identifier', 'manifest')
+    for name, uri in IMSCC_NAMESPACES.items():
+        manifest.set(name, uri)
+    organizations = SubElement(manifest, 'organizations')
+    org = SubElement(organizations, 'organization')
+    org.set('identifier', 'org_1')
+    resources_elem = SubElement(manifest, 'resources')
+
+    for section_id, title, pages in synthetic_sections(resources):
+        section = SubElement(org, 'item')
+        section.set('identifier', section_id)
+        SubElement(section, 'title').text = title
+        for item_id, resource_id, page_title, href in pages:
+            page = SubElement(section, 'item')
+            page.set('identifier', item_id)
+            page.set('identifierref', resource_id)
+            SubElement(page, 'title').text = page_title
+
+            resource = SubElement(resources_elem, 'resource')
+            resource.set('identifier', resource_id)
+            resource.set('type', 'webcontent')
+            SubElement(resource, 'file').set('href', href)
+
+    out.write(minidom.parseString(tostring(manifest)).toprettyxml(indent="  "))
+
+
+def streaming_manifest(resources, out):
+    manifest = ManifestWriter(out, 'manifest', 'Benchmark Course')
+    for section_id, title, pages in synthetic_sections(resources):
+        manifest.add_section(section_id, title, pages)
+    manifest.close()
+
+
+def measure(label, build, resources):
+    """Time one run, then trace a second run for peak memory (tracing slows it down)."""
+    with open(os.devnull, 'w') as out:
+        start = time.perf_counter()
+        build(resources, out)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        build(resources, out)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"  {label:<20} {elapsed:8.2f} s   peak {peak / 2**20:8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--resources', type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"Manifest generation for {args.resources:,} resources")
+    measure('minidom', minidom_manifest, args.resources)
+    measure('ManifestWriter', streaming_manifest, args.resources)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the player's search on a large synthetic catalog: builds the
+inverted index for N concepts, then times searches in Python and, when
+node is installed, with the search functions of index.html itself.
+
+Usage: python3 benchmarks/bench_search_index.py [--concepts 50000]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from concept_record import Concept  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+
+QUERIES = ['s', 'ch', 'interval', 'maj tri', 'scale degree', 'rhythm note value', 'zzz']
+
+NODE_HARNESS = """
+const fs = require('fs');
+global.fetch = async path => ({ok: true, json: async () => JSON.parse(fs.readFileSync(path))});
+(async () => {
+    let start = performance.now();
+    await loadSearchIndex();
+    console.log(JSON.stringify({load: performance.now() - start}));
+    for (const query of JSON.parse(process.argv[2])) {
+        searchConcepts(query);
+        start = performance.now();
+        const rounds = 20;
+        let matches;
+        for (let i = 0; i < rounds; i++) matches = searchConcepts(query);
+        console.log(JSON.stringify({query, ms: (performance.now() - start) / rounds, top: matches.slice(0, 10)}));
+    }
+})();
+"""
+
+
+def synthetic_concepts(count):
+    """Concepts with names and descriptions drawn from the real vocabulary."""
+    with open(os.path.join(REPO_DIR, 'music-theory-concepts.json')) as f:
+        data = json.load(f)
+    words = sorted({word for concept in data['concepts']
+                    for word in re.findall(r'[a-z]+', (concept['name'] + ' ' + concept['description']).lower())})
+    tags = sorted({tag for concept in data['concepts'] for tag in concept['tags']})
+    rng = random.Random(1)
+    for n in range(count):
+        yield Concept(f"concept-{n}", ' '.join(rng.choices(words, k=rng.randint(1, 3))).title(),
+                      description=' '.join(rng.choices(words, k=rng.randint(15, 40))),
+                      tags=rng.sample(tags, 2))
+
+
+def player_search_source():
+    """The search functions of index.html."""
+    with open(os.path.join(REPO_DIR, 'index.html')) as f:
+        html = f.read()
+    start = html.index('// Load the inverted search index')
+    end = html.index('// Load the facet bitmaps')
+    return 'let searchIndex = null;\n' + html[start:end]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concepts', type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index = SearchIndex.from_concepts(synthetic_concepts(args.concepts))
+        path = os.path.join(tmp, 'player_data', 'search.json')
+        index.save(path)
+        print(f"{args.concepts:,} concepts: {len(index.terms):,} terms, "
+              f"{sum(len(p) for p in index.postings):,} postings, "
+              f"{os.path.getsize(path) / 2**20:.1f} MiB, built in {time.perf_counter() - start:.1f} s")
+
+        print("\nPython (search_index.py):")
+        expected = {}
+        for query in QUERIES:
+            start = time.perf_counter()
+            expected[query] = index.search(query)
+            print(f"  {query!r:<22} {(time.perf_counter() - start) * 1000:8.2f} ms  {len(expected[query]):>6} matches")
+
+        if not shutil.which('node'):
+            print("\nnode not found; skipping the player measurement")
+            return
+        script = os.path.join(tmp, 'search.js')
+        with open(script, 'w') as f:
+            f.write(player_search_source() + NODE_HARNESS)
+        output = subprocess.run(['node', script, json.dumps(QUERIES)], cwd=tmp,
+                                capture_output=True, text=True, check=True).stdout
+        results = [json.loads(line) for line in output.splitlines()]
+        print(f"\nPlayer (index.html under node), index loaded in {results[0]['load']:.0f} ms:")
+        for result in results[1:]:
+            same = result['top'] == expected[result['query']][:10]
+            print(f"  {result['query']!r:<22} {result['ms']:8.2f} ms  "
+                  f"{'same' if same else 'DIFFERENT'} top 10 as Python")
+
+
+if __name__ == '__main__':
+    main()
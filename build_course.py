@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Single-pass build pipeline for the Canvas music theory course.
+
+Renders the lesson, video and visualization pages and the manifest in one
+pass and writes the .imscc package exactly once, replacing the sequence
+generate_canvas_course.py -> generate_unique_visualizations.py ->
+update_imscc.py.
+"""
+
+import argparse
+
+import generate_canvas_course as course
+from generate_unique_visualizations import generate_visualization
+
+
+def create_visualization_page(concept_id):
+    """Create the interactive visualization page for a concept."""
+    return generate_visualization(course.concepts[concept_id])
+
+
+# Three items per concept: lesson, video and visualization
+PIPELINE_PAGE_TYPES = course.PAGE_TYPES + [
+    ('visualization', 'Visualization', '{}-visualization.html', create_visualization_page),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the complete course package (lessons, videos and visualizations) in one pass")
+    course.add_build_arguments(parser)
+    parser.add_argument('--no-tree', action='store_true',
+                        help="Do not write the unpacked course to --output-dir")
+    args = parser.parse_args()
+
+    # The pipeline always streams entries into the package as they are produced
+    args.stream = True
+    course.run_build(args, PIPELINE_PAGE_TYPES)
+
+
+if __name__ == '__main__':
+    main()
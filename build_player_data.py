@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Build the data files the player (index.html) loads from player_data/.
+
+    player_data/facets.json     tag, difficulty and atomicity bitmaps (facet_index.py)
+    player_data/search.json     inverted index for the search box (search_index.py)
+    player_data/summary.json    id, name, difficulty, prerequisites, tags and detail
+                                shard of every concept: all the player needs to start
+    player_data/details/*.json  the other fields, SHARD_SIZE concepts per file in
+                                learning order, fetched when a concept is opened
+    player_data/next.json       the concepts a student most likely opens after each
+                                one, which the player prefetches
+    player_data/manifest.json   the sha256 of the concepts file they were built from
+
+The files are only rebuilt when the concepts file changes. The course
+build keeps them current; run this script after editing the concepts by
+hand. Built from any other source (a database, a JSON Lines file), they
+go to <filename>.player_data/ next to it instead.
+
+Usage:
+    python3 build_player_data.py [--concepts FILE] [--output-dir DIR]
+    python3 build_player_data.py --facets "rhythm AND difficulty<=2 AND NOT advanced"
+    python3 build_player_data.py --search "major tri"
+"""
+
+import argparse
+import json
+import os
+
+from concept_graph import CONCEPTS_FILE, ConceptGraph
+from facet_index import FacetIndex, FacetQueryError
+from prerequisite_closure import file_sha256
+from search_index import SearchIndex
+
+PLAYER_DATA_DIR = 'player_data'
+PLAYER_DATA_VERSION = 1
+MANIFEST = 'manifest.json'
+FACETS = 'facets.json'
+SEARCH = 'search.json'
+SUMMARY = 'summary.json'
+DETAILS_DIR = 'details'
+NEXT = 'next.json'
+FILES = [FACETS, SEARCH, SUMMARY, NEXT]
+
+SHARD_SIZE = 64
+NEXT_LIMIT = 4
+SUMMARY_FIELDS = ('id', 'name', 'difficulty', 'prerequisites', 'tags')
+
+
+def player_data_dir(concepts_file):
+    """player_data/ next to the concepts file the player loads; for any other
+    source, <filename>.player_data/ next to it, so a build from a database or
+    JSON Lines file never overwrites the data the player ships with."""
+    path = os.path.abspath(concepts_file)
+    if os.path.basename(path) == os.path.basename(CONCEPTS_FILE):
+        return os.path.join(os.path.dirname(path), PLAYER_DATA_DIR)
+    return f"{path}.{PLAYER_DATA_DIR}"
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get('version') == PLAYER_DATA_VERSION else {}
+
+
+def write_json(path, data):
+    """Atomically write compact JSON."""
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def write_concept_data(graph, output_dir, shard_size=SHARD_SIZE):
+    """Write summary.json and the detail shards; returns the names of the shards."""
+    concepts = {concept_id: graph.concepts[concept_id].to_dict() for concept_id in graph.ids}
+
+    # Shards follow the learning order, so the concepts a student opens
+    # one after another mostly come from the same file
+    order = graph.topological_order()
+    shards = [{} for _ in range(0, len(order), shard_size)]
+    shard_of = {}
+    for k, concept_id in enumerate(order):
+        shard_of[concept_id] = k // shard_size
+        shards[k // shard_size][concept_id] = {field: value for field, value in concepts[concept_id].items()
+                                               if field not in SUMMARY_FIELDS}
+
+    os.makedirs(os.path.join(output_dir, DETAILS_DIR), exist_ok=True)
+    names = []
+    for k, shard in enumerate(shards):
+        names.append(f"{DETAILS_DIR}/{k:04d}.json")
+        write_json(os.path.join(output_dir, names[-1]), {'concepts': shard})
+    for name in sorted(os.listdir(os.path.join(output_dir, DETAILS_DIR))):
+        if f"{DETAILS_DIR}/{name}" not in names:
+            os.remove(os.path.join(output_dir, DETAILS_DIR, name))
+
+    summary = []
+    for concept_id, concept in concepts.items():
+        entry = {field: concept[field] for field in SUMMARY_FIELDS if field in concept}
+        entry['shard'] = shard_of[concept_id]
+        summary.append(entry)
+    write_json(os.path.join(output_dir, SUMMARY), {
+        'version': PLAYER_DATA_VERSION,
+        'shards': names,
+        'concepts': summary,
+    })
+    return names
+
+
+def next_concepts(graph, limit=NEXT_LIMIT):
+    """For every concept, in file order, the numbers of up to limit concepts
+    a student most likely opens after it.
+
+    Those are its direct dependents, the ones with the fewest other
+    prerequisites first (finishing this concept is what unlocks them),
+    then the easiest, then the earliest in learning order. The concept
+    after it in learning order fills in when it has fewer dependents.
+    """
+    order = [graph.index[concept_id] for concept_id in graph.topological_order()]
+    position = [0] * len(order)
+    for k, n in enumerate(order):
+        position[n] = k
+
+    def key(v):
+        return graph.pred_offsets[v + 1] - graph.pred_offsets[v], graph.difficulty[v], position[v]
+
+    ranked = []
+    for n in range(len(graph)):
+        candidates = sorted(graph.successors(n), key=key)[:limit]
+        k = position[n] + 1
+        if len(candidates) < limit and k < len(order) and order[k] not in candidates:
+            candidates.append(order[k])
+        ranked.append(candidates)
+    return ranked
+
+
+def build_player_data(concepts_file=CONCEPTS_FILE, output_dir=None):
+    """Rebuild the player data when it is missing or stale; returns the paths written."""
+    output_dir = output_dir or player_data_dir(concepts_file)
+    digest = file_sha256(concepts_file)
+    manifest = load_manifest(output_dir)
+    files = manifest.get('files', [])
+    if (manifest.get('source_sha256') == digest and set(FILES) <= set(files)
+            and all(os.path.exists(os.path.join(output_dir, name)) for name in files)):
+        return []
+
+    graph = ConceptGraph.load(concepts_file)
+    concepts = [graph.concepts[concept_id] for concept_id in graph.ids]
+    os.makedirs(output_dir, exist_ok=True)
+
+    FacetIndex.from_concepts(concepts).save(os.path.join(output_dir, FACETS))
+    SearchIndex.from_concepts(concepts).save(os.path.join(output_dir, SEARCH))
+    files = FILES + write_concept_data(graph, output_dir)
+    write_json(os.path.join(output_dir, NEXT), {
+        'version': PLAYER_DATA_VERSION,
+        'numbering': 'concept numbers are positions in summary.json',
+        'next': next_concepts(graph),
+    })
+
+    # Written last, so an interrupted build is redone next time
+    path = os.path.join(output_dir, MANIFEST)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump({'version': PLAYER_DATA_VERSION, 'source_sha256': digest, 'files': files}, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return [os.path.join(output_dir, name) for name in files + [MANIFEST]]
+
+
+def load_facet_index(concepts_file=CONCEPTS_FILE, output_dir=None):
+    """The facet index for concepts_file, rebuilding the player data first if it is stale."""
+    build_player_data(concepts_file, output_dir)
+    return FacetIndex.load(os.path.join(output_dir or player_data_dir(concepts_file), FACETS))
+
+
+def load_search_index(concepts_file=CONCEPTS_FILE, output_dir=None):
+    """The search index for concepts_file, rebuilding the player data first if it is stale."""
+    build_player_data(concepts_file, output_dir)
+    return SearchIndex.load(os.path.join(output_dir or player_data_dir(concepts_file), SEARCH))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the player data files in player_data/")
+    parser.add_argument('--concepts', default=CONCEPTS_FILE,
+                        help="Concepts JSON file, JSON Lines file or concept database")
+    parser.add_argument('--output-dir', help="Directory to write to (default: player_data/ next to "
+                             "music-theory-concepts.json, else <concepts file>.player_data/)")
+    parser.add_argument('--facets', metavar='QUERY',
+                        help="Print the concepts matching a facet query, e.g. \"rhythm AND difficulty<=2\"")
+    parser.add_argument('--search', metavar='TEXT', help="Print the best search matches for TEXT")
+    args = parser.parse_args()
+
+    written = build_player_data(args.concepts, args.output_dir)
+    for path in written:
+        print(f"Wrote {path} ({os.path.getsize(path):,} bytes)")
+    if not written:
+        print(f"Up to date: {args.output_dir or player_data_dir(args.concepts)}")
+
+    if args.facets:
+        index = load_facet_index(args.concepts, args.output_dir)
+        try:
+            matches = index.select(args.facets)
+        except FacetQueryError as e:
+            parser.error(str(e))
+        print(f"\n{args.facets}: {len(matches)} concepts")
+        for concept_id in matches:
+            print(f"  - {concept_id}")
+
+    if args.search:
+        matches = load_search_index(args.concepts, args.output_dir).search(args.search)
+        print(f"\n{args.search}: {len(matches)} concepts")
+        for concept_id in matches[:20]:
+            print(f"  - {concept_id}")
+
+
+if __name__ == '__main__':
+    main()
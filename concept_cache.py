@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Compiled binary cache of a concepts JSON file, loaded with mmap.
+
+json.load has to parse the whole document before anything can be used.
+The compiled form stores every string once in a string table (interned,
+UTF-8, with an offset table), concept fields as fixed-width columns of
+string numbers, and the list fields and relationships as CSR arrays. It
+is memory-mapped, and strings are only decoded when they are read, so
+building the graph or listing names never touches the descriptions.
+
+Concept ids are interned first, so string number n < len(concepts) is
+also concept number n: a prerequisite or relationship endpoint below the
+concept count is an integer concept id, anything else names an unknown
+concept.
+
+The cache is written next to the source (music-theory-concepts.json ->
+music-theory-concepts.graph.bin) and recompiled when the source's size,
+mtime and sha256 no longer match the ones recorded in its header.
+
+Usage: python3 concept_cache.py [--concepts FILE]
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Mapping
+
+from concept_record import Concept, difficulty_value
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CONCEPTS_FILE = os.path.join(REPO_DIR, 'music-theory-concepts.json')
+
+MAGIC = b'CONCEPTG'
+CACHE_VERSION = 1
+# magic, version, little-endian flag, source size, source mtime_ns,
+# source sha256, concept count, string count, relationship count
+HEADER = struct.Struct('<8sIIQQ32sIII')
+NONE = 0xFFFFFFFF
+
+# Concept fields in the order they are restored; anything else is kept as
+# a JSON string in the 'extra' column
+STRING_FIELDS = ('name', 'description', 'atomicity')
+LIST_FIELDS = ('prerequisites', 'related_concepts', 'learning_objectives', 'examples', 'tags')
+CONCEPT_FIELDS = ('id', 'name', 'description', 'atomicity', 'prerequisites', 'related_concepts',
+                  'difficulty', 'learning_objectives', 'examples', 'tags')
+RELATIONSHIP_FIELDS = ('from', 'to', 'type', 'strength')
+
+# Sections in file order: (name, array typecode or None for raw bytes)
+SECTIONS = (
+    [('string_offsets', 'Q'), ('strings', None), ('document', 'I'),
+     ('present', 'I'), ('difficulty', 'i'), ('extra', 'I')]
+    + [(field, 'I') for field in STRING_FIELDS]
+    + [(f"{field}{part}", 'I') for field in LIST_FIELDS for part in ('_offsets', '_values')]
+    + [(f"rel_{field}", 'I') for field in RELATIONSHIP_FIELDS]
+    + [('rel_extra', 'I')]
+)
+SECTION_TABLE = struct.Struct('<' + 'QQ' * len(SECTIONS))
+
+
+def cache_path(concepts_file):
+    """music-theory-concepts.json -> music-theory-concepts.graph.bin"""
+    return os.path.splitext(str(concepts_file))[0] + '.graph.bin'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+class StringTable:
+    """Interns strings and numbers them in first-seen order."""
+
+    def __init__(self):
+        self.numbers = {}
+        self.offsets = array('Q', [0])
+        self.blob = bytearray()
+
+    def add(self, text):
+        number = self.numbers.get(text)
+        if number is None:
+            number = self.numbers[text] = len(self.numbers)
+            self.blob += text.encode('utf-8')
+            self.offsets.append(len(self.blob))
+        return number
+
+
+def compile_document(data, out, source_size=0, source_mtime_ns=0, source_sha256=b'\0' * 32):
+    """Write the compiled form of a parsed concepts document to a binary file."""
+    concepts = data['concepts']
+    relationships = data.get('relationships', [])
+    strings = StringTable()
+
+    # Concept ids first, so their string numbers are their concept numbers
+    for concept in concepts:
+        if strings.add(concept['id']) != len(strings.numbers) - 1:
+            raise ValueError(f"duplicate concept id: {concept['id']}")
+
+    columns = {name: array(code or 'B') for name, code in SECTIONS}
+    columns['document'].append(strings.add(json.dumps(
+        {key: value for key, value in data.items() if key not in ('concepts', 'relationships')})))
+    for field in LIST_FIELDS:
+        columns[f"{field}_offsets"].append(0)
+
+    for concept in concepts:
+        present = 1
+        extra = {}
+        for bit, field in enumerate(CONCEPT_FIELDS):
+            if field == 'id' or field not in concept:
+                continue
+            value = concept[field]
+            if field == 'difficulty' and value is not None:
+                columns['difficulty'].append(difficulty_value(value, concept['id']))
+            elif field in STRING_FIELDS and isinstance(value, str):
+                columns[field].append(strings.add(value))
+            elif (field in LIST_FIELDS and isinstance(value, list)
+                  and all(isinstance(item, str) for item in value)):
+                columns[f"{field}_values"].extend(strings.add(item) for item in value)
+            else:
+                extra[field] = value
+                continue
+            present |= 1 << bit
+
+        for bit, field in enumerate(CONCEPT_FIELDS):
+            if not present >> bit & 1:
+                if field in STRING_FIELDS:
+                    columns[field].append(NONE)
+                elif field == 'difficulty':
+                    columns['difficulty'].append(0)
+            if field in LIST_FIELDS:
+                columns[f"{field}_offsets"].append(len(columns[f"{field}_values"]))
+
+        extra.update((key, value) for key, value in concept.items() if key not in CONCEPT_FIELDS)
+        columns['present'].append(present)
+        columns['extra'].append(strings.add(json.dumps(extra)) if extra else NONE)
+
+    for relationship in relationships:
+        extra = {}
+        for field in RELATIONSHIP_FIELDS:
+            value = relationship.get(field)
+            if isinstance(value, str):
+                columns[f"rel_{field}"].append(strings.add(value))
+            else:
+                columns[f"rel_{field}"].append(NONE)
+                if field in relationship:
+                    extra[field] = value
+        extra.update((key, value) for key, value in relationship.items() if key not in RELATIONSHIP_FIELDS)
+        columns['rel_extra'].append(strings.add(json.dumps(extra)) if extra else NONE)
+
+    columns['string_offsets'] = strings.offsets
+    columns['strings'] = strings.blob
+
+    # Lay the sections out after the header and section table, 8-byte aligned
+    table = []
+    position = HEADER.size + SECTION_TABLE.size
+    payloads = []
+    for name, _ in SECTIONS:
+        payload = columns[name] if name == 'strings' else columns[name].tobytes()
+        padding = -position % 8
+        position += padding
+        table += [position, len(payload)]
+        payloads.append((padding, payload))
+        position += len(payload)
+
+    out.write(HEADER.pack(MAGIC, CACHE_VERSION, sys.byteorder == 'little', source_size,
+                          source_mtime_ns, source_sha256, len(concepts),
+                          len(strings.numbers), len(relationships)))
+    out.write(SECTION_TABLE.pack(*table))
+    for padding, payload in payloads:
+        out.write(b'\0' * padding)
+        out.write(payload)
+
+
+def compile_concepts(concepts_file, target=None):
+    """Compile a concepts JSON file; returns the path of the cache written.
+
+    The cache goes to target (default: next to the source) and is written
+    atomically, so readers that still map the old cache are unaffected.
+    """
+    target = target or cache_path(concepts_file)
+    stat = os.stat(concepts_file)
+    with open(concepts_file, 'rb') as f:
+        raw = f.read()
+
+    directory = os.path.dirname(os.path.abspath(target))
+    fd, tmp = tempfile.mkstemp(prefix='.concepts-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            compile_document(json.loads(raw), out, stat.st_size, stat.st_mtime_ns,
+                             hashlib.sha256(raw).digest())
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return target
+
+
+def cache_is_current(concepts_file, target):
+    """True when the cache at target was compiled from concepts_file as it is now.
+
+    Size and mtime are checked first; when only the mtime differs (a fresh
+    checkout, a touch) the contents are hashed and, if they match, the new
+    mtime is recorded so the next check is cheap again.
+    """
+    try:
+        with open(target, 'rb') as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return False
+    if len(header) != HEADER.size:
+        return False
+    magic, version, little, size, mtime_ns, sha256, *_ = HEADER.unpack(header)
+    if magic != MAGIC or version != CACHE_VERSION or bool(little) != (sys.byteorder == 'little'):
+        return False
+
+    stat = os.stat(concepts_file)
+    if stat.st_size != size:
+        return False
+    if stat.st_mtime_ns == mtime_ns:
+        return True
+    if file_sha256(concepts_file) != sha256:
+        return False
+    try:
+        with open(target, 'r+b') as f:
+            f.write(HEADER.pack(magic, version, little, size, stat.st_mtime_ns, sha256,
+                                *HEADER.unpack(header)[6:]))
+    except OSError:
+        pass
+    return True
+
+
+def load_compiled(concepts_file=CONCEPTS_FILE):
+    """Return the CompiledConcepts for a concepts file, compiling it if needed.
+
+    When the cache cannot be written next to the source it is compiled
+    into the temporary directory instead.
+    """
+    target = cache_path(concepts_file)
+    if not cache_is_current(concepts_file, target):
+        try:
+            compile_concepts(concepts_file, target)
+        except OSError:
+            target = os.path.join(tempfile.gettempdir(), os.path.basename(target))
+            if not cache_is_current(concepts_file, target):
+                compile_concepts(concepts_file, target)
+    return CompiledConcepts(target)
+
+
+class CompiledConcepts(Mapping):
+    """Read-only mapping of concept id -> Concept record backed by a compiled cache.
+
+    Records and strings are decoded on first access and kept, so a string
+    shared by many concepts (a tag, a prerequisite id) is a single object.
+    Pickling reopens the cache by path, which lets worker processes share
+    it instead of receiving a copy of every concept.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self._mm)
+        if header[0] != MAGIC or header[1] != CACHE_VERSION:
+            raise ValueError(f"{path}: not a concept cache of version {CACHE_VERSION}")
+        self.concept_count, self.string_count, self.relationship_count = header[6:]
+
+        table = SECTION_TABLE.unpack_from(self._mm, HEADER.size)
+        view = self._view = memoryview(self._mm)
+        self._sections = {}
+        for n, (name, code) in enumerate(SECTIONS):
+            offset, length = table[2 * n], table[2 * n + 1]
+            section = view[offset:offset + length]
+            self._sections[name] = section.cast(code) if code else section
+
+        self._strings = [None] * self.string_count
+        self._records = {}
+        self._ids = None
+        self._index = None
+
+    def __reduce__(self):
+        return (CompiledConcepts, (self.path,))
+
+    def string(self, number):
+        """Decode string number `number` (cached)."""
+        text = self._strings[number]
+        if text is None:
+            offsets = self._sections['string_offsets']
+            text = str(self._sections['strings'][offsets[number]:offsets[number + 1]], 'utf-8')
+            self._strings[number] = text
+        return text
+
+    def _optional(self, number):
+        return None if number == NONE else self.string(number)
+
+    @property
+    def ids(self):
+        """Concept ids in file order."""
+        if self._ids is None:
+            self._ids = [self.string(n) for n in range(self.concept_count)]
+        return self._ids
+
+    def index(self, concept_id):
+        """Concept number of an id."""
+        if self._index is None:
+            self._index = {concept_id: n for n, concept_id in enumerate(self.ids)}
+        return self._index[concept_id]
+
+    def __len__(self):
+        return self.concept_count
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __contains__(self, concept_id):
+        try:
+            self.index(concept_id)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __getitem__(self, concept_id):
+        return self.record(self.index(concept_id))
+
+    def name(self, n):
+        return self._optional(self._sections['name'][n])
+
+    def difficulty(self, n):
+        return self._sections['difficulty'][n]
+
+    def list_numbers(self, field, n):
+        """String numbers of list field `field` of concept n, as a list.
+
+        A copy rather than a view of the cache, so holding on to it does
+        not keep close() from unmapping the file.
+        """
+        offsets = self._sections[f"{field}_offsets"]
+        return self._sections[f"{field}_values"][offsets[n]:offsets[n + 1]].tolist()
+
+    def concept(self, n):
+        """The dict for concept number n, as it appears in the source file."""
+        present = self._sections['present'][n]
+        concept = {}
+        for bit, field in enumerate(CONCEPT_FIELDS):
+            if not present >> bit & 1:
+                continue
+            if field == 'id':
+                concept[field] = self.string(n)
+            elif field == 'difficulty':
+                concept[field] = self._sections['difficulty'][n]
+            elif field in STRING_FIELDS:
+                concept[field] = self.string(self._sections[field][n])
+            else:
+                concept[field] = [self.string(number) for number in self.list_numbers(field, n)]
+        extra = self._sections['extra'][n]
+        if extra != NONE:
+            concept.update(json.loads(self.string(extra)))
+        return concept
+
+    def record(self, n):
+        """The Concept record for concept number n (cached)."""
+        record = self._records.get(n)
+        if record is None:
+            record = self._records[n] = Concept.from_dict(self.concept(n))
+        return record
+
+    def select(self, *fields):
+        """List of dicts holding only the given fields of every concept.
+
+        id, name and difficulty come straight from their columns without
+        decoding the rest of each concept.
+        """
+        columns = {'id': self.string, 'name': self.name, 'difficulty': self.difficulty}
+        if all(field in columns for field in fields):
+            return [{field: columns[field](n) for field in fields} for n in range(self.concept_count)]
+        concepts = (self.concept(n) for n in range(self.concept_count))
+        return [{field: concept[field] for field in fields if field in concept} for concept in concepts]
+
+    def relationship_numbers(self):
+        """(from, to, strength) string numbers of every relationship."""
+        return zip(self._sections['rel_from'], self._sections['rel_to'], self._sections['rel_strength'])
+
+    def relationships(self):
+        """The relationships array as it appears in the source file."""
+        result = []
+        for n in range(self.relationship_count):
+            relationship = {}
+            for field in RELATIONSHIP_FIELDS:
+                number = self._sections[f"rel_{field}"][n]
+                if number != NONE:
+                    relationship[field] = self.string(number)
+            extra = self._sections['rel_extra'][n]
+            if extra != NONE:
+                relationship.update(json.loads(self.string(extra)))
+            result.append(relationship)
+        return result
+
+    def document(self):
+        """Top-level fields of the source document other than concepts and relationships."""
+        return json.loads(self.string(self._sections['document'][0]))
+
+    def to_data(self):
+        """The whole source document, as json.load would return it."""
+        data = self.document()
+        data['concepts'] = [self.concept(n) for n in range(self.concept_count)]
+        data['relationships'] = self.relationships()
+        return data
+
+    def close(self):
+        """Unmap the cache. Records and strings already decoded stay usable;
+        iterators from relationship_numbers() do not."""
+        for section in self._sections.values():
+            section.release()
+        self._sections.clear()
+        self._view.release()
+        self._mm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the concepts JSON file into the binary cache")
+    parser.add_argument('--concepts', default=CONCEPTS_FILE, help="Concepts JSON file")
+    args = parser.parse_args()
+
+    target = cache_path(args.concepts)
+    if cache_is_current(args.concepts, target):
+        print(f"Up to date: {target}")
+    else:
+        compile_concepts(args.concepts, target)
+        print(f"Wrote {target}")
+    compiled = CompiledConcepts(target)
+    print(f"{len(compiled)} concepts, {compiled.string_count} distinct strings, "
+          f"{compiled.relationship_count} relationships, {os.path.getsize(target):,} bytes")
+
+
+if __name__ == '__main__':
+    main()
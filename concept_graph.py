@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Dependency graph over the concepts in music-theory-concepts.json.
+
+Concepts are numbered in file order and the graph is stored as integer
+adjacency arrays, so computing the module order, depth levels and cycle
+diagnostics takes time linear in the number of concepts and edges.
+
+Usage: python3 concept_graph.py [--concepts music-theory-concepts.json]
+"""
+
+import argparse
+import collections
+import os
+from array import array
+
+from concept_cache import NONE, load_compiled
+from concept_record import concept_record, relationship_record
+from concept_store import is_store_path, load_document
+from concept_stream import is_jsonl_path
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CONCEPTS_FILE = os.path.join(REPO_DIR, 'music-theory-concepts.json')
+
+
+class CycleError(ValueError):
+    """The dependencies contain at least one cycle; .cycles lists the concept ids on each."""
+
+    def __init__(self, cycles):
+        self.cycles = cycles
+        super().__init__("dependency cycles among: " + "; ".join(", ".join(c) for c in cycles))
+
+
+class ConceptGraph:
+    """Prerequisite graph: an edge u -> v means u must be learned before v.
+
+    Edges come from each concept's prerequisites and from every entry of
+    the relationships array ("from" depends on "to"). Duplicate edges are
+    merged; references to unknown concepts are kept in .missing as
+    (from_id, to_id, source) tuples instead of failing the load. Concepts
+    and relationships may be records (see concept_record.py) or dicts;
+    .concepts maps ids to Concept records.
+    """
+
+    def __init__(self, concepts, relationships=()):
+        self.ids = []
+        self.index = {}
+        self.concepts = {}
+        concepts = [concept_record(concept) for concept in concepts]
+        for concept in concepts:
+            concept_id = concept.id
+            if concept_id in self.index:
+                raise ValueError(f"duplicate concept id: {concept_id}")
+            self.index[concept_id] = len(self.ids)
+            self.ids.append(concept_id)
+            self.concepts[concept_id] = concept
+        self.difficulty = array('i', (concept.difficulty or 0 for concept in concepts))
+        self.missing = []
+
+        edges = set()
+
+        def add_edge(before, after, source):
+            if before in self.index and after in self.index:
+                edges.add((self.index[before], self.index[after]))
+            else:
+                self.missing.append((after, before, source))
+
+        for concept in concepts:
+            for prerequisite in concept.prerequisites:
+                add_edge(prerequisite, concept.id, 'prerequisites')
+        for relationship in map(relationship_record, relationships):
+            add_edge(relationship.to_id, relationship.from_id, 'relationships')
+        self._link(edges)
+
+    def _link(self, edges):
+        """Pack the (before, after) index pairs into the adjacency arrays."""
+        self.edge_count = len(edges)
+        self.succ_offsets, self.succ = self._csr(sorted(edges))
+        self.pred_offsets, self.pred = self._csr(sorted((v, u) for u, v in edges))
+        self._components = None
+        self._order = None
+
+    @classmethod
+    def from_data(cls, data):
+        """Build the graph from the parsed concepts JSON document."""
+        return cls(data['concepts'], data.get('relationships', []))
+
+    @classmethod
+    def from_compiled(cls, compiled, strengths=None):
+        """Build the graph straight from a CompiledConcepts cache.
+
+        Prerequisites and relationship endpoints are already concept
+        numbers there, so no concept is decoded. strengths optionally
+        limits the relationships used (e.g. {'mandatory'}).
+        """
+        graph = cls.__new__(cls)
+        size = len(compiled)
+        graph.ids = compiled.ids
+        graph.index = {concept_id: n for n, concept_id in enumerate(graph.ids)}
+        graph.concepts = compiled
+        graph.difficulty = array('i', (compiled.difficulty(n) for n in range(size)))
+        graph.missing = []
+
+        def name(number):
+            return None if number == NONE else compiled.string(number)
+
+        edges = set()
+        for n in range(size):
+            for prerequisite in compiled.list_numbers('prerequisites', n):
+                if prerequisite < size:
+                    edges.add((prerequisite, n))
+                else:
+                    graph.missing.append((graph.ids[n], name(prerequisite), 'prerequisites'))
+        for after, before, strength in compiled.relationship_numbers():
+            if strengths is not None and name(strength) not in strengths:
+                continue
+            if before < size and after < size:
+                edges.add((before, after))
+            else:
+                graph.missing.append((name(after), name(before), 'relationships'))
+        graph._link(edges)
+        return graph
+
+    @classmethod
+    def load(cls, filepath=CONCEPTS_FILE, strengths=None):
+        """Load the graph from a concepts JSON file, through its compiled
+        cache, from a JSON Lines file (see concept_stream.py) or from a
+        concept database (see concept_store.py)."""
+        if is_store_path(filepath) or is_jsonl_path(filepath):
+            data = load_document(filepath)
+            relationships = [r for r in data.get('relationships', [])
+                             if strengths is None or r.get('strength') in strengths]
+            return cls(data['concepts'], relationships)
+        return cls.from_compiled(load_compiled(filepath), strengths)
+
+    def _csr(self, pairs):
+        """Pack sorted (u, v) pairs into offsets and targets arrays."""
+        offsets = array('i', [0]) * (len(self.ids) + 1)
+        targets = array('i', (v for _, v in pairs))
+        for u, _ in pairs:
+            offsets[u + 1] += 1
+        for n in range(len(self.ids)):
+            offsets[n + 1] += offsets[n]
+        return offsets, targets
+
+    def __len__(self):
+        return len(self.ids)
+
+    def successors(self, n):
+        """Indices of the concepts that directly depend on concept n."""
+        return self.succ[self.succ_offsets[n]:self.succ_offsets[n + 1]]
+
+    def predecessors(self, n):
+        """Indices of the direct prerequisites of concept n."""
+        return self.pred[self.pred_offsets[n]:self.pred_offsets[n + 1]]
+
+    def components(self):
+        """Strongly connected component number of every concept.
+
+        Concepts that depend on each other, directly or through a chain,
+        share a component; every other concept has one of its own. Uses an
+        iterative Tarjan search, so it is linear and safe for deep graphs.
+        """
+        if self._components is not None:
+            return self._components
+
+        size = len(self.ids)
+        component = array('i', [-1]) * size
+        index = array('i', [-1]) * size
+        low = array('i', [0]) * size
+        on_stack = bytearray(size)
+        stack = []
+        counter = 0
+        count = 0
+        for root in range(size):
+            if index[root] != -1:
+                continue
+            work = [(root, 0)]
+            while work:
+                n, i = work.pop()
+                if i == 0:
+                    index[n] = low[n] = counter
+                    counter += 1
+                    stack.append(n)
+                    on_stack[n] = 1
+                start, end = self.succ_offsets[n], self.succ_offsets[n + 1]
+                while start + i < end:
+                    m = self.succ[start + i]
+                    i += 1
+                    if index[m] == -1:
+                        work.append((n, i))
+                        work.append((m, 0))
+                        break
+                    if on_stack[m]:
+                        low[n] = min(low[n], index[m])
+                else:
+                    if low[n] == index[n]:
+                        while True:
+                            m = stack.pop()
+                            on_stack[m] = 0
+                            component[m] = count
+                            if m == n:
+                                break
+                        count += 1
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[n])
+
+        self._components = component
+        return component
+
+    def cycles(self):
+        """Dependency cycles, as lists of the concept ids on each (in file order).
+
+        A concept that lists itself as a prerequisite is a cycle of one.
+        """
+        component = self.components()
+        members = collections.defaultdict(list)
+        for n in range(len(self.ids)):
+            members[component[n]].append(n)
+        return [[self.ids[n] for n in group] for group in members.values()
+                if len(group) > 1 or group[0] in self.successors(group[0])]
+
+    def _sort(self):
+        """Kahn's algorithm over the components, with a bucket queue keyed on difficulty.
+
+        Each cycle is condensed into one node, keyed on its easiest member.
+        Among the components whose prerequisites are all placed, the easiest
+        comes first, then the one that became ready first; the members of a
+        cycle are then emitted by difficulty, so they all come after
+        everything the cycle depends on. Returns the order and the depth of
+        every concept (shared by the members of a cycle).
+        """
+        if self._order is not None:
+            return self._order
+
+        size = len(self.ids)
+        component = self.components()
+        count = max(component) + 1 if size else 0
+        members = [[] for _ in range(count)]
+        for n in range(size):
+            members[component[n]].append(n)
+        for group in members:
+            group.sort(key=lambda n: self.difficulty[n])
+
+        in_degree = array('i', [0]) * count
+        for n in range(size):
+            for m in self.successors(n):
+                if component[m] != component[n]:
+                    in_degree[component[m]] += 1
+
+        level = array('i', [0]) * count
+        key = [self.difficulty[group[0]] for group in members]
+        levels = sorted(set(key))
+        bucket_of = {difficulty: b for b, difficulty in enumerate(levels)}
+        buckets = [collections.deque() for _ in levels]
+
+        lowest = len(buckets)
+        for c in range(count):
+            if in_degree[c] == 0:
+                b = bucket_of[key[c]]
+                buckets[b].append(c)
+                lowest = min(lowest, b)
+
+        order = array('i')
+        depth = array('i', [0]) * size
+        while lowest < len(buckets):
+            c = buckets[lowest].popleft()
+            for n in members[c]:
+                order.append(n)
+                depth[n] = level[c]
+                for m in self.successors(n):
+                    d = component[m]
+                    if d == c:
+                        continue
+                    level[d] = max(level[d], level[c] + 1)
+                    in_degree[d] -= 1
+                    if in_degree[d] == 0:
+                        b = bucket_of[key[d]]
+                        buckets[b].append(d)
+                        lowest = min(lowest, b)
+            while lowest < len(buckets) and not buckets[lowest]:
+                lowest += 1
+
+        self._order = (order, depth)
+        return self._order
+
+    def topological_order(self, strict=False):
+        """Concept ids in learning order: every concept after its prerequisites.
+
+        Every concept is included exactly once. Prerequisites that form a
+        cycle cannot all be honoured; with strict they raise CycleError
+        instead (see cycles() for diagnostics).
+        """
+        if strict:
+            cycles = self.cycles()
+            if cycles:
+                raise CycleError(cycles)
+        order, _ = self._sort()
+        return [self.ids[n] for n in order]
+
+    def depths(self):
+        """Map each concept id to its depth: 0 without prerequisites,
+        otherwise one more than its deepest prerequisite."""
+        order, depth = self._sort()
+        return {self.ids[n]: depth[n] for n in order}
+
+    def levels(self):
+        """Concept ids grouped by depth, each level in learning order."""
+        order, depth = self._sort()
+        levels = []
+        for n in order:
+            while depth[n] >= len(levels):
+                levels.append([])
+            levels[depth[n]].append(self.ids[n])
+        return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the learning order and dependency diagnostics")
+    parser.add_argument('--concepts', default=CONCEPTS_FILE, help="Concepts JSON file")
+    args = parser.parse_args()
+
+    graph = ConceptGraph.load(args.concepts)
+    print(f"{len(graph)} concepts, {graph.edge_count} dependencies")
+
+    for depth, level in enumerate(graph.levels()):
+        print(f"\nLevel {depth}:")
+        for concept_id in level:
+            print(f"  - {concept_id} (difficulty {graph.concepts[concept_id].difficulty})")
+
+    for after, before, source in graph.missing:
+        print(f"\nWarning: {after} depends on unknown concept {before} ({source})")
+    for cycle in graph.cycles():
+        print(f"\nWarning: dependency cycle among: {', '.join(cycle)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory records for concepts and relationships.
+
+A concept held as a dict costs a hash table, a list per list field and a
+fresh string for every tag it carries, so a large corpus that repeats
+"fundamental" or "notation" across thousands of concepts mostly pays for
+that overhead. Concept keeps its fields in __slots__, its list fields as
+tuples and its tags as small integer ids into the shared TAGS table;
+Relationship does the same for relationship types and strengths. Concept
+ids are interned, so a prerequisite id and the concept it names share one
+string.
+
+Records pickle as their plain dict form, so worker processes intern them
+into their own tables.
+"""
+
+import sys
+
+# Fields of a concepts-file entry, in the order they appear in the file
+CONCEPT_FIELDS = ('id', 'name', 'description', 'atomicity', 'prerequisites', 'related_concepts',
+                  'difficulty', 'learning_objectives', 'examples', 'tags')
+RELATIONSHIP_FIELDS = ('from', 'to', 'type', 'strength')
+
+
+class Interner:
+    """Two-way table between strings and small integer ids."""
+
+    __slots__ = ('strings', 'ids')
+
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getitem__(self, number):
+        return self.strings[number]
+
+    def intern(self, text):
+        """The id of text, adding it to the table on first use."""
+        number = self.ids.get(text)
+        if number is None:
+            number = self.ids[text] = len(self.strings)
+            self.strings.append(sys.intern(text))
+        return number
+
+
+TAGS = Interner()
+RELATIONSHIP_TYPES = Interner()
+STRENGTHS = Interner()
+
+
+def difficulty_value(value, concept_id=None):
+    """A concept's difficulty as an int (or None when it has none).
+
+    Whole numbers written as floats (3.0) are accepted; any other value
+    raises ValueError, so every concepts source orders a concept the same
+    way instead of each reading a different number.
+    """
+    if value is None or (type(value) is int):
+        return value
+    if type(value) is float and value.is_integer():
+        return int(value)
+    raise ValueError(f"concept {concept_id}: difficulty must be a whole number, not {value!r}")
+
+
+def _optional_id(table, text):
+    return None if text is None else table.intern(text)
+
+
+class Concept:
+    """One concept with its list fields as tuples and its tags as TAGS ids.
+
+    Fields missing from the source are None (difficulty, strings) or empty
+    tuples (lists); any field not listed in CONCEPT_FIELDS is kept in extra.
+    """
+
+    __slots__ = ('id', 'name', 'description', 'atomicity', 'prerequisites', 'related_concepts',
+                 'difficulty', 'learning_objectives', 'examples', 'tag_ids', 'extra')
+
+    def __init__(self, id, name=None, description=None, atomicity=None, prerequisites=(),
+                 related_concepts=(), difficulty=None, learning_objectives=(), examples=(),
+                 tags=(), extra=None):
+        self.id = sys.intern(id)
+        self.name = name
+        self.description = description
+        self.atomicity = None if atomicity is None else sys.intern(atomicity)
+        self.prerequisites = tuple(sys.intern(p) for p in prerequisites)
+        self.related_concepts = tuple(sys.intern(r) for r in related_concepts)
+        self.difficulty = difficulty
+        self.learning_objectives = tuple(learning_objectives)
+        self.examples = tuple(examples)
+        self.tag_ids = tuple(TAGS.intern(tag) for tag in tags)
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a concept dict as found in the concepts file."""
+        extra = {key: value for key, value in data.items() if key not in CONCEPT_FIELDS}
+        return cls(data['id'], data.get('name'), data.get('description'), data.get('atomicity'),
+                   data.get('prerequisites', ()), data.get('related_concepts', ()),
+                   difficulty_value(data.get('difficulty'), data['id']),
+                   data.get('learning_objectives', ()), data.get('examples', ()), data.get('tags', ()), extra)
+
+    @property
+    def tags(self):
+        return tuple(TAGS.strings[number] for number in self.tag_ids)
+
+    def skeleton(self):
+        """A record with only the fields other pages and the learning order read."""
+        return Concept(self.id, self.name, prerequisites=self.prerequisites,
+                       difficulty=self.difficulty)
+
+    def to_dict(self):
+        """The concept as a dict in file field order, as json.load returns it."""
+        data = {}
+        for field in CONCEPT_FIELDS:
+            value = self.tags if field == 'tags' else getattr(self, field)
+            if isinstance(value, tuple):
+                data[field] = list(value)
+            elif value is not None:
+                data[field] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __reduce__(self):
+        return (Concept.from_dict, (self.to_dict(),))
+
+    def __repr__(self):
+        return f"Concept({self.id!r}, name={self.name!r})"
+
+
+class Relationship:
+    """One entry of the relationships array: from_id depends on to_id."""
+
+    __slots__ = ('from_id', 'to_id', 'type_id', 'strength_id', 'extra')
+
+    def __init__(self, from_id, to_id, type=None, strength=None, extra=None):
+        self.from_id = sys.intern(from_id)
+        self.to_id = sys.intern(to_id)
+        self.type_id = _optional_id(RELATIONSHIP_TYPES, type)
+        self.strength_id = _optional_id(STRENGTHS, strength)
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data):
+        extra = {key: value for key, value in data.items() if key not in RELATIONSHIP_FIELDS}
+        return cls(data['from'], data['to'], data.get('type'), data.get('strength'), extra)
+
+    @property
+    def type(self):
+        return None if self.type_id is None else RELATIONSHIP_TYPES.strings[self.type_id]
+
+    @property
+    def strength(self):
+        return None if self.strength_id is None else STRENGTHS.strings[self.strength_id]
+
+    def to_dict(self):
+        data = {'from': self.from_id, 'to': self.to_id}
+        for field in ('type', 'strength'):
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __reduce__(self):
+        return (Relationship.from_dict, (self.to_dict(),))
+
+    def __repr__(self):
+        return f"Relationship({self.from_id!r} -> {self.to_id!r}, type={self.type!r})"
+
+
+def concept_record(concept):
+    """concept as a Concept, converting a concept dict."""
+    return concept if isinstance(concept, Concept) else Concept.from_dict(concept)
+
+
+def relationship_record(relationship):
+    """relationship as a Relationship, converting a relationship dict."""
+    if isinstance(relationship, Relationship):
+        return relationship
+    return Relationship.from_dict(relationship)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed store for the music theory concepts.
+
+The concepts JSON file can be imported into a SQLite database, edited
+there in transactional batches and exported back. Each concept is kept as
+its JSON object plus indexed columns and tables (difficulty, atomicity,
+tags, prerequisites, relationship endpoints and types) so that subsets can
+be selected with SQL instead of list comprehensions over the whole file.
+
+The generators accept a database (*.db, *.sqlite, *.sqlite3) wherever they
+accept the concepts JSON file, and --select picks the concepts to build
+with a query whose first column is a concept id.
+
+Usage:
+    python3 concept_store.py [--db FILE] [--concepts FILE] import
+    python3 concept_store.py [--db FILE] [--concepts FILE] export
+    python3 concept_store.py query "SELECT concept_id FROM concept_tags WHERE tag = 'harmony'"
+    python3 concept_store.py upsert edited-concepts.json
+    python3 concept_store.py delete CONCEPT_ID ...
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import sys
+
+from concept_record import difficulty_value
+from concept_stream import is_jsonl_path, load_jsonl
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CONCEPTS_FILE = os.path.join(REPO_DIR, 'music-theory-concepts.json')
+DATABASE_FILE = os.path.join(REPO_DIR, 'music-theory-concepts.db')
+STORE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+DEFAULT_BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS document (
+    key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS concepts (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT,
+    description TEXT,
+    atomicity TEXT,
+    difficulty INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS concept_tags (
+    concept_id TEXT NOT NULL REFERENCES concepts(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS concept_prerequisites (
+    concept_id TEXT NOT NULL REFERENCES concepts(id) ON DELETE CASCADE,
+    prerequisite_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS relationships (
+    position INTEGER PRIMARY KEY,
+    from_id TEXT,
+    to_id TEXT,
+    type TEXT,
+    strength TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS concepts_position ON concepts(position);
+CREATE INDEX IF NOT EXISTS concepts_difficulty ON concepts(difficulty);
+CREATE INDEX IF NOT EXISTS concepts_atomicity ON concepts(atomicity);
+CREATE INDEX IF NOT EXISTS concept_tags_tag ON concept_tags(tag, concept_id);
+CREATE INDEX IF NOT EXISTS concept_tags_concept ON concept_tags(concept_id);
+CREATE INDEX IF NOT EXISTS concept_prerequisites_concept ON concept_prerequisites(concept_id);
+CREATE INDEX IF NOT EXISTS concept_prerequisites_prerequisite ON concept_prerequisites(prerequisite_id);
+CREATE INDEX IF NOT EXISTS relationships_from ON relationships(from_id);
+CREATE INDEX IF NOT EXISTS relationships_to ON relationships(to_id);
+CREATE INDEX IF NOT EXISTS relationships_type ON relationships(type, strength);
+"""
+
+# Columns that select() reads without decoding each concept's JSON
+COLUMNS = ('id', 'name', 'description', 'atomicity', 'difficulty')
+
+
+def is_store_path(path):
+    """True when path names a concept database rather than a JSON file."""
+    return str(path).lower().endswith(STORE_EXTENSIONS)
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ConceptStore:
+    """A concept database; use as a context manager to close it afterwards.
+
+    Every write happens inside batch(), a single transaction: either all
+    of its edits are stored or, if anything fails, none of them are.
+    """
+
+    def __init__(self, path=DATABASE_FILE, batch_size=DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.db = sqlite3.connect(str(path), isolation_level=None)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Run the enclosed edits as one transaction."""
+        if self.db.in_transaction:
+            yield self
+            return
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    # Writing
+
+    def import_document(self, data):
+        """Replace the whole store with a parsed concepts document."""
+        with self.batch():
+            for table in ('concept_tags', 'concept_prerequisites', 'concepts', 'relationships', 'document'):
+                self.db.execute(f"DELETE FROM {table}")
+            self.db.executemany(
+                "INSERT INTO document (key, position, value) VALUES (?, ?, ?)",
+                [(key, n, json.dumps(value)) for n, (key, value) in enumerate(data.items())
+                 if key not in ('concepts', 'relationships')])
+            # Placeholders keep the position of the two arrays among the keys
+            for n, key in enumerate(data):
+                if key in ('concepts', 'relationships'):
+                    self.db.execute("INSERT INTO document (key, position, value) VALUES (?, ?, 'null')",
+                                    (key, n))
+            self.put_concepts(data['concepts'])
+            self.put_relationships(data.get('relationships', []))
+
+    def import_json(self, json_path):
+        with open(json_path, 'r') as f:
+            self.import_document(json.load(f))
+
+    def put_concepts(self, concepts):
+        """Insert or replace concepts, executed in batches of batch_size.
+
+        A replaced concept keeps its place in the file order; new concepts
+        are appended.
+        """
+        with self.batch():
+            next_position = self.db.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM concepts").fetchone()[0]
+            for concepts_batch in batched(concepts, self.batch_size):
+                ids = [concept['id'] for concept in concepts_batch]
+                positions = dict(self.db.execute(
+                    f"SELECT id, position FROM concepts WHERE id IN ({','.join('?' * len(ids))})", ids))
+                rows = []
+                for concept in concepts_batch:
+                    position = positions.get(concept['id'])
+                    if position is None:
+                        position = positions[concept['id']] = next_position
+                        next_position += 1
+                    rows.append((concept['id'], position, concept.get('name'), concept.get('description'),
+                                 concept.get('atomicity'),
+                                 difficulty_value(concept.get('difficulty'), concept['id']),
+                                 json.dumps(concept)))
+
+                self.db.executemany(
+                    "DELETE FROM concept_tags WHERE concept_id = ?", [(i,) for i in ids])
+                self.db.executemany(
+                    "DELETE FROM concept_prerequisites WHERE concept_id = ?", [(i,) for i in ids])
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO concepts (id, position, name, description, atomicity, difficulty, data)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self.db.executemany(
+                    "INSERT INTO concept_tags (concept_id, tag) VALUES (?, ?)",
+                    [(c['id'], tag) for c in concepts_batch for tag in c.get('tags', [])])
+                self.db.executemany(
+                    "INSERT INTO concept_prerequisites (concept_id, prerequisite_id) VALUES (?, ?)",
+                    [(c['id'], p) for c in concepts_batch for p in c.get('prerequisites', [])])
+
+    def delete_concepts(self, concept_ids):
+        """Delete concepts and their tags and prerequisites; returns how many existed."""
+        with self.batch():
+            deleted = 0
+            for ids in batched(concept_ids, self.batch_size):
+                deleted += self.db.execute(
+                    f"DELETE FROM concepts WHERE id IN ({','.join('?' * len(ids))})", ids).rowcount
+            return deleted
+
+    def put_relationships(self, relationships):
+        """Append relationships, in batches."""
+        with self.batch():
+            start = self.db.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM relationships").fetchone()[0]
+            for n, relationships_batch in enumerate(batched(relationships, self.batch_size)):
+                base = start + n * self.batch_size
+                self.db.executemany(
+                    "INSERT INTO relationships (position, from_id, to_id, type, strength, data)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [(base + k, r.get('from'), r.get('to'), r.get('type'), r.get('strength'), json.dumps(r))
+                     for k, r in enumerate(relationships_batch)])
+
+    def delete_relationships(self, from_id, to_id):
+        """Delete every relationship between two concepts; returns how many."""
+        with self.batch():
+            return self.db.execute("DELETE FROM relationships WHERE from_id = ? AND to_id = ?",
+                                   (from_id, to_id)).rowcount
+
+    # Reading
+
+    def select_ids(self, sql, params=()):
+        """Concept ids returned by a query (first column), in file order.
+
+        The query runs with the connection switched to read-only, so a
+        --select argument cannot modify the store.
+        """
+        self.db.execute("PRAGMA query_only = ON")
+        try:
+            selected = {row[0] for row in self.db.execute(sql, params)}
+        finally:
+            self.db.execute("PRAGMA query_only = OFF")
+        return [concept_id for (concept_id,) in self.db.execute("SELECT id FROM concepts ORDER BY position")
+                if concept_id in selected]
+
+    def concepts(self, concept_ids=None):
+        """Concept dicts in file order, optionally only the given ids."""
+        rows = self.db.execute("SELECT id, data FROM concepts ORDER BY position")
+        if concept_ids is None:
+            return [json.loads(data) for _, data in rows]
+        wanted = set(concept_ids)
+        return [json.loads(data) for concept_id, data in rows if concept_id in wanted]
+
+    def select(self, *fields):
+        """List of dicts holding only the given columns (see COLUMNS) of every concept."""
+        for field in fields:
+            if field not in COLUMNS:
+                raise ValueError(f"unknown concept column: {field}")
+        rows = self.db.execute(f"SELECT {', '.join(fields)} FROM concepts ORDER BY position")
+        return [dict(zip(fields, row)) for row in rows]
+
+    def relationships(self):
+        return [json.loads(data) for (data,) in
+                self.db.execute("SELECT data FROM relationships ORDER BY position")]
+
+    def to_data(self):
+        """The whole store as a concepts document, as json.load would return it."""
+        data = {}
+        for key, value in self.db.execute("SELECT key, value FROM document ORDER BY position"):
+            data[key] = json.loads(value)
+        data['concepts'] = self.concepts()
+        data['relationships'] = self.relationships()
+        return data
+
+    def export_json(self, json_path):
+        """Atomically write the store back out as a concepts JSON file."""
+        with open(f"{json_path}.tmp", 'w') as f:
+            json.dump(self.to_data(), f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        os.replace(f"{json_path}.tmp", json_path)
+
+
+def load_document(path):
+    """Parsed concepts document from a JSON file, a JSON Lines file or a concept database."""
+    if is_store_path(path):
+        with ConceptStore(path) as store:
+            return store.to_data()
+    if is_jsonl_path(path):
+        return load_jsonl(path)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def select_concept_ids(path, sql):
+    """Ids selected by an SQL query over the concepts at path.
+
+    A JSON or JSON Lines file is imported into an in-memory database
+    first, so the same queries work on any source.
+    """
+    if is_store_path(path):
+        with ConceptStore(path) as store:
+            return store.select_ids(sql)
+    with ConceptStore(':memory:') as store:
+        store.import_document(load_document(path))
+        return store.select_ids(sql)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the concepts JSON file with a SQLite concept store")
+    parser.add_argument('--db', default=DATABASE_FILE, help="Concept database (default: %(default)s)")
+    parser.add_argument('--concepts', default=CONCEPTS_FILE, help="Concepts JSON file (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('import', help="Replace the database contents with the JSON file")
+    commands.add_parser('export', help="Write the database back to the JSON file")
+    query = commands.add_parser('query', help="List the concepts whose ids an SQL query returns")
+    query.add_argument('sql')
+    upsert = commands.add_parser('upsert', help="Insert or replace the concepts in a JSON file "
+                                                "(one concept object or a list of them)")
+    upsert.add_argument('file')
+    delete = commands.add_parser('delete', help="Delete concepts by id")
+    delete.add_argument('ids', nargs='+')
+    args = parser.parse_args()
+
+    with ConceptStore(args.db) as store:
+        if args.command == 'import':
+            store.import_json(args.concepts)
+            print(f"Imported {len(store.select('id'))} concepts and "
+                  f"{len(store.relationships())} relationships into {args.db}")
+        elif args.command == 'export':
+            store.export_json(args.concepts)
+            print(f"Exported {len(store.select('id'))} concepts to {args.concepts}")
+        elif args.command == 'query':
+            try:
+                concept_ids = store.select_ids(args.sql)
+            except sqlite3.Error as e:
+                sys.exit(f"Query failed: {e}")
+            names = {row['id']: row['name'] for row in store.select('id', 'name')}
+            for concept_id in concept_ids:
+                print(f"{concept_id}\t{names[concept_id]}")
+            print(f"{len(concept_ids)} concepts", file=sys.stderr)
+        elif args.command == 'upsert':
+            with open(args.file, 'r') as f:
+                edited = json.load(f)
+            if isinstance(edited, dict):
+                edited = [edited]
+            store.put_concepts(edited)
+            print(f"Stored {len(edited)} concepts in {args.db}")
+        elif args.command == 'delete':
+            print(f"Deleted {store.delete_concepts(args.ids)} concepts from {args.db}")
+
+
+if __name__ == '__main__':
+    main()
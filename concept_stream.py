@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+JSON Lines concepts format and a streaming loader for it.
+
+A .jsonl concepts file holds one JSON object per line:
+
+  - a concept: an object with an "id", with the same fields as in
+    music-theory-concepts.json
+  - a relationship: an object with "from" and "to"
+  - anything else: top-level document fields (domain, version, metadata...)
+
+The file is append-only. A concept line whose id was seen before replaces
+that concept in place (last wins), {"id": ..., "deleted": true} removes a
+concept and {"from": ..., "to": ..., "deleted": true} removes the
+relationships between two concepts. Blank lines are ignored.
+
+iter_records() yields the lines as they are read, parsing blocks of lines
+in worker processes when asked to, so consumers can start work before the
+file has been read and never hold more than a few blocks in memory.
+
+Usage:
+    python3 concept_stream.py convert [--concepts FILE] [--output FILE]
+    python3 concept_stream.py compact FILE.jsonl
+"""
+
+import argparse
+import json
+import os
+
+from parallel_render import render_all
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CONCEPTS_FILE = os.path.join(REPO_DIR, 'music-theory-concepts.json')
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+def is_jsonl_path(path):
+    """True when path names a JSON Lines concepts file."""
+    return str(path).lower().endswith(JSONL_EXTENSIONS)
+
+
+def record_kind(record):
+    """'concept', 'relationship' or 'document' for one parsed line."""
+    if 'from' in record and 'to' in record:
+        return 'relationship'
+    if 'id' in record:
+        return 'concept'
+    return 'document'
+
+
+def read_blocks(path, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield (offset, bytes) blocks of whole lines, about block_size each."""
+    with open(path, 'rb') as f:
+        offset = 0
+        carry = b''
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            data = carry + data
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                carry = data
+                continue
+            yield offset, data[:end]
+            offset += end
+            carry = data[end:]
+        if carry:
+            yield offset, carry
+
+
+def parse_block(block):
+    """Parse a block of lines into (kind, record, offset, length) tuples."""
+    offset, data = block
+    records = []
+    start = 0
+    while start < len(data):
+        end = data.find(b'\n', start)
+        end = len(data) if end == -1 else end + 1
+        line = data[start:end]
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"invalid JSON line at byte {offset + start}: {e}") from None
+            if not isinstance(record, dict):
+                raise ValueError(f"line at byte {offset + start} is not a JSON object")
+            records.append((record_kind(record), record, offset + start, end - start))
+        start = end
+    return records
+
+
+def iter_records(path, jobs=1, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield (kind, record, offset, length) for every line, in file order.
+
+    With jobs > 1 blocks are parsed in worker processes; only a few blocks
+    per worker are in flight at a time.
+    """
+    for records in render_all(parse_block, read_blocks(path, block_size), jobs=jobs, chunk_size=1):
+        yield from records
+
+
+def read_record(f, offset, length):
+    """Re-read one line of an open binary file, given its offset and length."""
+    f.seek(offset)
+    return json.loads(f.read(length))
+
+
+def same_relationship(relationship, record):
+    return relationship.get('from') == record['from'] and relationship.get('to') == record['to']
+
+
+def load_jsonl(path, jobs=1):
+    """The concepts document described by a JSON Lines file, with every edit applied."""
+    data = {}
+    concepts = {}
+    relationships = []
+    for kind, record, _, _ in iter_records(path, jobs):
+        if kind == 'concept':
+            if record.get('deleted'):
+                concepts.pop(record['id'], None)
+            else:
+                concepts[record['id']] = record
+        elif kind == 'relationship':
+            if record.get('deleted'):
+                relationships = [r for r in relationships if not same_relationship(r, record)]
+            else:
+                relationships.append(record)
+        else:
+            data.update(record)
+    data['concepts'] = list(concepts.values())
+    data['relationships'] = relationships
+    return data
+
+
+def write_jsonl(data, path):
+    """Atomically write a concepts document as JSON Lines."""
+    with open(f"{path}.tmp", 'w') as f:
+        document = {key: value for key, value in data.items() if key not in ('concepts', 'relationships')}
+        if document:
+            f.write(json.dumps(document, ensure_ascii=False) + '\n')
+        for record in data['concepts'] + data.get('relationships', []):
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    os.replace(f"{path}.tmp", path)
+
+
+def append_records(path, records):
+    """Append concept, relationship or deletion records to a JSON Lines file."""
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert and compact JSON Lines concepts files")
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert = commands.add_parser('convert', help="Write a concepts JSON file as JSON Lines")
+    convert.add_argument('--concepts', default=CONCEPTS_FILE, help="Concepts JSON file")
+    convert.add_argument('--output', help="JSON Lines file (default: next to --concepts)")
+    compact = commands.add_parser('compact', help="Rewrite a JSON Lines file with its edits applied")
+    compact.add_argument('file')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        output = args.output or os.path.splitext(args.concepts)[0] + '.jsonl'
+        with open(args.concepts, 'r') as f:
+            data = json.load(f)
+        write_jsonl(data, output)
+        print(f"Wrote {len(data['concepts'])} concepts to {output}")
+    else:
+        before = os.path.getsize(args.file)
+        data = load_jsonl(args.file)
+        write_jsonl(data, args.file)
+        print(f"Compacted {args.file}: {len(data['concepts'])} concepts, "
+              f"{before:,} -> {os.path.getsize(args.file):,} bytes")
+
+
+if __name__ == '__main__':
+    main()
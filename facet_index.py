@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Bitmap index over the concept facets: tags, difficulty and atomicity.
+
+Every facet value has a posting bitset, stored as a Python int, with bit
+n set when the n-th concept in file order has that value. A facet query
+such as
+
+    rhythm AND difficulty<=2 AND NOT advanced
+
+is then a handful of integer ANDs, ORs and complements instead of a scan
+over every concept.
+
+Query syntax (keywords are case-insensitive, AND is implied between
+adjacent terms):
+
+    rhythm, tag:rhythm          concepts tagged rhythm
+    difficulty:2, difficulty=2  difficulty level 2
+    difficulty<=2 (<, >=, >)    a range of difficulty levels
+    atomicity:atomic            atomicity value
+    NOT x, x AND y, x OR y, ( )
+
+The index is saved as JSON (see build_player_data.py). Like a roaring
+bitmap, each posting is stored as a sorted array of concept numbers when
+it is sparse and as a packed little-endian bitmap in base64 when it is
+dense; index.html decodes the same file into Uint32Array bitmaps.
+"""
+
+import base64
+import json
+import os
+import re
+
+FACET_VERSION = 1
+FACET_FIELDS = ('tag', 'difficulty', 'atomicity')
+
+# A posting is stored as an array while it costs less than the bitmap
+# (about 16 bits per entry against 1 bit per concept)
+ARRAY_BITS_PER_ENTRY = 16
+
+TOKEN = re.compile(r'\s*(?:(\()|(\))|([A-Za-z_][\w-]*)\s*(<=|>=|<|>|=|:)\s*([\w.-]+)|([\w.-]+))')
+COMPARISONS = {
+    '<=': lambda a, b: a <= b,
+    '<': lambda a, b: a < b,
+    '>=': lambda a, b: a >= b,
+    '>': lambda a, b: a > b,
+    '=': lambda a, b: a == b,
+    ':': lambda a, b: a == b,
+}
+
+
+class FacetQueryError(ValueError):
+    """A facet query could not be parsed."""
+
+
+def encode_posting(bits, count):
+    """JSON form of a posting: {"array": [...]} or {"bitmap": base64}."""
+    members = bits.bit_count()
+    if members * ARRAY_BITS_PER_ENTRY < count:
+        return {'array': bit_numbers(bits)}
+    data = bits.to_bytes((count + 7) // 8, 'little')
+    return {'bitmap': base64.b64encode(data).decode('ascii')}
+
+
+def decode_posting(posting):
+    """The bitset of a posting saved by encode_posting."""
+    if 'array' in posting:
+        bits = 0
+        for n in posting['array']:
+            bits |= 1 << n
+        return bits
+    return int.from_bytes(base64.b64decode(posting['bitmap']), 'little')
+
+
+def bit_numbers(bits):
+    """Positions of the set bits, ascending."""
+    numbers = []
+    # Scan byte by byte: isolating the low bit of a big int costs a full copy
+    for i, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, 'little')):
+        while byte:
+            low = byte & -byte
+            numbers.append(8 * i + low.bit_length() - 1)
+            byte ^= low
+    return numbers
+
+
+class FacetIndex:
+    """Posting bitsets for every tag, difficulty level and atomicity value."""
+
+    def __init__(self, ids, postings):
+        self.ids = ids
+        self.postings = postings
+        self.all = (1 << len(ids)) - 1
+
+    @classmethod
+    def from_concepts(cls, concepts):
+        """Index Concept records (see concept_record.py), in the given order."""
+        ids = []
+        postings = {field: {} for field in FACET_FIELDS}
+
+        def add(field, value, n):
+            values = postings[field]
+            values[value] = values.get(value, 0) | 1 << n
+
+        for n, concept in enumerate(concepts):
+            ids.append(concept.id)
+            for tag in concept.tags:
+                add('tag', tag, n)
+            if concept.difficulty is not None:
+                add('difficulty', str(concept.difficulty), n)
+            if concept.atomicity is not None:
+                add('atomicity', concept.atomicity, n)
+        return cls(ids, postings)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != FACET_VERSION:
+            raise ValueError(f"{path}: unsupported facet index version {data.get('version')}")
+        postings = {field: {value: decode_posting(posting) for value, posting in values.items()}
+                    for field, values in data['facets'].items()}
+        return cls(data['ids'], postings)
+
+    def save(self, path):
+        """Atomically write the index as JSON."""
+        count = len(self.ids)
+        data = {
+            'version': FACET_VERSION,
+            'bit_order': 'bit n is ids[n]; bitmaps are little-endian bytes in base64',
+            'ids': self.ids,
+            'facets': {field: {value: encode_posting(bits, count)
+                               for value, bits in sorted(values.items())}
+                       for field, values in self.postings.items()},
+        }
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(f"{path}.tmp", path)
+
+    def values(self, field):
+        """The values of a facet field with their concept counts."""
+        return {value: bits.bit_count() for value, bits in self.postings.get(field, {}).items()}
+
+    def posting(self, field, value, op=':'):
+        """Bitset of the concepts whose field compares to value with op."""
+        if field not in self.postings:
+            raise FacetQueryError(f"unknown facet: {field} (expected one of {', '.join(FACET_FIELDS)})")
+        values = self.postings[field]
+        if op in (':', '='):
+            return values.get(value, 0)
+        if field != 'difficulty':
+            raise FacetQueryError(f"{op} only applies to difficulty")
+        try:
+            limit = float(value)
+        except ValueError:
+            raise FacetQueryError(f"not a difficulty level: {value}") from None
+        bits = 0
+        for level, posting in values.items():
+            if COMPARISONS[op](float(level), limit):
+                bits |= posting
+        return bits
+
+    def query(self, text):
+        """Bitset of the concepts matching a facet query."""
+        return _QueryParser(self, text).parse()
+
+    def select(self, text):
+        """Ids of the concepts matching a facet query, in file order."""
+        return self.members(self.query(text))
+
+    def members(self, bits):
+        return [self.ids[n] for n in bit_numbers(bits)]
+
+
+class _QueryParser:
+    """Recursive-descent evaluator for the facet query syntax."""
+
+    def __init__(self, index, text):
+        self.index = index
+        self.tokens = self.tokenize(text)
+        self.position = 0
+
+    @staticmethod
+    def tokenize(text):
+        tokens = []
+        position = 0
+        text = text.strip()
+        while position < len(text):
+            match = TOKEN.match(text, position)
+            if not match or match.end() == position:
+                raise FacetQueryError(f"unexpected text in facet query: {text[position:]!r}")
+            opening, closing, field, op, value, word = match.groups()
+            if opening or closing:
+                tokens.append((opening or closing, None))
+            elif field:
+                tokens.append(('term', (field.lower(), op, value)))
+            elif word.upper() in ('AND', 'OR', 'NOT'):
+                tokens.append((word.upper(), None))
+            else:
+                tokens.append(('term', ('tag', ':', word)))
+            position = match.end()
+        return tokens
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise FacetQueryError("empty facet query")
+        bits = self.either()
+        if self.peek() is not None:
+            raise FacetQueryError(f"unexpected {self.peek()} in facet query")
+        return bits
+
+    def either(self):
+        bits = self.both()
+        while self.peek() == 'OR':
+            self.take()
+            bits |= self.both()
+        return bits
+
+    def both(self):
+        bits = self.negation()
+        while self.peek() in ('AND', 'NOT', 'term', '('):
+            if self.peek() == 'AND':
+                self.take()
+            bits &= self.negation()
+        return bits
+
+    def negation(self):
+        if self.peek() == 'NOT':
+            self.take()
+            return self.index.all & ~self.negation()
+        return self.operand()
+
+    def operand(self):
+        kind = self.peek()
+        if kind == '(':
+            self.take()
+            bits = self.either()
+            if self.peek() != ')':
+                raise FacetQueryError("missing ) in facet query")
+            self.take()
+            return bits
+        if kind == 'term':
+            field, op, value = self.take()[1]
+            return self.index.posting(field, value, op)
+        raise FacetQueryError(f"expected a facet term, found {kind or 'end of query'}")
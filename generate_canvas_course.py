@@ -4,20 +4,261 @@ Canvas LMS Course Generator for Music Theory
 Generates an IMS Common Cartridge package from music-theory-concepts.json
 """
 
+import argparse
+import collections
+import contextlib
+import hashlib
+import inspect
+import io
 import json
 import os
 import uuid
 import shutil
+import sys
+import tempfile
+import time
 import zipfile
-from datetime import datetime
-from xml.etree.ElementTree import Element, SubElement, tostring
-from xml.dom import minidom
-
-# Load the concepts
-with open('music-theory-concepts.json', 'r') as f:
-    data = json.load(f)
-
-concepts = {c['id']: c for c in data['concepts']}
+from datetime import date, datetime, timezone
+
+from build_player_data import build_player_data, load_facet_index, player_data_dir
+from concept_graph import ConceptGraph
+from concept_store import select_concept_ids
+from concept_record import Concept, Relationship
+from concept_stream import is_jsonl_path, iter_records, read_record
+from imscc_package import CartridgeWriter, CompressionPolicy, add_compression_arguments
+from minify import minify_html, size_report
+from parallel_render import DEFAULT_CHUNK_SIZE, add_jobs_arguments, render_all
+from prerequisite_closure import PrerequisiteClosure, closure_path
+from web_resources import PAGE_RESOURCES, WebResource, set_minified, write_resources
+from xml_writer import ManifestWriter, XMLWriter
+
+CONCEPTS_FILE = 'music-theory-concepts.json'
+OUTPUT_DIR = "canvas_music_theory_course"
+PACKAGE_NAME = "music_theory_course.imscc"
+
+# Records a hash of every generated page's inputs so later runs can skip
+# pages whose inputs have not changed
+BUILD_MANIFEST = ".build_manifest.json"
+
+# Deterministic builds derive identifiers from these names instead of
+# random UUIDs, and take their timestamps from SOURCE_DATE_EPOCH or, when
+# that is unset, this fixed date
+ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'https://github.com/JavaFXpert/pla-2026/music-theory-course')
+DEFAULT_BUILD_DATE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+PACKAGE_HASH_PREFIX = b'input-sha256:'
+BUILD_MANIFEST_VERSION = 1
+
+# Concepts keyed by id, populated by main()
+concepts = {}
+
+# Whether video pages embed the YouTube player up front (--eager-video)
+# rather than behind a click-to-load facade
+eager_video = False
+
+# Minify the rendered pages (see minify.py); set by --minify
+minify_pages = False
+
+# Styles and scripts shared by the pages of each kind (see web_resources.py)
+LESSON_CSS = WebResource('lesson.css', """\
+body {
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    line-height: 1.6;
+    color: #333;
+    max-width: 900px;
+    margin: 0 auto;
+    padding: 20px;
+}
+h1 {
+    color: #2c3e50;
+    border-bottom: 3px solid #3498db;
+    padding-bottom: 10px;
+}
+h2, h3 {
+    color: #34495e;
+}
+.description {
+    font-size: 1.2em;
+    color: #555;
+    margin: 20px 0;
+    padding: 20px;
+    background-color: #ecf0f1;
+    border-radius: 5px;
+}
+.difficulty {
+    display: inline-block;
+    padding: 8px 15px;
+    background-color: #3498db;
+    color: white;
+    border-radius: 20px;
+    font-weight: bold;
+    margin: 10px 0;
+}
+ul {
+    line-height: 1.8;
+}
+li {
+    margin-bottom: 8px;
+}
+""")
+
+VIDEO_CSS = WebResource('video.css', """\
+body {
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    line-height: 1.6;
+    color: #333;
+    max-width: 900px;
+    margin: 0 auto;
+    padding: 20px;
+    background-color: #f5f5f5;
+}
+h1 {
+    color: #2c3e50;
+    border-bottom: 3px solid #e74c3c;
+    padding-bottom: 10px;
+}
+.video-container {
+    position: relative;
+    padding-bottom: 56.25%; /* 16:9 aspect ratio */
+    height: 0;
+    overflow: hidden;
+    max-width: 100%;
+    background: #000;
+    margin: 30px 0;
+    border-radius: 8px;
+    box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+}
+.video-container iframe {
+    position: absolute;
+    top: 0;
+    left: 0;
+    width: 100%;
+    height: 100%;
+    border: 0;
+}
+.instructor-info {
+    background-color: white;
+    padding: 20px;
+    border-radius: 8px;
+    margin: 20px 0;
+    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+}
+.instructor-info h2 {
+    color: #e74c3c;
+    margin-top: 0;
+}
+.action-buttons {
+    display: flex;
+    gap: 15px;
+    margin: 20px 0;
+    flex-wrap: wrap;
+}
+.btn {
+    display: inline-block;
+    padding: 12px 24px;
+    text-decoration: none;
+    border-radius: 5px;
+    font-weight: bold;
+    transition: all 0.3s;
+    text-align: center;
+    flex: 1;
+    min-width: 200px;
+}
+.btn-primary {
+    background-color: #e74c3c;
+    color: white;
+}
+.btn-primary:hover {
+    background-color: #c0392b;
+    transform: translateY(-2px);
+}
+.btn-secondary {
+    background-color: #3498db;
+    color: white;
+}
+.btn-secondary:hover {
+    background-color: #2980b9;
+    transform: translateY(-2px);
+}
+.note {
+    background-color: #fff3cd;
+    border-left: 4px solid #ffc107;
+    padding: 15px;
+    margin: 20px 0;
+    border-radius: 4px;
+}
+.info-box {
+    background-color: white;
+    padding: 20px;
+    border-radius: 8px;
+    margin-top: 20px;
+    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+}
+.info-box h3 {
+    color: #2c3e50;
+    margin-top: 0;
+}
+.video-facade {
+    position: absolute;
+    top: 0;
+    left: 0;
+    width: 100%;
+    height: 100%;
+    display: flex;
+    flex-direction: column;
+    align-items: center;
+    justify-content: center;
+    gap: 16px;
+    background: linear-gradient(135deg, #2c3e50 0%, #e74c3c 100%);
+    color: white;
+    text-decoration: none;
+    cursor: pointer;
+}
+.video-facade-title {
+    font-size: 1.6em;
+    font-weight: bold;
+}
+.video-facade-play {
+    position: relative;
+    width: 68px;
+    height: 48px;
+    border-radius: 12px;
+    background-color: rgba(0,0,0,0.6);
+    transition: background-color 0.3s;
+}
+.video-facade-play::after {
+    content: '';
+    position: absolute;
+    left: 26px;
+    top: 14px;
+    border-style: solid;
+    border-width: 10px 0 10px 18px;
+    border-color: transparent transparent transparent white;
+}
+.video-facade:hover .video-facade-play {
+    background-color: #e74c3c;
+}
+.video-facade-note {
+    font-size: 0.9em;
+    opacity: 0.85;
+}
+""")
+
+# Replaces the video facade with the YouTube player when it is clicked
+VIDEO_JS = WebResource('video.js', """\
+document.querySelectorAll('.video-facade').forEach(function (facade) {
+    facade.addEventListener('click', function (event) {
+        event.preventDefault();
+        var iframe = document.createElement('iframe');
+        iframe.src = facade.href;
+        iframe.allowFullscreen = true;
+        iframe.allow = 'accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture';
+        facade.replaceWith(iframe);
+    });
+});
+""")
+
+PAGE_RESOURCES['lesson'] = (LESSON_CSS,)
+PAGE_RESOURCES['video'] = (VIDEO_CSS, VIDEO_JS)
 
 # YouTube video mapping for Brad Harrison videos
 # Each concept maps to a search query or topic for Brad Harrison's channel
@@ -94,43 +335,19 @@ brad_harrison_videos = {
     "roman-numeral-analysis": "roman numeral analysis"
 }
 
-# Organize concepts by difficulty for learning progression
-# Each concept becomes its own section/module
-concept_order = [
-    "sound", "pitch", "duration", "volume", "timbre", "note", "note-name", "beat",
-    "staff", "clef", "treble-clef", "bass-clef", "ledger-lines",
-    "rhythm", "tempo", "meter", "time-signature", "measure", "note-value", "rest", "dot", "tie",
-    "accidental", "sharp", "flat", "natural", "half-step", "whole-step",
-    "interval", "octave", "interval-number",
-    "interval-quality", "perfect-interval", "major-interval", "minor-interval",
-    "scale", "major-scale", "minor-scale", "scale-degree", "tonic", "dominant",
-    "key", "key-signature", "enharmonic", "diatonic", "chromatic",
-    "harmony", "chord", "triad", "major-triad", "minor-triad",
-    "diminished-triad", "augmented-triad", "seventh-chord", "chord-inversion",
-    "consonance", "dissonance", "chord-progression", "cadence",
-    "melody", "phrase", "motif",
-    "dynamics", "articulation",
-    "form", "texture",
-    "transposition", "modulation", "voice-leading", "roman-numeral-analysis"
-]
-
-# Create output directory structure
-output_dir = "canvas_music_theory_course"
-if os.path.exists(output_dir):
-    shutil.rmtree(output_dir)
-
-os.makedirs(output_dir)
-os.makedirs(f"{output_dir}/wiki_content")
-os.makedirs(f"{output_dir}/assessment_questions")
+def load_concepts(filepath=CONCEPTS_FILE):
+    """Load concepts from JSON file as Concept records, keyed by id"""
+    with open(filepath, 'r') as f:
+        data = json.load(f)
+    return {c['id']: Concept.from_dict(c) for c in data['concepts']}
 
 # Generate unique identifiers
 def generate_id():
     return f"i{uuid.uuid4().hex}"
 
-# Store IDs for manifest
-resource_ids = {}
-module_ids = {}
-item_ids = {}
+def name_based_id(key):
+    """Identifier derived from a name such as 'section:intervals', identical on every build"""
+    return f"i{uuid.uuid5(ID_NAMESPACE, key).hex}"
 
 def create_html_page(concept):
     """Create an HTML page for a concept"""
@@ -138,8 +355,8 @@ def create_html_page(concept):
 
     # Build prerequisites section
     prereq_html = ""
-    if c['prerequisites']:
-        prereq_list = [f"<li><strong>{concepts[p]['name']}</strong></li>" for p in c['prerequisites']]
+    if c.prerequisites:
+        prereq_list = [f"<li><strong>{concepts[p].name}</strong></li>" for p in c.prerequisites]
         prereq_html = f"""
         <div class="prerequisites" style="background-color: #f0f8ff; padding: 15px; border-left: 4px solid #4CAF50; margin: 20px 0;">
             <h3>Prerequisites</h3>
@@ -152,8 +369,8 @@ def create_html_page(concept):
 
     # Build examples section
     examples_html = ""
-    if c['examples']:
-        example_items = [f"<li>{ex}</li>" for ex in c['examples']]
+    if c.examples:
+        example_items = [f"<li>{ex}</li>" for ex in c.examples]
         examples_html = f"""
         <div class="examples" style="background-color: #fff9e6; padding: 15px; border-left: 4px solid #ff9800; margin: 20px 0;">
             <h3>Examples</h3>
@@ -165,8 +382,8 @@ def create_html_page(concept):
 
     # Build learning objectives section
     objectives_html = ""
-    if c['learning_objectives']:
-        obj_items = [f"<li>{obj}</li>" for obj in c['learning_objectives']]
+    if c.learning_objectives:
+        obj_items = [f"<li>{obj}</li>" for obj in c.learning_objectives]
         objectives_html = f"""
         <div class="learning-objectives" style="background-color: #e8f5e9; padding: 15px; border-left: 4px solid #2196F3; margin: 20px 0;">
             <h3>Learning Objectives</h3>
@@ -179,8 +396,8 @@ def create_html_page(concept):
 
     # Build related concepts section
     related_html = ""
-    if c['related_concepts']:
-        related_list = [f"<li>{concepts.get(r, {}).get('name', r)}</li>" for r in c['related_concepts']]
+    if c.related_concepts:
+        related_list = [f"<li>{concepts[r].name if r in concepts else r}</li>" for r in c.related_concepts]
         related_html = f"""
         <div class="related-concepts" style="background-color: #f3e5f5; padding: 15px; border-left: 4px solid #9c27b0; margin: 20px 0;">
             <h3>Related Concepts</h3>
@@ -192,9 +409,9 @@ def create_html_page(concept):
 
     # Build tags section
     tags_html = ""
-    if c['tags']:
+    if c.tag_ids:
         tag_badges = [f'<span style="background-color: #607d8b; color: white; padding: 5px 10px; border-radius: 3px; margin-right: 5px; display: inline-block; margin-bottom: 5px;">{tag}</span>'
-                      for tag in c['tags']]
+                      for tag in c.tags]
         tags_html = f"""
         <div class="tags" style="margin: 20px 0;">
             {''.join(tag_badges)}
@@ -206,58 +423,18 @@ def create_html_page(concept):
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{c['name']}</title>
-    <style>
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            max-width: 900px;
-            margin: 0 auto;
-            padding: 20px;
-        }}
-        h1 {{
-            color: #2c3e50;
-            border-bottom: 3px solid #3498db;
-            padding-bottom: 10px;
-        }}
-        h2, h3 {{
-            color: #34495e;
-        }}
-        .description {{
-            font-size: 1.2em;
-            color: #555;
-            margin: 20px 0;
-            padding: 20px;
-            background-color: #ecf0f1;
-            border-radius: 5px;
-        }}
-        .difficulty {{
-            display: inline-block;
-            padding: 8px 15px;
-            background-color: #3498db;
-            color: white;
-            border-radius: 20px;
-            font-weight: bold;
-            margin: 10px 0;
-        }}
-        ul {{
-            line-height: 1.8;
-        }}
-        li {{
-            margin-bottom: 8px;
-        }}
-    </style>
+    <title>{c.name}</title>
+    {LESSON_CSS.tag()}
 </head>
 <body>
-    <h1>{c['name']}</h1>
+    <h1>{c.name}</h1>
 
-    <div class="difficulty">Difficulty Level: {c['difficulty']}/6</div>
+    <div class="difficulty">Difficulty Level: {c.difficulty}/6</div>
 
     {tags_html}
 
     <div class="description">
-        <strong>Definition:</strong> {c['description']}
+        <strong>Definition:</strong> {c.description}
     </div>
 
     {prereq_html}
@@ -285,7 +462,7 @@ def create_html_page(concept):
 def create_video_page(concept_id):
     """Create an HTML page with embedded Brad Harrison YouTube content"""
     c = concepts[concept_id]
-    search_query = brad_harrison_videos.get(concept_id, c['name'])
+    search_query = brad_harrison_videos.get(concept_id, c.name)
 
     # YouTube channel URL and ID for Brad Harrison
     channel_url = "https://www.youtube.com/@BradHarrison"
@@ -294,126 +471,51 @@ def create_video_page(concept_id):
     # Create YouTube search URL for this specific topic
     youtube_search_url = f"https://www.youtube.com/results?search_query=Brad+Harrison+{search_query.replace(' ', '+')}"
 
+    # The YouTube player costs about a megabyte of script per page view, so
+    # by default the page shows a facade and loads the player on click.
+    # Where scripts are stripped, the facade links to the player instead.
+    embed_url = f"https://www.youtube.com/embed?listType=user_uploads&list={channel_id}"
+    if eager_video:
+        player = f"""<!-- Embed Brad Harrison's channel latest uploads -->
+        <iframe
+            src="{embed_url}"
+            allowfullscreen
+            allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture">
+        </iframe>"""
+    else:
+        player = f"""<!-- Brad Harrison's channel latest uploads, loaded on click -->
+        <a class="video-facade" href="{embed_url}&amp;autoplay=1" target="_blank"
+           aria-label="Play Brad Harrison's latest videos">
+            <span class="video-facade-title">{c.name}</span>
+            <span class="video-facade-play"></span>
+            <span class="video-facade-note">Brad Harrison's latest videos &middot; the player loads when you press play</span>
+        </a>
+        {VIDEO_JS.tag()}"""
+
     html = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{c['name']} - Video Lesson</title>
-    <style>
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            max-width: 900px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f5f5f5;
-        }}
-        h1 {{
-            color: #2c3e50;
-            border-bottom: 3px solid #e74c3c;
-            padding-bottom: 10px;
-        }}
-        .video-container {{
-            position: relative;
-            padding-bottom: 56.25%; /* 16:9 aspect ratio */
-            height: 0;
-            overflow: hidden;
-            max-width: 100%;
-            background: #000;
-            margin: 30px 0;
-            border-radius: 8px;
-            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        }}
-        .video-container iframe {{
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            border: 0;
-        }}
-        .instructor-info {{
-            background-color: white;
-            padding: 20px;
-            border-radius: 8px;
-            margin: 20px 0;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        .instructor-info h2 {{
-            color: #e74c3c;
-            margin-top: 0;
-        }}
-        .action-buttons {{
-            display: flex;
-            gap: 15px;
-            margin: 20px 0;
-            flex-wrap: wrap;
-        }}
-        .btn {{
-            display: inline-block;
-            padding: 12px 24px;
-            text-decoration: none;
-            border-radius: 5px;
-            font-weight: bold;
-            transition: all 0.3s;
-            text-align: center;
-            flex: 1;
-            min-width: 200px;
-        }}
-        .btn-primary {{
-            background-color: #e74c3c;
-            color: white;
-        }}
-        .btn-primary:hover {{
-            background-color: #c0392b;
-            transform: translateY(-2px);
-        }}
-        .btn-secondary {{
-            background-color: #3498db;
-            color: white;
-        }}
-        .btn-secondary:hover {{
-            background-color: #2980b9;
-            transform: translateY(-2px);
-        }}
-        .note {{
-            background-color: #fff3cd;
-            border-left: 4px solid #ffc107;
-            padding: 15px;
-            margin: 20px 0;
-            border-radius: 4px;
-        }}
-        .info-box {{
-            background-color: white;
-            padding: 20px;
-            border-radius: 8px;
-            margin-top: 20px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        .info-box h3 {{
-            color: #2c3e50;
-            margin-top: 0;
-        }}
-    </style>
+    <title>{c.name} - Video Lesson</title>
+    {VIDEO_CSS.tag()}
 </head>
 <body>
-    <h1>{c['name']} - Video Lesson</h1>
+    <h1>{c.name} - Video Lesson</h1>
 
     <div class="instructor-info">
         <h2>Learn from Brad Harrison</h2>
         <p>Brad Harrison is a Toronto-based trumpet player, composer, and music educator with over 214K YouTube subscribers. His channel focuses on music theory, practice techniques, and other musical topics.</p>
-        <p><strong>Topic:</strong> {c['name']}</p>
+        <p><strong>Topic:</strong> {c.name}</p>
     </div>
 
     <div class="note">
-        <strong>📺 Find Video Content:</strong> Use the buttons below to find Brad Harrison's videos on <strong>{c['name']}</strong>.
+        <strong>📺 Find Video Content:</strong> Use the buttons below to find Brad Harrison's videos on <strong>{c.name}</strong>.
     </div>
 
     <div class="action-buttons">
         <a href="{youtube_search_url}" target="_blank" class="btn btn-primary">
-            🔍 Search for {c['name']} Videos
+            🔍 Search for {c.name} Videos
         </a>
         <a href="{channel_url}/videos" target="_blank" class="btn btn-secondary">
             📚 Browse All Videos
@@ -421,18 +523,13 @@ def create_video_page(concept_id):
     </div>
 
     <div class="video-container">
-        <!-- Embed Brad Harrison's channel latest uploads -->
-        <iframe
-            src="https://www.youtube.com/embed?listType=user_uploads&list={channel_id}"
-            allowfullscreen
-            allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture">
-        </iframe>
+        {player}
     </div>
 
     <div class="info-box">
         <h3>How to Find Relevant Videos</h3>
         <ol>
-            <li>Click the "<strong>Search for {c['name']} Videos</strong>" button above to find videos specifically about this topic</li>
+            <li>Click the "<strong>Search for {c.name} Videos</strong>" button above to find videos specifically about this topic</li>
             <li>Browse through the embedded playlist of Brad Harrison's latest videos</li>
             <li>Visit his <a href="{channel_url}" target="_blank">full channel</a> to explore organized playlists</li>
             <li>Look for videos with titles containing: "{search_query}"</li>
@@ -452,7 +549,7 @@ def create_video_page(concept_id):
     </div>
 
     <div style="background-color: #e3f2fd; padding: 15px; border-radius: 8px; margin-top: 20px;">
-        <p><em>💡 Tip: Brad Harrison has created hundreds of music theory videos. Use the search button above to find videos specifically about "{c['name']}", or browse his channel to discover related content that will enhance your understanding.</em></p>
+        <p><em>💡 Tip: Brad Harrison has created hundreds of music theory videos. Use the search button above to find videos specifically about "{c.name}", or browse his channel to discover related content that will enhance your understanding.</em></p>
     </div>
 </body>
 </html>"""
@@ -471,21 +568,21 @@ def create_quiz_for_module(module_num, module_data):
         question = {
             'id': q_id,
             'type': 'multiple_choice',
-            'title': f"Understanding {c['name']}",
-            'text': f"Which of the following best describes {c['name']}?",
-            'correct_answer': c['description'],
+            'title': f"Understanding {c.name}",
+            'text': f"Which of the following best describes {c.name}?",
+            'correct_answer': c.description,
             'distractors': generate_distractors(c)
         }
         questions.append(question)
 
         # Create additional questions based on learning objectives
-        if c['learning_objectives'] and len(c['learning_objectives']) > 0:
-            obj = c['learning_objectives'][0]
+        if c.learning_objectives:
+            obj = c.learning_objectives[0]
             q_id2 = generate_id()
             question2 = {
                 'id': q_id2,
                 'type': 'essay',
-                'title': f"Application: {c['name']}",
+                'title': f"Application: {c.name}",
                 'text': f"Explain in your own words: {obj}"
             }
             questions.append(question2)
@@ -503,210 +600,755 @@ def generate_distractors(concept):
 
 def create_quiz_xml(module_num, questions):
     """Create QTI XML for a quiz"""
-    assessment = Element('questestinterop')
-    assessment.set('xmlns', 'http://www.imsglobal.org/xsd/ims_qtiasiv1p2')
+    out = io.StringIO()
+    w = XMLWriter(out)
+    w.declaration()
+    w.start('questestinterop', {'xmlns': 'http://www.imsglobal.org/xsd/ims_qtiasiv1p2'})
 
     for q in questions:
-        item = SubElement(assessment, 'item')
-        item.set('ident', q['id'])
-        item.set('title', q['title'])
+        w.start('item', {'ident': q['id'], 'title': q['title']})
 
-        presentation = SubElement(item, 'presentation')
-        material = SubElement(presentation, 'material')
-        mattext = SubElement(material, 'mattext')
-        mattext.set('texttype', 'text/html')
-        mattext.text = q['text']
+        w.start('presentation')
+        w.start('material')
+        w.element('mattext', q['text'], {'texttype': 'text/html'})
+        w.end()
 
         if q['type'] == 'multiple_choice':
-            response = SubElement(presentation, 'response_lid')
-            response.set('ident', 'response1')
-            response.set('rcardinality', 'Single')
-
-            render = SubElement(response, 'render_choice')
-
-            # Correct answer
-            choice1 = SubElement(render, 'response_label')
-            choice1.set('ident', 'correct')
-            mat1 = SubElement(choice1, 'material')
-            text1 = SubElement(mat1, 'mattext')
-            text1.text = q['correct_answer']
-
-            # Distractors
-            for i, dist in enumerate(q['distractors'], 1):
-                choice = SubElement(render, 'response_label')
-                choice.set('ident', f'distractor{i}')
-                mat = SubElement(choice, 'material')
-                text = SubElement(mat, 'mattext')
-                text.text = dist
+            w.start('response_lid', {'ident': 'response1', 'rcardinality': 'Single'})
+            w.start('render_choice')
+
+            # Correct answer, then distractors
+            choices = [('correct', q['correct_answer'])]
+            choices += [(f'distractor{i}', dist) for i, dist in enumerate(q['distractors'], 1)]
+            for ident, text in choices:
+                w.start('response_label', {'ident': ident})
+                w.start('material')
+                w.element('mattext', text)
+                w.end()
+                w.end()
+
+            w.end()
+            w.end()
 
         elif q['type'] == 'essay':
-            response = SubElement(presentation, 'response_str')
-            response.set('ident', 'response1')
-            response.set('rcardinality', 'Single')
-
-    return minidom.parseString(tostring(assessment)).toprettyxml(indent="  ")
-
-# Generate all content
-print("Generating Canvas course package...")
-print(f"Total concepts: {len(concepts)}")
-print(f"Each concept will be its own section with 2 pages")
-
-# Store video page resource IDs
-video_resource_ids = {}
-
-# Create pages and video pages for each concept
-for concept_id in concept_order:
-    if concept_id in concepts:
-        concept_name = concepts[concept_id]['name']
-        print(f"\nProcessing section: {concept_name}")
-
-        # Create concept page (Page 1)
-        print(f"  - Creating concept page")
-        html_content = create_html_page(concept_id)
-        page_id = generate_id()
-        resource_ids[concept_id] = page_id
-        filename = f"{concept_id}.html"
-
-        with open(f"{output_dir}/wiki_content/{filename}", 'w') as f:
-            f.write(html_content)
-
-        # Create video page (Page 2)
-        print(f"  - Creating video page with Brad Harrison content")
-        video_content = create_video_page(concept_id)
-        video_page_id = generate_id()
-        video_resource_ids[concept_id] = video_page_id
-        video_filename = f"{concept_id}-video.html"
-
-        with open(f"{output_dir}/wiki_content/{video_filename}", 'w') as f:
-            f.write(video_content)
-
-# Create manifest XML
-print("\nGenerating imsmanifest.xml...")
-
-manifest = Element('manifest')
-manifest.set('identifier', generate_id())
-manifest.set('xmlns', 'http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1')
-manifest.set('xmlns:lom', 'http://ltsc.ieee.org/xsd/imsccv1p1/LOM/resource')
-manifest.set('xmlns:lomimscc', 'http://ltsc.ieee.org/xsd/imsccv1p1/LOM/manifest')
-manifest.set('xmlns:xsi', 'http://www.w3.org/2001/XMLSchema-instance')
-
-# Metadata
-metadata = SubElement(manifest, 'metadata')
-schema = SubElement(metadata, 'schema')
-schema.text = 'IMS Common Cartridge'
-schemaversion = SubElement(metadata, 'schemaversion')
-schemaversion.text = '1.1.0'
-
-lom_meta = SubElement(metadata, 'lom:lom')
-general = SubElement(lom_meta, 'lom:general')
-title_elem = SubElement(general, 'lom:title')
-title_string = SubElement(title_elem, 'lom:string')
-title_string.text = 'Comprehensive Music Theory Course'
-
-# Organizations (module structure)
-organizations = SubElement(manifest, 'organizations')
-org = SubElement(organizations, 'organization')
-org.set('identifier', 'org_1')
-org.set('structure', 'rooted-hierarchy')
-
-org_title = SubElement(org, 'title')
-org_title.text = 'Comprehensive Music Theory Course'
-
-# Add each concept as its own section/module with 2 pages
-for concept_id in concept_order:
-    if concept_id in concepts and concept_id in resource_ids:
-        # Create a section/module for this concept
-        section = SubElement(org, 'item')
-        section.set('identifier', generate_id())
-
-        section_title = SubElement(section, 'title')
-        section_title.text = concepts[concept_id]['name']
-
-        # Add Page 1: Concept explanation
-        page1 = SubElement(section, 'item')
-        page1.set('identifier', generate_id())
-        page1.set('identifierref', resource_ids[concept_id])
-
-        page1_title = SubElement(page1, 'title')
-        page1_title.text = f"Lesson: {concepts[concept_id]['name']}"
-
-        # Add Page 2: Video from Brad Harrison
-        page2 = SubElement(section, 'item')
-        page2.set('identifier', generate_id())
-        page2.set('identifierref', video_resource_ids[concept_id])
-
-        page2_title = SubElement(page2, 'title')
-        page2_title.text = f"Video: {concepts[concept_id]['name']}"
-
-# Resources section
-resources = SubElement(manifest, 'resources')
-
-# Add concept page resources
-for concept_id, page_id in resource_ids.items():
-    resource = SubElement(resources, 'resource')
-    resource.set('identifier', page_id)
-    resource.set('type', 'webcontent')
-
-    file_elem = SubElement(resource, 'file')
-    file_elem.set('href', f"wiki_content/{concept_id}.html")
-
-# Add video page resources
-for concept_id, video_page_id in video_resource_ids.items():
-    resource = SubElement(resources, 'resource')
-    resource.set('identifier', video_page_id)
-    resource.set('type', 'webcontent')
-
-    file_elem = SubElement(resource, 'file')
-    file_elem.set('href', f"wiki_content/{concept_id}-video.html")
-
-# Write manifest
-manifest_xml = minidom.parseString(tostring(manifest)).toprettyxml(indent="  ")
-with open(f"{output_dir}/imsmanifest.xml", 'w') as f:
-    f.write(manifest_xml)
-
-# Create course settings file
-course_settings = {
-    "course_name": "Comprehensive Music Theory Course",
-    "course_code": "MUSIC-THEORY-101",
-    "start_date": datetime.now().isoformat(),
-    "conclude_date": None,
-    "is_public": False,
-    "syllabus_body": "<h2>Welcome to Comprehensive Music Theory!</h2><p>This course covers all fundamental and advanced concepts in music theory, from basic sound properties to advanced harmonic analysis.</p>",
-    "grading_standard_enabled": True,
-    "course_format": "online"
-}
+            w.element('response_str', attrs={'ident': 'response1', 'rcardinality': 'Single'})
+
+        w.end()
+        w.end()
+
+    w.close()
+    return out.getvalue()
+
+# Pages generated for every concept, in module order:
+# (kind, manifest title label, filename template, renderer)
+PAGE_TYPES = [
+    ('lesson', 'Lesson', '{}.html', create_html_page),
+    ('video', 'Video', '{}-video.html', create_video_page),
+]
+
+_source_digests = {}
 
-with open(f"{output_dir}/course_settings.json", 'w') as f:
-    json.dump(course_settings, f, indent=2)
-
-# Create the .imscc package (ZIP file)
-print("\nCreating .imscc package...")
-package_name = "music_theory_course.imscc"
-
-with zipfile.ZipFile(package_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-    for root, dirs, files in os.walk(output_dir):
-        for file in files:
-            file_path = os.path.join(root, file)
-            arcname = os.path.relpath(file_path, output_dir)
-            zipf.write(file_path, arcname)
-
-print(f"\n{'='*60}")
-print(f"SUCCESS! Course package created: {package_name}")
-print(f"{'='*60}")
-print(f"\nCourse Statistics:")
-print(f"  - Total Sections (one per concept): {len(concept_order)}")
-print(f"  - Total Concept Pages: {len(resource_ids)}")
-print(f"  - Total Video Pages: {len(video_resource_ids)}")
-print(f"  - Total Pages: {len(resource_ids) + len(video_resource_ids)}")
-print(f"\nCourse Structure:")
-print(f"  Each atomic concept is now its own section with:")
-print(f"    • Page 1: Detailed lesson content")
-print(f"    • Page 2: Brad Harrison YouTube video")
-print(f"\nTo import into Canvas:")
-print(f"  1. Log into Canvas")
-print(f"  2. Go to your course")
-print(f"  3. Navigate to Settings > Import Course Content")
-print(f"  4. Select 'Common Cartridge 1.x Package'")
-print(f"  5. Upload the file: {package_name}")
-print(f"  6. Click 'Import'")
-print(f"\nPackage location: {os.path.abspath(package_name)}")
+def page_inputs(concept_id, kind):
+    """Collect everything that a page's rendered output depends on"""
+    c = concepts[concept_id]
+    if kind == 'lesson':
+        # create_html_page embeds the names of prerequisites and related
+        # concepts, so renaming one of them has to invalidate this page too
+        return {
+            'concept': c.to_dict(),
+            'prerequisite_names': [concepts[p].name for p in c.prerequisites],
+            'related_names': [concepts[r].name if r in concepts else r for r in c.related_concepts],
+        }
+    if kind == 'video':
+        return {
+            'name': c.name,
+            'search_query': brad_harrison_videos.get(concept_id, c.name),
+            'eager_video': eager_video,
+        }
+    return {'concept': c.to_dict()}
+
+def page_resources(kind):
+    """The shared styles and scripts a page of this kind links to"""
+    if kind == 'video' and eager_video:
+        return (VIDEO_CSS,)
+    return PAGE_RESOURCES.get(kind, ())
+
+def source_digest(obj):
+    """Hash the source code of a function or module"""
+    if obj not in _source_digests:
+        source = inspect.getsource(obj).encode('utf-8')
+        _source_digests[obj] = hashlib.sha256(source).hexdigest()
+    return _source_digests[obj]
+
+def page_hash(concept_id, kind, renderer):
+    """Hash a page's inputs together with the source of its renderer
+
+    The hashed names of the shared resources it links to count as inputs,
+    so editing a stylesheet re-renders the pages that link it; so does the
+    minifier's source when pages are minified.
+    """
+    inputs = [page_inputs(concept_id, kind), [r.filename for r in page_resources(kind)]]
+    if minify_pages:
+        inputs.append(source_digest(inspect.getmodule(minify_html)))
+    payload = json.dumps(inputs, sort_keys=True)
+    return hashlib.sha256(f"{source_digest(renderer)}\n{payload}".encode('utf-8')).hexdigest()
+
+def load_build_manifest(output_dir):
+    """Load the build manifest left by a previous run, or start an empty one"""
+    manifest = {}
+    if output_dir is not None:
+        try:
+            with open(os.path.join(output_dir, BUILD_MANIFEST), 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    if manifest.get('version') != BUILD_MANIFEST_VERSION:
+        manifest = {'version': BUILD_MANIFEST_VERSION, 'pages': {}, 'ids': {}}
+    return manifest
+
+def save_build_manifest(output_dir, manifest):
+    """Atomically write the build manifest for the next run"""
+    path = os.path.join(output_dir, BUILD_MANIFEST)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+def stable_id(previous_ids, ids, key, name_based=False):
+    """Reuse the identifier from the previous build so the manifest stays stable
+
+    With name_based the identifier is derived from the key alone, so it does
+    not depend on any earlier build.
+    """
+    if name_based:
+        ids[key] = name_based_id(key)
+    else:
+        ids[key] = previous_ids.get(key) or generate_id()
+    return ids[key]
+
+def init_worker(concepts_by_id, eager=False, minify=False):
+    """Give a render worker process its own copy of the concepts and the page settings"""
+    global concepts, eager_video, minify_pages
+    concepts = concepts_by_id
+    eager_video = eager
+    minify_pages = minify
+    set_minified(minify)
+
+def render_page(task):
+    """Render one (renderer, concept_id[, context]) page; runs in a worker when --jobs > 1
+
+    context maps concept ids to the concepts the page reads, for streamed
+    builds where no process holds every concept; they are in place only
+    while the page renders. Returns the page and its size in bytes as
+    rendered, before any minification.
+    """
+    renderer, concept_id, *context = task
+    if not context:
+        html = renderer(concept_id)
+    else:
+        saved = {key: concepts.get(key) for key in context[0]}
+        concepts.update(context[0])
+        try:
+            html = renderer(concept_id)
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    del concepts[key]
+                else:
+                    concepts[key] = value
+
+    size = len(html.encode('utf-8'))
+    if minify_pages:
+        html = minify_html(html)
+    return html, size
+
+def minified_sizes(html, size, sizes):
+    """Record a rendered page's size before and after minifying; returns the
+    note printed after its name"""
+    if not minify_pages:
+        return ''
+    sizes.append((size, len(html.encode('utf-8'))))
+    return f" ({size_report(*sizes[-1])})"
+
+def report_minified(sizes):
+    """Print the total size of the minified pages"""
+    if sizes:
+        before, after = map(sum, zip(*sizes))
+        print(f"  Minified {len(sizes)} pages: {size_report(before, after)}")
+
+def build_pages(concept_ids, output_dir, previous_pages, jobs=1,
+                chunk_size=DEFAULT_CHUNK_SIZE, package=None, page_types=PAGE_TYPES):
+    """Render every page whose inputs changed since the previous build
+
+    Pages are written to output_dir unless it is None. When a package writer
+    is given, every page (freshly rendered or reused from output_dir) is also
+    added to it, in concept order.
+    """
+    pages = {}
+    plan = []
+
+    for concept_id in concept_ids:
+        for kind, _, template, renderer in page_types:
+            filename = f"wiki_content/{template.format(concept_id)}"
+            digest = page_hash(concept_id, kind, renderer)
+            pages[filename] = digest
+
+            stale = (output_dir is None
+                     or previous_pages.get(filename) != digest
+                     or not os.path.exists(os.path.join(output_dir, filename)))
+            plan.append((filename, kind, renderer, concept_id, stale))
+
+    # Render the stale pages, in parallel when requested; results come back
+    # in the order they were submitted
+    tasks = [(renderer, concept_id) for _, _, renderer, concept_id, stale in plan if stale]
+    results = render_all(render_page, tasks, jobs=jobs, chunk_size=chunk_size,
+                         initializer=init_worker, initargs=(concepts, eager_video, minify_pages))
+
+    sizes = []
+    for filename, kind, _, concept_id, stale in plan:
+        if stale:
+            html, size = next(results)
+            note = minified_sizes(html, size, sizes)
+            print(f"  - Rendered {kind} page: {concepts[concept_id].name}{note}")
+            if output_dir is not None:
+                with open(os.path.join(output_dir, filename), 'w') as f:
+                    f.write(html)
+            if package is not None:
+                package.add(filename, html)
+        elif package is not None:
+            package.add_file(filename, os.path.join(output_dir, filename))
+
+    report_minified(sizes)
+
+    # Drop pages whose concept has been removed or renamed
+    removed = 0
+    if output_dir is not None:
+        for filename in sorted(previous_pages.keys() - pages.keys()):
+            path = os.path.join(output_dir, filename)
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+
+    return pages, len(tasks), removed
+
+def stream_pages(concepts_file, output_dir, previous_pages, jobs=1,
+                 chunk_size=DEFAULT_CHUNK_SIZE, page_types=PAGE_TYPES, selected=None):
+    """Render pages while a JSON Lines concepts file is still being read
+
+    A concept's pages are rendered as soon as the lines of all the concepts
+    it mentions have been read, or at the end of the file for related
+    concepts that never appear. Only a skeleton of each concept and the
+    position of its latest line are kept; when a later line adds, edits or
+    deletes a concept, the pages that mention it are re-read from the file
+    and re-rendered if their inputs changed. Returns (pages, rendered, removed,
+    graph), the graph being built from the skeletons.
+    """
+    global concepts
+    concepts = {}
+    lines = {}
+    waiting = collections.defaultdict(set)
+    referrers = collections.defaultdict(set)
+    relationships = []
+    pages = {}
+    scheduled = set()
+    pending = collections.deque()
+
+    def evaluate(concept_id, concept, final=False):
+        """Yield render tasks for the pages of concept whose inputs changed"""
+        prerequisites = concept.prerequisites
+        references = prerequisites + concept.related_concepts
+        missing = [r for r in (prerequisites if final else references) if r not in lines]
+        for r in missing:
+            waiting[r].add(concept_id)
+        for reference in references:
+            referrers[reference].add(concept_id)
+        if missing or (selected is not None and concept_id not in selected):
+            return
+
+        context = {reference: concepts[reference] for reference in references if reference in concepts}
+        context[concept_id] = concept
+        # page_hash reads the full concept; afterwards only its skeleton stays
+        concepts[concept_id] = concept
+        try:
+            for kind, _, template, renderer in page_types:
+                filename = f"wiki_content/{template.format(concept_id)}"
+                digest = page_hash(concept_id, kind, renderer)
+                if pages.get(filename) == digest:
+                    continue
+                pages[filename] = digest
+                if (filename not in scheduled and previous_pages.get(filename) == digest
+                        and os.path.exists(os.path.join(output_dir, filename))):
+                    continue
+                scheduled.add(filename)
+                pending.append((filename, kind, concept.name))
+                yield renderer, concept_id, context
+        finally:
+            concepts[concept_id] = concept.skeleton()
+
+    def tasks(source):
+        def reread(concept_id):
+            return Concept.from_dict(read_record(source, *lines[concept_id]))
+
+        for kind, record, offset, length in iter_records(concepts_file, jobs):
+            if kind == 'relationship':
+                if record.get('deleted'):
+                    relationships[:] = [r for r in relationships
+                                        if (r.from_id, r.to_id) != (record['from'], record['to'])]
+                else:
+                    relationships.append(Relationship.from_dict(record))
+                continue
+            if kind != 'concept':
+                continue
+
+            concept_id = record['id']
+            if record.get('deleted'):
+                lines.pop(concept_id, None)
+                concepts.pop(concept_id, None)
+                for _, _, template, _ in page_types:
+                    pages.pop(f"wiki_content/{template.format(concept_id)}", None)
+            else:
+                concept = Concept.from_dict(record)
+                lines[concept_id] = (offset, length)
+                concepts[concept_id] = concept.skeleton()
+                yield from evaluate(concept_id, concept)
+
+            # Concepts waiting for this one can render now, and pages that
+            # mention it may need its new name
+            dependents = waiting.pop(concept_id, set()) | referrers.get(concept_id, set())
+            for dependent in sorted(dependents - {concept_id}):
+                if dependent in lines:
+                    yield from evaluate(dependent, reread(dependent))
+
+        # Related concepts that never appeared only leave a gap on the page
+        stalled = set().union(*waiting.values())
+        for concept_id in [c for c in lines if c in stalled]:
+            yield from evaluate(concept_id, reread(concept_id), final=True)
+
+    with open(concepts_file, 'rb') as source:
+        results = render_all(render_page, tasks(source), jobs=jobs, chunk_size=chunk_size,
+                             initializer=init_worker, initargs=({}, eager_video, minify_pages))
+        sizes = []
+        for html, size in results:
+            filename, kind, name = pending.popleft()
+            note = minified_sizes(html, size, sizes)
+            print(f"  - Rendered {kind} page: {name}{note}")
+            with open(os.path.join(output_dir, filename), 'w') as f:
+                f.write(html)
+    report_minified(sizes)
+
+    unresolved = {}
+    for p in sorted(waiting):
+        needed_by = sorted(d for d in waiting[p] if d in lines and p in concepts[d].prerequisites)
+        if needed_by:
+            unresolved[p] = needed_by
+    if unresolved:
+        raise ValueError("unknown prerequisites: " + "; ".join(
+            f"{p} (needed by {', '.join(ids)})" for p, ids in unresolved.items()))
+
+    # Drop pages of concepts that were deleted or whose page was superseded
+    removed = 0
+    for filename in sorted((previous_pages.keys() | scheduled) - pages.keys()):
+        path = os.path.join(output_dir, filename)
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+
+    # A page rendered more than once, say after a concept it mentions
+    # arrived, counts once
+    rendered = len(scheduled & pages.keys())
+    graph = ConceptGraph([concepts[concept_id] for concept_id in lines], relationships)
+    return pages, rendered, removed, graph
+
+def write_manifest(stream, concept_ids, previous_ids, ids, page_types=PAGE_TYPES, name_based=False):
+    """Stream the imsmanifest.xml document with one section per concept"""
+    def assign_id(key):
+        return stable_id(previous_ids, ids, key, name_based)
+
+    manifest = ManifestWriter(stream, assign_id('manifest'), 'Comprehensive Music Theory Course')
+
+    # Each shared style or script is one resource, listed as a dependency
+    # of the pages that link it
+    dependencies = {}
+    for kind, _, _, _ in page_types:
+        dependencies[kind] = []
+        for resource in page_resources(kind):
+            key = f"resource:{resource.filename}"
+            if key not in ids:
+                manifest.add_resource(assign_id(key), resource.filename)
+            dependencies[kind].append(ids[key])
+
+    # Add each concept as its own section/module with one item per page type:
+    # Page 1: Concept explanation, Page 2: Video from Brad Harrison, ...
+    for concept_id in concept_ids:
+        name = concepts[concept_id].name
+        section_pages = []
+        for kind, label, template, _ in page_types:
+            filename = f"wiki_content/{template.format(concept_id)}"
+            section_pages.append((
+                assign_id(f"item:{filename}"),
+                assign_id(f"resource:{filename}"),
+                f"{label}: {name}",
+                filename,
+                dependencies[kind],
+            ))
+        manifest.add_section(assign_id(f"section:{concept_id}"), name, section_pages)
+
+    manifest.close()
+
+def create_course_settings(start_date=None):
+    """Create the course settings file contents; start_date defaults to now"""
+    return {
+        "course_name": "Comprehensive Music Theory Course",
+        "course_code": "MUSIC-THEORY-101",
+        "start_date": start_date or datetime.now().isoformat(),
+        "conclude_date": None,
+        "is_public": False,
+        "syllabus_body": "<h2>Welcome to Comprehensive Music Theory!</h2><p>This course covers all fundamental and advanced concepts in music theory, from basic sound properties to advanced harmonic analysis.</p>",
+        "grading_standard_enabled": True,
+        "course_format": "online"
+    }
+
+def create_package(output_dir, files, package_name, policy=None, workers=1, **options):
+    """Create the .imscc package (ZIP file) from the given files of the output directory
+
+    files are paths relative to output_dir; anything else found there (such
+    as pages left by another script) is skipped with a warning, since the
+    manifest does not reference it. Extra options (date_time, sort_entries,
+    comment) go to CartridgeWriter.
+    """
+    files = sorted(files)
+    recorded = set(files) | {BUILD_MANIFEST}
+    skipped = []
+    for root, dirs, names in os.walk(output_dir):
+        for name in names:
+            arcname = os.path.relpath(os.path.join(root, name), output_dir).replace(os.sep, '/')
+            if arcname not in recorded:
+                skipped.append(arcname)
+    if skipped:
+        print(f"Warning: skipping {len(skipped)} files in {output_dir} that this build did not produce, "
+              f"e.g. {sorted(skipped)[0]}")
+
+    with CartridgeWriter(package_name, policy, workers, **options) as package:
+        for arcname in files:
+            package.add_file(arcname, os.path.join(output_dir, arcname))
+
+def build_date():
+    """Timestamp for deterministic builds: SOURCE_DATE_EPOCH when set, else DEFAULT_BUILD_DATE"""
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if epoch:
+        return datetime.fromtimestamp(int(epoch), tz=timezone.utc)
+    return DEFAULT_BUILD_DATE
+
+def input_hash(concepts_file, page_types, settings):
+    """Hash everything a deterministic package is built from
+
+    Covers the concepts file, the settings that shape the package and the
+    source of every module loaded from this directory, so editing a
+    renderer or the packaging code invalidates the cached package.
+    """
+    digest = hashlib.sha256()
+    with open(concepts_file, 'rb') as f:
+        digest.update(f.read())
+    digest.update(json.dumps({
+        'settings': settings,
+        'page_types': [(kind, label, template) for kind, label, template, _ in page_types],
+    }, sort_keys=True).encode('utf-8'))
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    sources = {os.path.abspath(module.__file__) for module in list(sys.modules.values())
+               if getattr(module, '__file__', None)}
+    for path in sorted(sources):
+        if os.path.dirname(path) == here and path.endswith('.py'):
+            digest.update(os.path.basename(path).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+def package_hash(package_name):
+    """Return the input hash recorded in an existing package, or None"""
+    try:
+        with zipfile.ZipFile(package_name) as zipf:
+            comment = zipf.comment
+    except (OSError, zipfile.BadZipFile):
+        return None
+    if comment.startswith(PACKAGE_HASH_PREFIX):
+        return comment[len(PACKAGE_HASH_PREFIX):].decode('ascii')
+    return None
+
+@contextlib.contextmanager
+def timed_stage(timings, name):
+    """Add the time spent in the enclosed block to timings[name]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+def build_course(args, sink, page_types=PAGE_TYPES):
+    """Generate the course pages, manifest and settings and package them into sink"""
+    global concepts, eager_video, minify_pages
+    timings = {}
+    eager_video = args.eager_video
+    minify_pages = args.minify
+    set_minified(args.minify)
+
+    # A JSON Lines source is rendered while it is read (see stream_pages);
+    # any other source is loaded up front
+    streaming_input = is_jsonl_path(args.concepts)
+    if not streaming_input:
+        with timed_stage(timings, 'Load concepts'):
+            graph = ConceptGraph.load(args.concepts)
+            concepts = graph.concepts
+    output_dir = None if args.no_tree else args.output_dir
+
+    # Deterministic builds pin every identifier, timestamp and the entry
+    # order, so identical inputs give a byte-identical package. The input
+    # hash goes into the package comment; when the existing package already
+    # carries it there is nothing to rebuild.
+    options = {}
+    start_date = args.start_date
+    if args.deterministic:
+        when = build_date()
+        start_date = start_date or when.date().isoformat()
+        digest = input_hash(args.concepts, page_types, {
+            'compression': args.compression,
+            'date_time': when.isoformat(),
+            'start_date': start_date,
+            'select': args.select,
+            'facets': args.facets,
+            'eager_video': args.eager_video,
+            'minify': args.minify,
+        })
+        if sink is args.package and not args.clean and package_hash(sink) == digest:
+            print(f"Package {sink} is up to date (input hash {digest[:12]}), nothing to build")
+            return
+        options = {
+            'date_time': when.timetuple()[:6],
+            'sort_entries': True,
+            'comment': PACKAGE_HASH_PREFIX + digest.encode('ascii'),
+        }
+    course_settings = create_course_settings(start_date)
+
+    # Pages streamed from JSON Lines can be re-rendered by later edits, so
+    # they are spooled to disk even without a tree and packaged at the end
+    spool = None
+    if streaming_input and output_dir is None:
+        spool = tempfile.TemporaryDirectory(prefix='course-')
+        output_dir = spool.name
+
+    # Create output directory structure, keeping pages from the previous
+    # build unless a clean rebuild was requested
+    if output_dir is not None:
+        if args.clean and os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+
+        os.makedirs(f"{output_dir}/wiki_content", exist_ok=True)
+        os.makedirs(f"{output_dir}/assessment_questions", exist_ok=True)
+
+    previous = load_build_manifest(None if args.no_tree else output_dir)
+    selected = set(select_concept_ids(args.concepts, args.select)) if args.select else None
+    if args.facets:
+        matches = set(load_facet_index(args.concepts).select(args.facets))
+        selected = matches if selected is None else selected & matches
+
+    def order_concepts():
+        # Each concept becomes its own section/module, in learning order:
+        # prerequisites first, easier concepts first among those that are ready
+        with timed_stage(timings, 'Order concepts'):
+            concept_ids = graph.topological_order()
+            if selected is not None:
+                # Build a subset; the other concepts stay loaded so
+                # prerequisite names still resolve
+                concept_ids = [concept_id for concept_id in concept_ids if concept_id in selected]
+            return concept_ids, graph.cycles()
+
+    def report(concept_ids, cycles):
+        # Keep the prerequisite closure next to the concepts file current for
+        # the player; it is only recomputed when the concepts file changed
+        with timed_stage(timings, 'Prerequisite closure'):
+            closure, rebuilt = PrerequisiteClosure.load_or_build(args.concepts)
+        with timed_stage(timings, 'Player data'):
+            player_data = build_player_data(args.concepts)
+
+        print(f"Total concepts: {len(concepts)}")
+        if selected is not None:
+            print(f"Selected concepts: {len(concept_ids)}")
+        print(f"Each concept will be its own section with {len(page_types)} pages")
+        for cycle in cycles:
+            print(f"Warning: circular prerequisites among {', '.join(cycle)}; ordered by difficulty")
+        if rebuilt:
+            print(f"Updated prerequisite closure: {closure_path(args.concepts)}")
+        if player_data:
+            print(f"Updated player data: {player_data_dir(args.concepts)}")
+
+    # Generate all content
+    print("Generating Canvas course package...")
+    if not streaming_input:
+        concept_ids, cycles = order_concepts()
+        report(concept_ids, cycles)
+
+    # In streaming mode every entry goes straight into the archive as it is
+    # produced instead of being packaged from the on-disk tree afterwards
+    policy = CompressionPolicy(args.compression)
+    if args.stream and not streaming_input:
+        streaming = CartridgeWriter(sink, policy, args.compress_workers, **options)
+    else:
+        streaming = contextlib.nullcontext()
+    with streaming as package:
+        # Create the pages for each concept
+        print("\nRendering changed pages...")
+        with timed_stage(timings, 'Render pages'):
+            if streaming_input:
+                pages, rendered, removed, graph = stream_pages(
+                    args.concepts, output_dir, previous['pages'], jobs=args.jobs,
+                    chunk_size=args.chunk_size, page_types=page_types, selected=selected)
+            else:
+                pages, rendered, removed = build_pages(concept_ids, output_dir, previous['pages'],
+                                                       jobs=args.jobs, chunk_size=args.chunk_size,
+                                                       package=package, page_types=page_types)
+        print(f"  Rendered {rendered} pages, reused {len(pages) - rendered}, removed {removed}")
+
+        # The styles and scripts the pages link to, each stored once
+        resources = {resource.filename: resource for kind, _, _, _ in page_types
+                     for resource in page_resources(kind)}
+        if output_dir is not None:
+            write_resources(resources.values(), output_dir)
+            for filename in sorted(set(previous.get('resources', [])) - resources.keys()):
+                path = os.path.join(output_dir, filename)
+                if os.path.exists(path):
+                    os.remove(path)
+        if package is not None:
+            for filename, resource in resources.items():
+                package.add(filename, resource.text)
+
+        if streaming_input:
+            print()
+            concepts = graph.concepts
+            concept_ids, cycles = order_concepts()
+            report(concept_ids, cycles)
+
+        # Create manifest XML, streamed straight to its destination
+        print("\nGenerating imsmanifest.xml...")
+        ids = {}
+        settings_json = json.dumps(course_settings, indent=2)
+
+        with timed_stage(timings, 'Write manifest'):
+            if output_dir is not None:
+                with open(f"{output_dir}/imsmanifest.xml", 'w') as f:
+                    write_manifest(f, concept_ids, previous['ids'], ids, page_types, args.deterministic)
+
+                with open(f"{output_dir}/course_settings.json", 'w') as f:
+                    f.write(settings_json)
+
+                save_build_manifest(output_dir, {'version': BUILD_MANIFEST_VERSION, 'pages': pages, 'ids': ids,
+                                                  'resources': sorted(resources)})
+
+            if package is not None:
+                print("\nFinishing streamed .imscc package...")
+                if output_dir is not None:
+                    package.add_file('imsmanifest.xml', f"{output_dir}/imsmanifest.xml")
+                else:
+                    with package.open('imsmanifest.xml') as f:
+                        write_manifest(f, concept_ids, previous['ids'], ids, page_types, args.deterministic)
+                package.add('course_settings.json', settings_json)
+
+    if package is None:
+        # Create the .imscc package (ZIP file)
+        print("\nCreating .imscc package...")
+        with timed_stage(timings, 'Package'):
+            files = [*pages, *resources, 'imsmanifest.xml', 'course_settings.json']
+            create_package(output_dir, files, sink, policy, args.compress_workers, **options)
+        if spool is not None:
+            spool.cleanup()
+
+    package_name = 'stdout' if sink is not args.package else args.package
+    print(f"\n{'='*60}")
+    print(f"SUCCESS! Course package created: {package_name}")
+    print(f"{'='*60}")
+    print(f"\nCourse Statistics:")
+    print(f"  - Total Sections (one per concept): {len(concept_ids)}")
+    for _, label, _, _ in page_types:
+        print(f"  - Total {label} Pages: {len(concept_ids)}")
+    print(f"  - Total Pages: {len(pages)}")
+    print(f"\nCourse Structure:")
+    print(f"  Each atomic concept is now its own section with:")
+    for number, (_, label, _, _) in enumerate(page_types, 1):
+        print(f"    • Page {number}: {label}")
+    print(f"\nBuild Stages:")
+    for name, seconds in timings.items():
+        print(f"  - {name}: {seconds:.2f}s")
+    print(f"\nTo import into Canvas:")
+    print(f"  1. Log into Canvas")
+    print(f"  2. Go to your course")
+    print(f"  3. Navigate to Settings > Import Course Content")
+    print(f"  4. Select 'Common Cartridge 1.x Package'")
+    print(f"  5. Upload the file: {package_name}")
+    print(f"  6. Click 'Import'")
+    if sink is args.package:
+        print(f"\nPackage location: {os.path.abspath(package_name)}")
+
+def iso_date(value):
+    """argparse type for YYYY-MM-DD dates"""
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD")
+
+def add_build_arguments(parser):
+    """Add the options shared by generate_canvas_course.py and build_course.py"""
+    parser.add_argument('--concepts', default=CONCEPTS_FILE,
+                        help="Concepts JSON file or concept database (default: %(default)s)")
+    parser.add_argument('--select', metavar='SQL',
+                        help="Only build the concepts whose ids this query returns, e.g. "
+                             "\"SELECT id FROM concepts WHERE difficulty <= 3\" (see concept_store.py)")
+    parser.add_argument('--facets', metavar='QUERY',
+                        help="Only build the concepts matching a facet query, e.g. "
+                             "\"rhythm AND difficulty<=2 AND NOT advanced\" (see facet_index.py)")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR,
+                        help="Directory for the unpacked course (default: %(default)s)")
+    parser.add_argument('--package', default=PACKAGE_NAME,
+                        help="Path of the .imscc package to create, or - for stdout (default: %(default)s)")
+    parser.add_argument('--clean', action='store_true',
+                        help="Discard the previous build and re-render every page")
+    parser.add_argument('--deterministic', action='store_true',
+                        help="Build a reproducible package (name-based ids, fixed timestamps from "
+                             "SOURCE_DATE_EPOCH, sorted entries) and reuse it when the inputs are unchanged")
+    parser.add_argument('--start-date', type=iso_date,
+                        help="Course start date (YYYY-MM-DD); defaults to now, or to the build date "
+                             "with --deterministic")
+    parser.add_argument('--eager-video', action='store_true',
+                        help="Embed the YouTube player on every video page instead of loading it "
+                             "when the student presses play")
+    parser.add_argument('--minify', action='store_true',
+                        help="Minify the pages and shared styles and scripts (see minify.py), "
+                             "reporting each page's size before and after")
+    add_jobs_arguments(parser)
+    add_compression_arguments(parser)
+
+def run_build(args, page_types=PAGE_TYPES):
+    """Build into args.package, sending progress to stderr when the package goes to stdout"""
+    if args.package == '-':
+        # stdout carries the package bytes, so progress goes to stderr
+        sink = sys.stdout.buffer
+        with contextlib.redirect_stdout(sys.stderr):
+            build_course(args, sink, page_types)
+    else:
+        build_course(args, args.package, page_types)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate an IMS Common Cartridge package from music-theory-concepts.json")
+    add_build_arguments(parser)
+    parser.add_argument('--stream', action='store_true',
+                        help="Write entries straight into the package instead of zipping the output directory")
+    parser.add_argument('--no-tree', action='store_true',
+                        help="With --stream, do not write the unpacked course to --output-dir")
+    args = parser.parse_args()
+
+    if args.no_tree and not args.stream:
+        parser.error("--no-tree requires --stream")
+
+    run_build(args)
+
+if __name__ == '__main__':
+    main()
@@ -3,14 +3,157 @@
 Generate unique, concept-specific HTML visualizations for music theory concepts.
 """
 
-import json
+import argparse
 import os
 
+from build_player_data import load_facet_index
+from concept_graph import ConceptGraph
+from concept_store import select_concept_ids
+from parallel_render import add_jobs_arguments, render_all
+from minify import minify_html, size_report
+from web_resources import PAGE_RESOURCES, WebResource, set_minified, write_resources
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Set by init_worker() in the main process and in every render worker
+minify_pages = False
+
+
+# Styles shared by every visualization page
+VISUALIZATION_CSS = WebResource('visualization.css', """\
+* {
+    margin: 0;
+    padding: 0;
+    box-sizing: border-box;
+}
+body {
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    min-height: 100vh;
+    display: flex;
+    justify-content: center;
+    align-items: center;
+    padding: 20px;
+}
+.container {
+    background: white;
+    border-radius: 20px;
+    padding: 30px;
+    box-shadow: 0 20px 60px rgba(0, 0, 0, 0.3);
+    max-width: 900px;
+    width: 100%;
+}
+h1 {
+    color: #667eea;
+    margin-bottom: 10px;
+    font-size: 28px;
+}
+.instructions {
+    color: #666;
+    margin-bottom: 20px;
+    padding: 15px;
+    background: #f8f9ff;
+    border-radius: 10px;
+    border-left: 4px solid #667eea;
+}
+.controls {
+    margin: 20px 0;
+    display: flex;
+    flex-wrap: wrap;
+    gap: 10px;
+    align-items: center;
+}
+button {
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    color: white;
+    border: none;
+    padding: 12px 24px;
+    border-radius: 8px;
+    cursor: pointer;
+    font-size: 16px;
+    transition: transform 0.2s, box-shadow 0.2s;
+    font-weight: 600;
+}
+button:hover {
+    transform: translateY(-2px);
+    box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
+}
+button:active {
+    transform: translateY(0);
+}
+button:disabled {
+    opacity: 0.5;
+    cursor: not-allowed;
+}
+input[type="range"] {
+    flex: 1;
+    min-width: 150px;
+}
+label {
+    color: #333;
+    font-weight: 600;
+    margin-right: 10px;
+}
+select {
+    padding: 8px 12px;
+    border: 2px solid #667eea;
+    border-radius: 6px;
+    font-size: 14px;
+    cursor: pointer;
+}
+canvas {
+    border: 2px solid #e0e0e0;
+    border-radius: 10px;
+    margin: 20px 0;
+    display: block;
+    width: 100%;
+    background: white;
+}
+.value-display {
+    color: #667eea;
+    font-weight: bold;
+    min-width: 60px;
+}
+""")
+
+# Web Audio helpers shared by the visualizations: one AudioContext per page,
+# created on first use, and tones that fade out and stop on their own
+AUDIO_JS = WebResource('audio.js', """\
+let sharedAudioContext = null;
+
+function getAudioContext() {
+    if (!sharedAudioContext) {
+        sharedAudioContext = new (window.AudioContext || window.webkitAudioContext)();
+    }
+    return sharedAudioContext;
+}
+
+// Play a tone after options.delay seconds; with options.duration it fades
+// to silence by options.fade (default: the duration) and stops.
+function playTone(frequency, options = {}) {
+    const audioContext = getAudioContext();
+    const oscillator = audioContext.createOscillator();
+    const gainNode = audioContext.createGain();
+
+    oscillator.frequency.value = frequency;
+    oscillator.type = options.type || 'sine';
+    gainNode.gain.value = options.gain === undefined ? 0.3 : options.gain;
+
+    oscillator.connect(gainNode);
+    gainNode.connect(audioContext.destination);
+
+    const start = audioContext.currentTime + (options.delay || 0);
+    oscillator.start(start);
+    if (options.duration !== undefined) {
+        const fade = options.fade === undefined ? options.duration : options.fade;
+        gainNode.gain.exponentialRampToValueAtTime(0.01, start + fade);
+        oscillator.stop(start + options.duration);
+    }
+    return oscillator;
+}
+""")
 
-def load_concepts(filepath):
-    """Load concepts from JSON file."""
-    with open(filepath, 'r') as f:
-        return json.load(f)
+PAGE_RESOURCES['visualization'] = (VISUALIZATION_CSS, AUDIO_JS)
 
 
 def get_base_html(title, instructions, content, script):
@@ -21,101 +164,7 @@ def get_base_html(title, instructions, content, script):
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{title}</title>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            padding: 20px;
-        }}
-        .container {{
-            background: white;
-            border-radius: 20px;
-            padding: 30px;
-            box-shadow: 0 20px 60px rgba(0, 0, 0, 0.3);
-            max-width: 900px;
-            width: 100%;
-        }}
-        h1 {{
-            color: #667eea;
-            margin-bottom: 10px;
-            font-size: 28px;
-        }}
-        .instructions {{
-            color: #666;
-            margin-bottom: 20px;
-            padding: 15px;
-            background: #f8f9ff;
-            border-radius: 10px;
-            border-left: 4px solid #667eea;
-        }}
-        .controls {{
-            margin: 20px 0;
-            display: flex;
-            flex-wrap: wrap;
-            gap: 10px;
-            align-items: center;
-        }}
-        button {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border: none;
-            padding: 12px 24px;
-            border-radius: 8px;
-            cursor: pointer;
-            font-size: 16px;
-            transition: transform 0.2s, box-shadow 0.2s;
-            font-weight: 600;
-        }}
-        button:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
-        }}
-        button:active {{
-            transform: translateY(0);
-        }}
-        button:disabled {{
-            opacity: 0.5;
-            cursor: not-allowed;
-        }}
-        input[type="range"] {{
-            flex: 1;
-            min-width: 150px;
-        }}
-        label {{
-            color: #333;
-            font-weight: 600;
-            margin-right: 10px;
-        }}
-        select {{
-            padding: 8px 12px;
-            border: 2px solid #667eea;
-            border-radius: 6px;
-            font-size: 14px;
-            cursor: pointer;
-        }}
-        canvas {{
-            border: 2px solid #e0e0e0;
-            border-radius: 10px;
-            margin: 20px 0;
-            display: block;
-            width: 100%;
-            background: white;
-        }}
-        .value-display {{
-            color: #667eea;
-            font-weight: bold;
-            min-width: 60px;
-        }}
-    </style>
+    {VISUALIZATION_CSS.tag()}
 </head>
 <body>
     <div class="container">
@@ -123,6 +172,7 @@ def get_base_html(title, instructions, content, script):
         <div class="instructions">{instructions}</div>
         {content}
     </div>
+    {AUDIO_JS.tag()}
     <script>
         {script}
     </script>
@@ -132,8 +182,8 @@ def get_base_html(title, instructions, content, script):
 
 def generate_waveform_visualization(concept):
     """Generate waveform visualization for sound/acoustics concepts."""
-    title = f"Interactive Waveform: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Adjust the frequency and amplitude sliders, select different wave types, and click Play to hear the sound."
+    title = f"Interactive Waveform: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Adjust the frequency and amplitude sliders, select different wave types, and click Play to hear the sound."
 
     content = """
         <canvas id="waveCanvas" width="800" height="300"></canvas>
@@ -173,7 +223,6 @@ def generate_waveform_visualization(concept):
         const playBtn = document.getElementById('playBtn');
         const stopBtn = document.getElementById('stopBtn');
 
-        let audioContext = null;
         let oscillator = null;
         let gainNode = null;
 
@@ -239,9 +288,7 @@ def generate_waveform_visualization(concept):
         waveType.addEventListener('change', updateDisplay);
 
         playBtn.addEventListener('click', () => {
-            if (!audioContext) {
-                audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            }
+            const audioContext = getAudioContext();
 
             if (oscillator) {
                 oscillator.stop();
@@ -274,8 +321,8 @@ def generate_waveform_visualization(concept):
 
 def generate_piano_keyboard_visualization(concept):
     """Generate piano keyboard visualization."""
-    title = f"Interactive Piano: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Click on the piano keys to play notes and explore the keyboard."
+    title = f"Interactive Piano: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Click on the piano keys to play notes and explore the keyboard."
 
     content = """
         <canvas id="pianoCanvas" width="800" height="250"></canvas>
@@ -291,7 +338,6 @@ def generate_piano_keyboard_visualization(concept):
         const showLabelsBtn = document.getElementById('showLabels');
         const highlightBtn = document.getElementById('highlightPattern');
 
-        let audioContext = null;
         let showLabels = true;
         let highlightKeys = [];
 
@@ -337,23 +383,7 @@ def generate_piano_keyboard_visualization(concept):
         }
 
         function playNote(freq) {
-            if (!audioContext) {
-                audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            }
-
-            const oscillator = audioContext.createOscillator();
-            const gainNode = audioContext.createGain();
-
-            oscillator.frequency.value = freq;
-            oscillator.type = 'sine';
-            gainNode.gain.value = 0.3;
-
-            oscillator.connect(gainNode);
-            gainNode.connect(audioContext.destination);
-
-            oscillator.start();
-            gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + 0.5);
-            oscillator.stop(audioContext.currentTime + 0.5);
+            playTone(freq, { duration: 0.5 });
         }
 
         canvas.addEventListener('click', (e) => {
@@ -396,8 +426,8 @@ def generate_piano_keyboard_visualization(concept):
 
 def generate_staff_visualization(concept):
     """Generate interactive staff notation visualization."""
-    title = f"Interactive Staff: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Click on the staff to place notes. Observe how notes are positioned on lines and spaces."
+    title = f"Interactive Staff: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Click on the staff to place notes. Observe how notes are positioned on lines and spaces."
 
     content = """
         <canvas id="staffCanvas" width="800" height="300"></canvas>
@@ -480,8 +510,8 @@ def generate_staff_visualization(concept):
 
 def generate_interval_visualization(concept):
     """Generate interval calculator visualization."""
-    title = f"Interval Calculator: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Click two keys to hear the interval and see its name and distance in half steps."
+    title = f"Interval Calculator: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Click two keys to hear the interval and see its name and distance in half steps."
 
     content = """
         <canvas id="intervalCanvas" width="800" height="200"></canvas>
@@ -503,7 +533,6 @@ def generate_interval_visualization(concept):
         const melodicBtn = document.getElementById('playMelodic');
         const resetBtn = document.getElementById('reset');
 
-        let audioContext = null;
         let selectedNotes = [];
 
         const notes = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'];
@@ -539,23 +568,7 @@ def generate_interval_visualization(concept):
         }
 
         function playNote(freq, delay = 0) {
-            if (!audioContext) {
-                audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            }
-
-            const oscillator = audioContext.createOscillator();
-            const gainNode = audioContext.createGain();
-
-            oscillator.frequency.value = freq;
-            oscillator.type = 'sine';
-            gainNode.gain.value = 0.3;
-
-            oscillator.connect(gainNode);
-            gainNode.connect(audioContext.destination);
-
-            oscillator.start(audioContext.currentTime + delay);
-            gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + delay + 0.8);
-            oscillator.stop(audioContext.currentTime + delay + 0.8);
+            playTone(freq, { delay, duration: 0.8 });
         }
 
         function updateInfo() {
@@ -616,8 +629,8 @@ def generate_interval_visualization(concept):
 
 def generate_rhythm_visualization(concept):
     """Generate rhythm sequencer visualization."""
-    title = f"Rhythm Sequencer: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Click on the grid to toggle beats on/off, then press Play to hear your rhythm pattern."
+    title = f"Rhythm Sequencer: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Click on the grid to toggle beats on/off, then press Play to hear your rhythm pattern."
 
     content = """
         <canvas id="rhythmCanvas" width="800" height="200"></canvas>
@@ -640,7 +653,6 @@ def generate_rhythm_visualization(concept):
         const tempoSlider = document.getElementById('tempoSlider');
         const tempoValue = document.getElementById('tempoValue');
 
-        let audioContext = null;
         let beats = new Array(16).fill(false);
         let currentBeat = -1;
         let intervalId = null;
@@ -677,23 +689,7 @@ def generate_rhythm_visualization(concept):
         }
 
         function playBeat() {
-            if (!audioContext) {
-                audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            }
-
-            const oscillator = audioContext.createOscillator();
-            const gainNode = audioContext.createGain();
-
-            oscillator.frequency.value = 800;
-            oscillator.type = 'square';
-            gainNode.gain.value = 0.2;
-
-            oscillator.connect(gainNode);
-            gainNode.connect(audioContext.destination);
-
-            oscillator.start();
-            gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + 0.1);
-            oscillator.stop(audioContext.currentTime + 0.1);
+            playTone(800, { type: 'square', gain: 0.2, duration: 0.1 });
         }
 
         canvas.addEventListener('click', (e) => {
@@ -750,8 +746,8 @@ def generate_rhythm_visualization(concept):
 
 def generate_scale_visualization(concept):
     """Generate scale builder visualization."""
-    title = f"Scale Builder: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Select a scale type to see its pattern on the keyboard. Click Play to hear the scale."
+    title = f"Scale Builder: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Select a scale type to see its pattern on the keyboard. Click Play to hear the scale."
 
     content = """
         <canvas id="scaleCanvas" width="800" height="200"></canvas>
@@ -776,7 +772,6 @@ def generate_scale_visualization(concept):
         const playBtn = document.getElementById('playScale');
         const descendBtn = document.getElementById('playDescending');
 
-        let audioContext = null;
 
         const notes = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B', 'C'];
         const frequencies = [261.63, 277.18, 293.66, 311.13, 329.63, 349.23, 369.99, 392.00, 415.30, 440.00, 466.16, 493.88, 523.25];
@@ -824,23 +819,7 @@ def generate_scale_visualization(concept):
         }
 
         function playNote(freq, delay) {
-            if (!audioContext) {
-                audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            }
-
-            const oscillator = audioContext.createOscillator();
-            const gainNode = audioContext.createGain();
-
-            oscillator.frequency.value = freq;
-            oscillator.type = 'sine';
-            gainNode.gain.value = 0.3;
-
-            oscillator.connect(gainNode);
-            gainNode.connect(audioContext.destination);
-
-            oscillator.start(audioContext.currentTime + delay);
-            gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + delay + 0.4);
-            oscillator.stop(audioContext.currentTime + delay + 0.5);
+            playTone(freq, { delay, duration: 0.5, fade: 0.4 });
         }
 
         playBtn.addEventListener('click', () => {
@@ -867,8 +846,8 @@ def generate_scale_visualization(concept):
 
 def generate_chord_visualization(concept):
     """Generate chord builder visualization."""
-    title = f"Chord Builder: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Click on keys to build a chord, or use preset buttons. Click Play to hear the chord."
+    title = f"Chord Builder: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Click on keys to build a chord, or use preset buttons. Click Play to hear the chord."
 
     content = """
         <canvas id="chordCanvas" width="800" height="200"></canvas>
@@ -893,7 +872,6 @@ def generate_chord_visualization(concept):
         const clearBtn = document.getElementById('clearChord');
         const formula = document.getElementById('chordFormula');
 
-        let audioContext = null;
         let selectedNotes = new Set();
 
         const notes = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'];
@@ -940,23 +918,7 @@ def generate_chord_visualization(concept):
         }
 
         function playNote(freq) {
-            if (!audioContext) {
-                audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            }
-
-            const oscillator = audioContext.createOscillator();
-            const gainNode = audioContext.createGain();
-
-            oscillator.frequency.value = freq;
-            oscillator.type = 'sine';
-            gainNode.gain.value = 0.2;
-
-            oscillator.connect(gainNode);
-            gainNode.connect(audioContext.destination);
-
-            oscillator.start();
-            gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + 1.5);
-            oscillator.stop(audioContext.currentTime + 1.5);
+            playTone(freq, { gain: 0.2, duration: 1.5 });
         }
 
         window.buildChord = function(pattern) {
@@ -997,8 +959,8 @@ def generate_chord_visualization(concept):
 
 def generate_circle_of_fifths_visualization(concept):
     """Generate circle of fifths visualization."""
-    title = f"Circle of Fifths: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Click on segments to explore different keys and see their sharps or flats."
+    title = f"Circle of Fifths: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Click on segments to explore different keys and see their sharps or flats."
 
     content = """
         <canvas id="circleCanvas" width="600" height="600"></canvas>
@@ -1107,8 +1069,8 @@ def generate_circle_of_fifths_visualization(concept):
 
 def generate_progression_visualization(concept):
     """Generate chord progression builder visualization."""
-    title = f"Chord Progression Builder: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Click Roman numeral buttons to build a chord progression, then play it back."
+    title = f"Chord Progression Builder: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Click Roman numeral buttons to build a chord progression, then play it back."
 
     content = """
         <div class="controls">
@@ -1133,7 +1095,6 @@ def generate_progression_visualization(concept):
     """
 
     script = """
-        let audioContext = null;
         let progression = [];
 
         const chordMap = {
@@ -1166,24 +1127,8 @@ def generate_progression_visualization(concept):
         };
 
         function playChord(frequencies, delay) {
-            if (!audioContext) {
-                audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            }
-
             frequencies.forEach(freq => {
-                const oscillator = audioContext.createOscillator();
-                const gainNode = audioContext.createGain();
-
-                oscillator.frequency.value = freq;
-                oscillator.type = 'sine';
-                gainNode.gain.value = 0.15;
-
-                oscillator.connect(gainNode);
-                gainNode.connect(audioContext.destination);
-
-                oscillator.start(audioContext.currentTime + delay);
-                gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + delay + 0.9);
-                oscillator.stop(audioContext.currentTime + delay + 1);
+                playTone(freq, { gain: 0.15, delay, duration: 1, fade: 0.9 });
             });
         }
 
@@ -1209,8 +1154,8 @@ def generate_progression_visualization(concept):
 
 def generate_melody_builder_visualization(concept):
     """Generate melody/pattern builder visualization."""
-    title = f"Melody Builder: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Click on the grid to create a melodic pattern. Each column is a beat, each row is a note."
+    title = f"Melody Builder: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Click on the grid to create a melodic pattern. Each column is a beat, each row is a note."
 
     content = """
         <canvas id="melodyCanvas" width="800" height="400"></canvas>
@@ -1226,7 +1171,6 @@ def generate_melody_builder_visualization(concept):
         const playBtn = document.getElementById('playMelody');
         const clearBtn = document.getElementById('clearMelody');
 
-        let audioContext = null;
         const cols = 16;
         const rows = 8;
         const cellWidth = canvas.width / cols;
@@ -1275,27 +1219,10 @@ def generate_melody_builder_visualization(concept):
         });
 
         playBtn.addEventListener('click', () => {
-            if (!audioContext) {
-                audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            }
-
             for (let col = 0; col < cols; col++) {
                 for (let row = 0; row < rows; row++) {
                     if (grid[row][col]) {
-                        const oscillator = audioContext.createOscillator();
-                        const gainNode = audioContext.createGain();
-
-                        oscillator.frequency.value = frequencies[row];
-                        oscillator.type = 'sine';
-                        gainNode.gain.value = 0.2;
-
-                        oscillator.connect(gainNode);
-                        gainNode.connect(audioContext.destination);
-
-                        const delay = col * 0.25;
-                        oscillator.start(audioContext.currentTime + delay);
-                        gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + delay + 0.2);
-                        oscillator.stop(audioContext.currentTime + delay + 0.25);
+                        playTone(frequencies[row], { gain: 0.2, delay: col * 0.25, duration: 0.25, fade: 0.2 });
                     }
                 }
             }
@@ -1314,8 +1241,8 @@ def generate_melody_builder_visualization(concept):
 
 def generate_dynamics_visualization(concept):
     """Generate dynamics visualizer."""
-    title = f"Dynamics Visualizer: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Select dynamic markings to hear and see the difference in volume levels."
+    title = f"Dynamics Visualizer: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Select dynamic markings to hear and see the difference in volume levels."
 
     content = """
         <canvas id="dynamicsCanvas" width="800" height="300"></canvas>
@@ -1333,7 +1260,6 @@ def generate_dynamics_visualization(concept):
         const canvas = document.getElementById('dynamicsCanvas');
         const ctx = canvas.getContext('2d');
 
-        let audioContext = null;
         let currentDynamic = 'mf';
         let currentVolume = 0.6;
 
@@ -1381,23 +1307,7 @@ def generate_dynamics_visualization(concept):
             currentVolume = volume;
             drawDynamics();
 
-            if (!audioContext) {
-                audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            }
-
-            const oscillator = audioContext.createOscillator();
-            const gainNode = audioContext.createGain();
-
-            oscillator.frequency.value = 440;
-            oscillator.type = 'sine';
-            gainNode.gain.value = volume * 0.3;
-
-            oscillator.connect(gainNode);
-            gainNode.connect(audioContext.destination);
-
-            oscillator.start();
-            gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + 1);
-            oscillator.stop(audioContext.currentTime + 1);
+            playTone(440, { gain: volume * 0.3, duration: 1 });
         };
 
         drawDynamics();
@@ -1408,8 +1318,8 @@ def generate_dynamics_visualization(concept):
 
 def generate_transposition_visualization(concept):
     """Generate transposition tool visualization."""
-    title = f"Transposition Tool: {concept['name']}"
-    instructions = f"<strong>{concept['name']}:</strong> {concept['description']}<br><br>Create a simple melody, then transpose it to different keys while preserving intervals."
+    title = f"Transposition Tool: {concept.name}"
+    instructions = f"<strong>{concept.name}:</strong> {concept.description}<br><br>Create a simple melody, then transpose it to different keys while preserving intervals."
 
     content = """
         <canvas id="transposeCanvas" width="800" height="300"></canvas>
@@ -1442,7 +1352,6 @@ def generate_transposition_visualization(concept):
         const playTransBtn = document.getElementById('playTransposed');
         const clearBtn = document.getElementById('clearTranspose');
 
-        let audioContext = null;
         let melody = [0, 2, 4, 5, 7];
 
         const baseFreq = 261.63;
@@ -1518,25 +1427,8 @@ def generate_transposition_visualization(concept):
         }
 
         function playMelodyNotes(notes, delay = 0) {
-            if (!audioContext) {
-                audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            }
-
             notes.forEach((note, i) => {
-                const oscillator = audioContext.createOscillator();
-                const gainNode = audioContext.createGain();
-
-                oscillator.frequency.value = getFrequency(note);
-                oscillator.type = 'sine';
-                gainNode.gain.value = 0.3;
-
-                oscillator.connect(gainNode);
-                gainNode.connect(audioContext.destination);
-
-                const noteDelay = delay + i * 0.4;
-                oscillator.start(audioContext.currentTime + noteDelay);
-                gainNode.gain.exponentialRampToValueAtTime(0.01, audioContext.currentTime + noteDelay + 0.3);
-                oscillator.stop(audioContext.currentTime + noteDelay + 0.4);
+                playTone(getFrequency(note), { delay: delay + i * 0.4, duration: 0.4, fade: 0.3 });
             });
         }
 
@@ -1565,8 +1457,8 @@ def generate_transposition_visualization(concept):
 
 def categorize_concept(concept):
     """Determine which visualization type to use for a concept."""
-    concept_id = concept['id']
-    tags = concept.get('tags', [])
+    concept_id = concept.id
+    tags = concept.tags
 
     # Sound/Acoustics concepts
     if concept_id in ['sound', 'pitch', 'volume', 'timbre']:
@@ -1651,34 +1543,87 @@ def generate_visualization(concept):
     return generator(concept)
 
 
+def init_worker(minify=False):
+    """Set up a render worker, or the main process, to minify the pages or not."""
+    global minify_pages
+    minify_pages = minify
+    set_minified(minify)
+
+
+def render_visualization(concept):
+    """Render one concept's page, minified with --minify; runs in a worker when --jobs > 1.
+
+    Returns the page and its size in bytes before minification.
+    """
+    html = generate_visualization(concept)
+    size = len(html.encode('utf-8'))
+    if minify_pages:
+        html = minify_html(html)
+    return html, size
+
+
 def main():
     """Main function to generate all visualizations."""
-    input_file = '/home/user/pla-2026/music-theory-concepts.json'
-    output_dir = '/home/user/pla-2026/canvas_music_theory_course/wiki_content/'
+    parser = argparse.ArgumentParser(
+        description="Generate concept-specific HTML visualizations")
+    parser.add_argument('--concepts', default=os.path.join(REPO_DIR, 'music-theory-concepts.json'),
+                        help="Concepts JSON file or concept database")
+    parser.add_argument('--select', metavar='SQL',
+                        help="Only generate the concepts whose ids this query returns (see concept_store.py)")
+    parser.add_argument('--facets', metavar='QUERY',
+                        help="Only generate the concepts matching a facet query (see facet_index.py)")
+    parser.add_argument('--output-dir',
+                        default=os.path.join(REPO_DIR, 'canvas_music_theory_course', 'wiki_content'),
+                        help="Directory to write the visualization pages to")
+    parser.add_argument('--minify', action='store_true',
+                        help="Minify the pages and shared styles and scripts (see minify.py)")
+    add_jobs_arguments(parser)
+    args = parser.parse_args()
+
+    input_file = args.concepts
+    output_dir = args.output_dir
 
     # Load concepts
     print(f"Loading concepts from {input_file}...")
-    data = load_concepts(input_file)
-    concepts = data['concepts']
+    graph = ConceptGraph.load(input_file)
+    concept_ids = graph.topological_order()
+    if args.select:
+        selected = set(select_concept_ids(input_file, args.select))
+        concept_ids = [concept_id for concept_id in concept_ids if concept_id in selected]
+    if args.facets:
+        matches = set(load_facet_index(input_file).select(args.facets))
+        concept_ids = [concept_id for concept_id in concept_ids if concept_id in matches]
+    concepts = [graph.concepts[concept_id] for concept_id in concept_ids]
 
     print(f"Found {len(concepts)} concepts")
 
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
 
-    # Generate visualizations
+    # The pages link the shared styles and scripts in ../web_resources
+    init_worker(args.minify)
+    for path in write_resources(PAGE_RESOURCES['visualization'], os.path.join(output_dir, os.pardir)):
+        print(f"Wrote {os.path.normpath(path)}")
+
+    # Generate visualizations in learning order, in parallel when requested;
+    # results come back in that order
     print(f"\nGenerating visualizations in {output_dir}...")
-    for i, concept in enumerate(concepts, 1):
-        concept_id = concept['id']
+    results = render_all(render_visualization, concepts,
+                         jobs=args.jobs, chunk_size=args.chunk_size,
+                         initializer=init_worker, initargs=(args.minify,))
+    for i, (concept, (html_content, size)) in enumerate(zip(concepts, results), 1):
+        concept_id = concept.id
         filename = f"{concept_id}-visualization.html"
         filepath = os.path.join(output_dir, filename)
 
-        html_content = generate_visualization(concept)
+        note = ''
+        if args.minify:
+            note = f" ({size_report(size, len(html_content.encode('utf-8')))})"
 
         with open(filepath, 'w') as f:
             f.write(html_content)
 
-        print(f"  [{i}/{len(concepts)}] Generated {filename}")
+        print(f"  [{i}/{len(concepts)}] Generated {filename}{note}")
 
     print(f"\nCompleted! Generated {len(concepts)} unique visualizations.")
 
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Streaming writer and patcher for IMS Common Cartridge (.imscc) packages.
+"""
+
+import collections
+import copy
+import io
+import os
+import struct
+import sys
+import time
+import zipfile
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Local file header: signature, then fixed fields up to the name/extra lengths
+LOCAL_HEADER_SIZE = 30
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+DATA_DESCRIPTOR_FLAG = 0x08
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Formats that are already compressed; deflating them again only costs time
+PRECOMPRESSED_EXTENSIONS = {
+    '.gif', '.jpeg', '.jpg', '.png', '.webp',
+    '.m4a', '.mp3', '.mp4', '.ogg', '.webm',
+    '.pdf', '.woff', '.woff2', '.zip', '.imscc',
+}
+
+# Text formats that make up most of a cartridge
+TEXT_EXTENSIONS = {'.css', '.htm', '.html', '.js', '.json', '.txt', '.xml'}
+
+
+class CompressionPolicy:
+    """Choose how each archive entry is compressed from its file type.
+
+    'max' (release builds) uses the strongest deflate level for text and
+    the default level for anything else; 'fast' (dev builds) uses the
+    fastest level throughout. Already-compressed media is always stored.
+    """
+
+    LEVELS = {'max': (9, 6), 'fast': (1, 1)}
+
+    def __init__(self, mode='max'):
+        self.mode = mode
+        self.text_level, self.other_level = self.LEVELS[mode]
+
+    def for_name(self, arcname):
+        """Return (compress_type, level) for an entry."""
+        ext = os.path.splitext(arcname)[1].lower()
+        if ext in PRECOMPRESSED_EXTENSIONS:
+            return zipfile.ZIP_STORED, None
+        if ext in TEXT_EXTENSIONS:
+            return zipfile.ZIP_DEFLATED, self.text_level
+        return zipfile.ZIP_DEFLATED, self.other_level
+
+
+def new_zipinfo(arcname, policy, date_time=None):
+    """Create the ZipInfo for a new entry.
+
+    date_time defaults to now; the permissions and host system are fixed so
+    that entries only differ when their name, timestamp or contents do.
+    """
+    zinfo = zipfile.ZipInfo(arcname, date_time or time.localtime()[:6])
+    zinfo.external_attr = 0o600 << 16
+    zinfo.create_system = 3
+    zinfo.compress_type, level = policy.for_name(arcname)
+    return zinfo, level
+
+
+def compress_entry(arcname, data, policy, date_time=None):
+    """Compress one entry; returns (ZipInfo, compressed bytes).
+
+    zlib releases the GIL while compressing, so this runs in parallel in a
+    thread pool.
+    """
+    zinfo, level = new_zipinfo(arcname, policy, date_time)
+    zinfo.file_size = len(data)
+    zinfo.CRC = zlib.crc32(data)
+
+    if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        data = compressor.compress(data) + compressor.flush()
+    zinfo.compress_size = len(data)
+    return zinfo, data
+
+
+def append_compressed(zipf, zinfo, data):
+    """Append an entry whose bytes are already compressed to an open ZipFile."""
+    zinfo.header_offset = zipf.fp.tell()
+    zipf.fp.write(zinfo.FileHeader())
+    zipf.fp.write(data)
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+    zipf.start_dir = zipf.fp.tell()
+    zipf._didModify = True
+
+
+def add_compression_arguments(parser):
+    """Add the packaging options shared by the build scripts."""
+    parser.add_argument('--compression', choices=sorted(CompressionPolicy.LEVELS), default='max',
+                        help="Compression policy: max for release builds, fast for dev builds "
+                             "(default: %(default)s)")
+    parser.add_argument('--compress-workers', type=int, default=os.cpu_count() or 1, metavar='N',
+                        help="Threads compressing package entries (default: %(default)s)")
+
+
+class CartridgeWriter:
+    """Write an .imscc package one in-memory entry at a time.
+
+    target is a file path, '-' for stdout, or a binary file object. The
+    sink does not need to be seekable, so the package can be piped straight
+    into an upload step.
+
+    Entries are compressed concurrently by a pool of worker threads
+    following the compression policy, and written to the archive in the
+    order they were added. At most a few entries per worker are in flight
+    at any time.
+
+    For reproducible packages, date_time fixes every entry's timestamp and
+    sort_entries holds all entries back until close() and writes them
+    sorted by name (the compressed package is then held in memory).
+    comment is stored as the archive comment.
+    """
+
+    def __init__(self, target, policy=None, workers=1, date_time=None,
+                 sort_entries=False, comment=b''):
+        if target == '-':
+            target = sys.stdout.buffer
+        self.policy = policy or CompressionPolicy()
+        self.date_time = date_time
+        self.sort_entries = sort_entries
+        self.comment = comment
+        self.zipf = zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED,
+                                    compresslevel=self.policy.text_level)
+        self.executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self.max_pending = 4 * workers if self.executor else 1
+        self.pending = collections.deque()
+        self.held = []
+        self.entries = 0
+
+    def add(self, arcname, data):
+        """Add an entry from a str (written as UTF-8) or bytes."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.entries += 1
+
+        if self.executor is None:
+            future = Future()
+            future.set_result(compress_entry(arcname, data, self.policy, self.date_time))
+        else:
+            future = self.executor.submit(compress_entry, arcname, data, self.policy, self.date_time)
+
+        if self.sort_entries:
+            self.held.append(future)
+            return
+
+        self.pending.append(future)
+        while len(self.pending) >= self.max_pending:
+            append_compressed(self.zipf, *self.pending.popleft().result())
+
+    def flush(self):
+        """Write every entry that is still being compressed."""
+        while self.pending:
+            append_compressed(self.zipf, *self.pending.popleft().result())
+
+    def open(self, arcname):
+        """Open a text stream that writes a UTF-8 entry straight into the archive.
+
+        With sort_entries the entry is buffered in memory and added when the
+        stream is closed, so it takes its sorted place like any other entry.
+        """
+        if self.sort_entries:
+            return io.TextIOWrapper(_HeldEntry(self, arcname), encoding='utf-8')
+
+        self.flush()
+        self.entries += 1
+        zinfo, level = new_zipinfo(arcname, self.policy, self.date_time)
+        # ZipFile.open() only applies its own compresslevel to entries opened by name
+        zinfo._compresslevel = level
+        return io.TextIOWrapper(self.zipf.open(zinfo, 'w'), encoding='utf-8')
+
+    def add_file(self, arcname, path):
+        """Add an entry from a file on disk."""
+        with open(path, 'rb') as f:
+            self.add(arcname, f.read())
+
+    def close(self):
+        try:
+            self.flush()
+            entries = sorted((future.result() for future in self.held),
+                             key=lambda entry: entry[0].filename)
+            for zinfo, data in entries:
+                append_compressed(self.zipf, zinfo, data)
+            if self.comment:
+                self.zipf.comment = self.comment
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+            self.zipf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _HeldEntry(io.BytesIO):
+    """In-memory entry that is added to a CartridgeWriter when closed."""
+
+    def __init__(self, writer, arcname):
+        super().__init__()
+        self.writer = writer
+        self.arcname = arcname
+
+    def close(self):
+        if not self.closed:
+            self.writer.add(self.arcname, self.getvalue())
+        super().close()
+
+
+def copy_raw_entry(src_fp, info, zipf):
+    """Copy one entry's compressed bytes from src_fp into zipf without recompressing.
+
+    info is the entry's ZipInfo from the source archive's central directory,
+    which always has the CRC and sizes, so the copied entry gets a complete
+    local header even if the source used a data descriptor.
+    """
+    src_fp.seek(info.header_offset)
+    header = src_fp.read(LOCAL_HEADER_SIZE)
+    if header[:4] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    src_fp.seek(name_length + extra_length, os.SEEK_CUR)
+
+    entry = copy.copy(info)
+    entry.flag_bits &= ~DATA_DESCRIPTOR_FLAG
+    entry.header_offset = zipf.fp.tell()
+    zipf.fp.write(entry.FileHeader())
+
+    remaining = info.compress_size
+    while remaining:
+        chunk = src_fp.read(min(remaining, COPY_CHUNK_SIZE))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated data for {info.filename}")
+        zipf.fp.write(chunk)
+        remaining -= len(chunk)
+
+    zipf.filelist.append(entry)
+    zipf.NameToInfo[entry.filename] = entry
+    zipf.start_dir = zipf.fp.tell()
+    zipf._didModify = True
+
+
+def patch_archive(path, replacements, output=None, policy=None):
+    """Replace or add entries in an existing archive without recompressing the rest.
+
+    replacements maps archive names to their new str/bytes contents, or to a
+    callable that streams the contents into the binary file object it is
+    given, so large entries never have to be held in memory. A callable that
+    reads from the archive being patched must have opened it beforehand.
+
+    Without an output path (or with output == path) the archive is patched
+    in place: new entries are appended and replaced entries are dropped from
+    the central directory, so the work depends on the size of the change,
+    not of the archive; entries whose contents are unchanged are skipped.
+    Otherwise the unchanged entries are copied to output as raw compressed
+    bytes, which also drops the dead space left by earlier patches. New
+    entries are compressed following policy.
+
+    The archive comment is dropped either way: it may record the inputs a
+    build was made from (see generate_canvas_course.py), which the patched
+    archive no longer matches.
+    """
+    policy = policy or CompressionPolicy()
+    replacements = {name: data.encode('utf-8') if isinstance(data, str) else data
+                    for name, data in replacements.items()}
+
+    def write_replacements(zipf):
+        for name, data in replacements.items():
+            if callable(data):
+                with zipf.open(name, 'w') as dest:
+                    data(dest)
+            else:
+                append_compressed(zipf, *compress_entry(name, data, policy))
+
+    if output is None or os.path.abspath(output) == os.path.abspath(path):
+        # Entries whose contents are already in the archive need no rewrite
+        with zipfile.ZipFile(path, 'r') as zipf:
+            existing = {info.filename: (info.CRC, info.file_size) for info in zipf.infolist()}
+        replacements = {name: data for name, data in replacements.items()
+                        if callable(data) or existing.get(name) != (zlib.crc32(data), len(data))}
+        if not replacements:
+            return
+
+        with zipfile.ZipFile(path, 'a', zipfile.ZIP_DEFLATED,
+                             compresslevel=policy.text_level) as zipf:
+            zipf.filelist = [info for info in zipf.filelist
+                             if info.filename not in replacements]
+            for name in replacements:
+                zipf.NameToInfo.pop(name, None)
+            zipf.comment = b''
+            write_replacements(zipf)
+        return
+
+    with zipfile.ZipFile(path, 'r') as src, open(path, 'rb') as src_fp, \
+            zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED,
+                            compresslevel=policy.text_level) as zipf:
+        for info in src.infolist():
+            if info.filename not in replacements:
+                copy_raw_entry(src_fp, info, zipf)
+        zipf.comment = b''
+        write_replacements(zipf)
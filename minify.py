@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Conservative minification of the generated pages, in pure Python.
+
+The page templates keep their source indentation, comments and blank lines
+in the output. minify_html() drops HTML comments and collapses whitespace
+between tags and in text, minify_css() the whitespace and comments of the
+<style> blocks and style attributes, and minify_js() the comments and
+indentation of the <script> blocks. Contents of <pre> and <textarea>,
+attribute values other than styles, and string, template and regular
+expression literals are kept as they are.
+
+Scripts are only squeezed where that cannot change how they parse: a line
+break is kept wherever automatic semicolon insertion might depend on it,
+and a script the tokenizer does not understand is left as it is.
+
+Usage: python3 minify.py PAGE.html ...   (prints the sizes, writes nothing)
+"""
+
+import argparse
+import re
+
+# Elements that start and end a line box, so whitespace next to their tags
+# is never rendered; whitespace anywhere in <head> is not rendered either
+BLOCK_TAGS = frozenset((
+    'address', 'article', 'aside', 'base', 'blockquote', 'body', 'br', 'dd', 'details', 'dialog',
+    'div', 'dl', 'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'head', 'header', 'hr', 'html', 'li', 'link', 'main', 'meta', 'nav', 'ol',
+    'p', 'pre', 'section', 'summary', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'title', 'tr', 'ul',
+))
+# Elements whose contents are copied verbatim
+RAW_TAGS = ('script', 'style', 'pre', 'textarea')
+JS_TYPES = ('', 'text/javascript', 'application/javascript', 'module')
+
+HTML_SPACE = re.compile(r'[ \t\n\r\f]+')
+HTML_TOKEN = re.compile(r'''
+    (?P<comment><!--.*?-->)
+  | (?P<declaration><![^>]*>)
+  | (?P<tag></?[A-Za-z][^\s/>]*
+        (?:[ \t\n\r\f]+[^\s"'>/=]+(?:[ \t\n\r\f]*=[ \t\n\r\f]*(?:"[^"]*"|'[^']*'|[^\s"'>]+))?
+         |[ \t\n\r\f]*/(?!>))*
+        [ \t\n\r\f]*/?>)
+''', re.S | re.X)
+TAG_NAME = re.compile(r'</?([A-Za-z][^\s/>]*)')
+ATTRIBUTE = re.compile(r'''([^\s"'>/=]+)(?:[ \t\n\r\f]*=[ \t\n\r\f]*("[^"]*"|'[^']*'|[^\s"'>]+))?''')
+
+# Strings and comments, which the whitespace rules must not touch
+CSS_LITERAL = re.compile(r'''"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*'|/\*.*?\*/''', re.S)
+# A space is only dropped after a colon, not before one, where it can be a
+# descendant combinator (".menu :hover")
+CSS_SPACE = re.compile(r' ?([{};,>]) ?|(:) ')
+
+JS_PUNCTUATOR = re.compile(r'''>>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|\?\?=|&&=|\|\|=|=>|==|!=|<=|>=
+                               |&&|\|\||\?\?|\?\.|\+\+|--|[-+*/%&|^]=|<<|>>|\*\*|[^\s\w$]''', re.X)
+JS_WORD = re.compile(r'[\w$\u0080-\uffff]+')
+JS_NUMBER = re.compile(r'\.?\d(?:[eE][+-]\d|[\w.])*')
+JS_SPACE = re.compile(r'\s+')
+# Keywords after which a slash starts a regular expression, not a division
+JS_REGEX_AFTER = frozenset(('return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+                            'throw', 'case', 'do', 'else', 'yield', 'await'))
+# Keywords whose parenthesized condition can be followed by a regular expression
+JS_CONDITION_KEYWORDS = frozenset(('if', 'while', 'for', 'with'))
+# A line break after these ends the statement (restricted productions)
+JS_RESTRICTED = frozenset(('return', 'break', 'continue', 'throw', 'yield', 'async'))
+# Punctuators a statement can start with, or end with
+JS_STATEMENT_START = frozenset(('(', '[', '{', '+', '-', '++', '--', '!', '~', '/', '#', '@'))
+JS_STATEMENT_END = frozenset((')', ']', '}', '++', '--'))
+
+
+class _Untokenizable(ValueError):
+    """A script the tokenizer cannot split safely; it is left as it is."""
+
+
+def minify_css(css):
+    """Drop the comments of a stylesheet and the whitespace it does not need."""
+    parts = []
+    code = ''
+    position = 0
+    for match in CSS_LITERAL.finditer(css):
+        code += css[position:match.start()]
+        literal = match.group()
+        if literal.startswith('/*') and not literal.startswith('/*!'):
+            code += ' '
+        else:
+            parts.append(_squeeze_css(code))
+            parts.append(literal)
+            code = ''
+        position = match.end()
+    parts.append(_squeeze_css(code + css[position:]))
+    return ''.join(parts).strip()
+
+
+def _squeeze_css(code):
+    code = CSS_SPACE.sub(lambda m: m.group(1) or m.group(2), HTML_SPACE.sub(' ', code))
+    return code.replace(';}', '}')
+
+
+def _js_tokens(js):
+    """Split a script into (kind, text) tokens; kind is space, comment, string,
+    template, regex, word or punct."""
+    tokens = []
+    previous = None
+    conditions = []  # for each open parenthesis, whether it holds a condition
+    position = 0
+    length = len(js)
+    while position < length:
+        char = js[position]
+        if char.isspace():
+            end = JS_SPACE.match(js, position).end()
+            tokens.append(('space', js[position:end]))
+        elif js.startswith('//', position):
+            end = js.find('\n', position)
+            end = length if end < 0 else end
+            tokens.append(('comment', '\n'))
+        elif js.startswith('/*', position):
+            end = js.find('*/', position + 2)
+            if end < 0:
+                raise _Untokenizable("unterminated comment")
+            end += 2
+            tokens.append(('comment', '\n' if '\n' in js[position:end] else ' '))
+        elif char in '\'"':
+            end = _string_end(js, position)
+            tokens.append(('string', js[position:end]))
+        elif char == '`':
+            end = _template_end(js, position)
+            tokens.append(('template', js[position:end]))
+        elif char == '/' and _regex_allowed(previous):
+            end = _regex_end(js, position)
+            tokens.append(('regex', js[position:end]))
+        elif match := JS_NUMBER.match(js, position) or JS_WORD.match(js, position):
+            end = match.end()
+            tokens.append(('word', match.group()))
+        else:
+            end = JS_PUNCTUATOR.match(js, position).end()
+            tokens.append(('punct', js[position:end]))
+        kind, text = tokens[-1]
+        if kind not in ('space', 'comment'):
+            if (kind, text) == ('punct', '('):
+                conditions.append(previous is not None and previous[0] == 'word'
+                                  and previous[1] in JS_CONDITION_KEYWORDS)
+            elif (kind, text) == ('punct', ')') and conditions and conditions.pop():
+                # The statement starts after if (...), so a slash is a regex
+                kind = 'condition'
+            previous = (kind, text)
+        position = end
+    return tokens
+
+
+def _regex_allowed(previous):
+    if previous is None:
+        return True
+    kind, text = previous
+    if kind == 'condition':
+        return True
+    if kind == 'punct':
+        return text not in (')', ']', '}')
+    return kind == 'word' and text in JS_REGEX_AFTER
+
+
+def _string_end(js, start):
+    quote = js[start]
+    position = start + 1
+    while position < len(js):
+        char = js[position]
+        if char == '\\':
+            position += 2
+            continue
+        if char == quote:
+            return position + 1
+        if char == '\n':
+            break
+        position += 1
+    raise _Untokenizable("unterminated string")
+
+
+def _template_end(js, start):
+    """End of the template literal at start, including any ${...} expressions."""
+    position = start + 1
+    while position < len(js):
+        char = js[position]
+        if char == '\\':
+            position += 2
+        elif char == '`':
+            return position + 1
+        elif js.startswith('${', position):
+            position = _expression_end(js, position + 2)
+        else:
+            position += 1
+    raise _Untokenizable("unterminated template literal")
+
+
+def _expression_end(js, position):
+    """Position after the } closing a template expression that starts at position."""
+    depth = 0
+    while position < len(js):
+        char = js[position]
+        if char in '\'"':
+            position = _string_end(js, position)
+            continue
+        if char == '`':
+            position = _template_end(js, position)
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            if depth == 0:
+                return position + 1
+            depth -= 1
+        position += 1
+    raise _Untokenizable("unterminated template expression")
+
+
+def _regex_end(js, start):
+    position = start + 1
+    in_class = False
+    while position < len(js):
+        char = js[position]
+        if char == '\\':
+            position += 2
+            continue
+        if char == '\n':
+            break
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            flags = JS_WORD.match(js, position + 1)
+            return flags.end() if flags else position + 1
+        position += 1
+    raise _Untokenizable("unterminated regular expression")
+
+
+def _js_separator(previous, following, newline):
+    """What the whitespace between two tokens can shrink to: '', ' ' or a line break."""
+    if newline:
+        prev_kind, prev_text = previous
+        next_kind, next_text = following
+        restricted = (prev_kind == 'word' and prev_text in JS_RESTRICTED) or next_text in ('++', '--')
+        # A line break only matters where a statement could end before it
+        # and another start after it
+        joinable = ((prev_kind == 'punct' and prev_text not in JS_STATEMENT_END)
+                    or (next_kind == 'punct' and next_text not in JS_STATEMENT_START))
+        if restricted or not joinable:
+            return '\n'
+
+    last = previous[1][-1]
+    first = following[1][0]
+    # Numbers count as words here, including those that start with a dot
+    if JS_WORD.match(last) and (JS_WORD.match(first) or following[0] == 'word'):
+        return ' '
+    if (last, first) in (('+', '+'), ('-', '-'), ('/', '/'), ('/', '*'), ('<', '!')):
+        return ' '
+    if previous[0] == 'word' and previous[1][0].isdigit() and first == '.':
+        return ' '
+    return ''
+
+
+def minify_js(js):
+    """Drop the comments and indentation of a script, keeping every line
+    break that could end a statement; a script that cannot be tokenized
+    is only stripped."""
+    try:
+        tokens = _js_tokens(js)
+    except _Untokenizable:
+        return js.strip()
+
+    out = []
+    previous = None
+    gap = None
+    for kind, text in tokens:
+        if kind in ('space', 'comment'):
+            gap = (gap or '') + text
+            continue
+        # Tokens that touch in the source stay together
+        if previous is not None and gap is not None:
+            out.append(_js_separator(previous, (kind, text), '\n' in gap))
+        out.append(text)
+        previous = (kind, text)
+        gap = None
+    return ''.join(out)
+
+
+def _minify_tag(tag):
+    """Collapse the whitespace of a start or end tag; style attributes are minified."""
+    match = TAG_NAME.match(tag)
+    closing = tag.endswith('/>')
+    body = tag[match.end():-2 if closing else -1]
+    parts = [match.group()]
+    for attribute in ATTRIBUTE.finditer(body):
+        name, value = attribute.groups()
+        if value is None:
+            parts.append(name)
+            continue
+        if name.lower() == 'style' and value[0] in '"\'':
+            value = value[0] + minify_css(value[1:-1]).rstrip(';') + value[-1]
+        parts.append(f"{name}={value}")
+    return ' '.join(parts) + ('/>' if closing else '>')
+
+
+def _attribute(tag, name):
+    for attribute in ATTRIBUTE.finditer(tag[TAG_NAME.match(tag).end():]):
+        if attribute.group(1).lower() == name:
+            value = attribute.group(2) or ''
+            return value.strip('"\'').strip().lower()
+    return None
+
+
+def minify_html(html):
+    """Minify a page: drop comments, collapse whitespace and minify its
+    <style> blocks and scripts; <pre> and <textarea> are left as they are."""
+    # Split into text, tag and raw element tokens
+    tokens = []
+    position = 0
+    while position < len(html):
+        start = html.find('<', position)
+        if start < 0:
+            tokens.append(('text', html[position:]))
+            break
+        if start > position:
+            tokens.append(('text', html[position:start]))
+        match = HTML_TOKEN.match(html, start)
+        if match is None:
+            tokens.append(('text', '<'))
+            position = start + 1
+            continue
+        position = match.end()
+        if match.lastgroup == 'comment':
+            # Conditional comments are markup for old browsers
+            if match.group().startswith('<!--[if'):
+                tokens.append(('raw', match.group()))
+            continue
+        if match.lastgroup == 'declaration':
+            tokens.append(('tag', HTML_SPACE.sub(' ', match.group()), None, False))
+            continue
+
+        tag = match.group()
+        name = TAG_NAME.match(tag).group(1).lower()
+        tokens.append(('tag', _minify_tag(tag), name, tag.startswith('</')))
+        if name in RAW_TAGS and not tag.startswith('</') and not tag.endswith('/>'):
+            end = re.compile(rf'</{name}[ \t\n\r\f]*>', re.I).search(html, position)
+            if end is None:
+                tokens.append(('raw', html[position:]))
+                position = len(html)
+                continue
+            content = html[position:end.start()]
+            if name == 'style':
+                content = minify_css(content)
+            elif name == 'script' and _attribute(tag, 'type') in (None, *JS_TYPES):
+                content = minify_js(content)
+            tokens.append(('raw', content))
+            tokens.append(('tag', f"</{name}>", name, True))
+            position = end.end()
+
+    # Collapse the text, dropping whitespace that is never rendered
+    out = []
+    in_head = False
+    for k, token in enumerate(tokens):
+        kind, text = token[0], token[1]
+        if kind == 'tag':
+            if token[2] == 'head':
+                in_head = not token[3]
+            out.append(text)
+            continue
+        if kind == 'raw':
+            out.append(text)
+            continue
+        text = HTML_SPACE.sub(' ', text)
+        if in_head and not text.strip():
+            continue
+        if k > 0 and _is_block(tokens[k - 1]):
+            text = text.lstrip(' ')
+        if k + 1 < len(tokens) and _is_block(tokens[k + 1]):
+            text = text.rstrip(' ')
+        if text:
+            out.append(text)
+    return ''.join(out).strip()
+
+
+def _is_block(token):
+    return token[0] == 'tag' and (token[2] is None or token[2] in BLOCK_TAGS)
+
+
+def size_report(before, after):
+    """'12,345 -> 6,789 bytes (-45%)' for the sizes of a page before and after minifying."""
+    saved = 100 * (before - after) / before if before else 0
+    return f"{before:,} -> {after:,} bytes (-{saved:.0f}%)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report how much minify_html() shrinks HTML pages")
+    parser.add_argument('pages', nargs='+', help="HTML files to minify")
+    args = parser.parse_args()
+
+    total_before = total_after = 0
+    for path in args.pages:
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        before = len(html.encode('utf-8'))
+        after = len(minify_html(html).encode('utf-8'))
+        total_before += before
+        total_after += after
+        print(f"  {path}: {size_report(before, after)}")
+    print(f"Total: {size_report(total_before, total_after)}")
+
+
+if __name__ == '__main__':
+    main()
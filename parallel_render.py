@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Process-pool helpers shared by the page generators.
+"""
+
+import collections
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_CHUNK_SIZE = 32
+
+
+def resolve_jobs(jobs):
+    """Turn a --jobs value into a worker count (0 means one per CPU)."""
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def render_all(render, items, jobs=1, chunk_size=DEFAULT_CHUNK_SIZE,
+               initializer=None, initargs=()):
+    """Yield render(item) for every item, in the order of items.
+
+    With more than one job the items are handed to a process pool in chunks
+    of chunk_size, so each worker renders a batch per round trip; results
+    are still yielded in input order so the output is deterministic.
+    render, the items and the initializer must be picklable.
+
+    items may be a generator: it is consumed lazily, at most two chunks per
+    worker ahead of the results, so items that are produced while reading
+    their input keep memory bounded.
+    """
+    jobs = resolve_jobs(jobs)
+    if jobs == 1:
+        yield from map(render, items)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer,
+                             initargs=initargs) as executor:
+        pending = collections.deque()
+        for chunk in chunked(items, chunk_size):
+            pending.append(executor.submit(render_chunk, render, chunk))
+            if len(pending) >= 2 * jobs:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def chunked(items, size):
+    """Yield lists of up to size consecutive items."""
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def render_chunk(render, chunk):
+    """Render a chunk of items in a worker process."""
+    return [render(item) for item in chunk]
+
+
+def add_jobs_arguments(parser):
+    """Add the --jobs/--chunk-size options shared by the generators."""
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help="Render pages in N worker processes (0 = one per CPU, default: 1)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, metavar='N',
+                        help="Concepts handed to a worker at a time (default: %(default)s)")
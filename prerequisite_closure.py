@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Precomputed transitive prerequisite closure for the music theory concepts.
+
+Every concept gets two bitsets, stored as Python ints: the concepts it
+depends on directly or indirectly (its ancestors) and the concepts that
+depend on it (its descendants). Bit n stands for the n-th concept in file
+order. Dependencies are the prerequisites lists plus the relationships
+marked mandatory; concepts that depend on each other in a cycle are
+treated as one unit.
+
+The closure is saved next to the concepts file as JSON with the bitsets in
+hex, so the build and the player (index.html) load it instead of walking
+the prerequisites recursively.
+
+Usage: python3 prerequisite_closure.py [--concepts FILE] [--show CONCEPT_ID]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+from concept_graph import CONCEPTS_FILE, ConceptGraph
+
+CLOSURE_VERSION = 1
+
+
+def closure_path(concepts_file):
+    """music-theory-concepts.json -> music-theory-concepts.closure.json, which
+    the player loads; any other source gets its full filename, e.g.
+    music-theory-concepts.db -> music-theory-concepts.db.closure.json, so
+    sources sharing a stem never share a closure."""
+    if os.path.basename(concepts_file) == os.path.basename(CONCEPTS_FILE):
+        return os.path.splitext(concepts_file)[0] + '.closure.json'
+    return concepts_file + '.closure.json'
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def close_over(graph, neighbors, components):
+    """Bitset rows of everything reachable through neighbors(n), for every n.
+
+    components lists each strongly connected component's members, ordered
+    so that every neighbor's component comes earlier. Concepts on a cycle
+    are learned together: they share what the cycle reaches but do not
+    reach each other, so none of them waits on the others to be ready.
+    """
+    component = graph.components()
+    rows = [0] * len(graph)
+    for members in components:
+        reach = 0
+        for n in members:
+            for m in neighbors(n):
+                if component[m] != component[n]:
+                    reach |= rows[m] | (1 << m)
+        for n in members:
+            rows[n] = reach
+    return rows
+
+
+class PrerequisiteClosure:
+    """Ancestor/descendant bitsets with constant-time and word-parallel queries."""
+
+    def __init__(self, ids, ancestors, descendants, source_sha256=None):
+        self.ids = ids
+        self.index = {concept_id: n for n, concept_id in enumerate(ids)}
+        self.ancestor_rows = ancestors
+        self.descendant_rows = descendants
+        self.source_sha256 = source_sha256
+
+    @classmethod
+    def from_data(cls, data, source_sha256=None):
+        """Compute the closure from the parsed concepts JSON document."""
+        mandatory = [r for r in data.get('relationships', []) if r.get('strength') == 'mandatory']
+        return cls.from_graph(ConceptGraph(data['concepts'], mandatory), source_sha256)
+
+    @classmethod
+    def from_graph(cls, graph, source_sha256=None):
+        """Compute the closure over the edges of a ConceptGraph."""
+        # Tarjan numbers components sinks first, so ascending numbers put
+        # dependents before their prerequisites
+        groups = [[] for _ in range(max(graph.components(), default=-1) + 1)]
+        for n, c in enumerate(graph.components()):
+            groups[c].append(n)
+
+        ancestors = close_over(graph, graph.predecessors, reversed(groups))
+        descendants = close_over(graph, graph.successors, groups)
+        return cls(graph.ids, ancestors, descendants, source_sha256)
+
+    @classmethod
+    def build(cls, concepts_file=CONCEPTS_FILE):
+        """Compute the closure for a concepts file or database."""
+        graph = ConceptGraph.load(concepts_file, {'mandatory'})
+        return cls.from_graph(graph, file_sha256(concepts_file))
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved closure."""
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != CLOSURE_VERSION:
+            raise ValueError(f"{path}: unsupported closure version {data.get('version')}")
+        return cls(data['ids'],
+                   [int(row, 16) for row in data['ancestors']],
+                   [int(row, 16) for row in data['descendants']],
+                   data.get('source_sha256'))
+
+    @classmethod
+    def load_or_build(cls, concepts_file=CONCEPTS_FILE):
+        """Load the saved closure for concepts_file, rebuilding and saving it
+        when it is missing or was computed from different contents.
+
+        Returns (closure, rebuilt).
+        """
+        path = closure_path(concepts_file)
+        digest = file_sha256(concepts_file)
+        try:
+            closure = cls.load(path)
+            if closure.source_sha256 == digest:
+                return closure, False
+        except (OSError, ValueError, KeyError):
+            pass
+
+        closure = cls.build(concepts_file)
+        closure.save(path)
+        return closure, True
+
+    def save(self, path):
+        """Atomically write the closure as JSON with hex bitsets."""
+        data = {
+            'version': CLOSURE_VERSION,
+            'source_sha256': self.source_sha256,
+            'bit_order': 'bit n is ids[n]; rows are hex without 0x',
+            'ids': self.ids,
+            'ancestors': [format(row, 'x') for row in self.ancestor_rows],
+            'descendants': [format(row, 'x') for row in self.descendant_rows],
+        }
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(f"{path}.tmp", path)
+
+    def mask(self, concept_ids):
+        """Bitset of a collection of concept ids; unknown ids are ignored."""
+        bits = 0
+        for concept_id in concept_ids:
+            n = self.index.get(concept_id)
+            if n is not None:
+                bits |= 1 << n
+        return bits
+
+    def members(self, bits):
+        """Concept ids whose bits are set, in file order."""
+        ids = []
+        while bits:
+            low = bits & -bits
+            ids.append(self.ids[low.bit_length() - 1])
+            bits ^= low
+        return ids
+
+    def ancestors(self, concept_id):
+        """Every concept that concept_id depends on, directly or indirectly."""
+        return self.members(self.ancestor_rows[self.index[concept_id]])
+
+    def descendants(self, concept_id):
+        """Every concept that depends on concept_id, directly or indirectly."""
+        return self.members(self.descendant_rows[self.index[concept_id]])
+
+    def requires(self, concept_id, other_id):
+        """True when concept_id depends on other_id, directly or indirectly."""
+        return bool(self.ancestor_rows[self.index[concept_id]] >> self.index[other_id] & 1)
+
+    def missing(self, concept_id, completed):
+        """Ancestors of concept_id that are not in completed (ids or a mask)."""
+        if not isinstance(completed, int):
+            completed = self.mask(completed)
+        return self.members(self.ancestor_rows[self.index[concept_id]] & ~completed)
+
+    def is_ready(self, concept_id, completed):
+        """True when every ancestor of concept_id is in completed (ids or a mask)."""
+        if not isinstance(completed, int):
+            completed = self.mask(completed)
+        return self.ancestor_rows[self.index[concept_id]] & ~completed == 0
+
+    def ready(self, completed):
+        """Concepts not yet completed whose ancestors all are, in file order."""
+        if not isinstance(completed, int):
+            completed = self.mask(completed)
+        return [concept_id for n, concept_id in enumerate(self.ids)
+                if not completed >> n & 1 and self.ancestor_rows[n] & ~completed == 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the transitive prerequisite closure")
+    parser.add_argument('--concepts', default=CONCEPTS_FILE, help="Concepts JSON file")
+    parser.add_argument('--show', metavar='CONCEPT_ID',
+                        help="Print the ancestors and descendants of one concept")
+    args = parser.parse_args()
+
+    closure, rebuilt = PrerequisiteClosure.load_or_build(args.concepts)
+    path = closure_path(args.concepts)
+    print(f"{'Wrote' if rebuilt else 'Up to date:'} {path}")
+    links = sum(bin(row).count('1') for row in closure.ancestor_rows)
+    print(f"{len(closure.ids)} concepts, {links} transitive prerequisite links")
+
+    if args.show:
+        print(f"\n{args.show} requires ({len(closure.ancestors(args.show))}):")
+        for concept_id in closure.ancestors(args.show):
+            print(f"  - {concept_id}")
+        print(f"\nRequired by ({len(closure.descendants(args.show))}):")
+        for concept_id in closure.descendants(args.show):
+            print(f"  - {concept_id}")
+
+
+if __name__ == '__main__':
+    main()
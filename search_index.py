@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Inverted search index over concept names, tags and descriptions.
+
+Text is split into lowercase word tokens; every term maps to a posting
+list of (concept number, weight) pairs, numbers in file order. A weight
+is a tf-idf score computed at build time: occurrences are dampened
+(1 + log tf) and scaled by the field they occur in (a name counts far
+more than a description, a short name more than a long one), keeping the
+best field, then by the rarity of the term, and rounded to an integer.
+
+Terms are kept sorted, so a query token matches every term it is a
+prefix of through a binary search ("inter" finds interval and
+intervals), once it is MIN_PREFIX characters long. A concept matches a
+query when every token matches one of its terms; concepts are ranked by
+the sum of their best weight per token, with whole-word matches counting
+double.
+
+The index is saved as JSON with the postings as flat, delta-encoded
+arrays (see build_player_data.py), so the player (index.html) loads them
+straight into typed arrays and answers each keystroke without scanning
+the concepts.
+"""
+
+import bisect
+import json
+import math
+import os
+import re
+
+SEARCH_VERSION = 1
+FIELD_WEIGHTS = {'name': 8.0, 'tags': 4.0, 'description': 1.0}
+WEIGHT_SCALE = 10
+EXACT_BONUS = 2
+# Shorter tokens only match whole words: a one-letter prefix matches most
+# of a large catalog and would cost more than a frame to rank
+MIN_PREFIX = 2
+STOPWORDS = ('a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'into', 'is',
+             'it', 'its', 'of', 'on', 'or', 'that', 'the', 'their', 'this', 'to', 'with')
+
+WORD = re.compile(r'[^\W_]+')
+
+
+def tokenize(text, stopwords=frozenset(STOPWORDS)):
+    """Lowercase word tokens of text, without stopwords."""
+    return [token for token in WORD.findall(text.lower()) if token not in stopwords]
+
+
+class SearchIndex:
+    """Sorted terms with (concept number, weight) posting lists."""
+
+    def __init__(self, ids, terms, postings, stopwords=STOPWORDS, min_prefix=MIN_PREFIX):
+        self.ids = ids
+        self.terms = terms
+        self.postings = postings
+        self.stopwords = frozenset(stopwords)
+        self.min_prefix = min_prefix
+
+    @classmethod
+    def from_concepts(cls, concepts):
+        """Index Concept records (see concept_record.py), in the given order."""
+        ids = []
+        scores = {}
+        for n, concept in enumerate(concepts):
+            ids.append(concept.id)
+            fields = {
+                'name': concept.name or '',
+                'tags': ' '.join(concept.tags),
+                'description': concept.description or '',
+            }
+            concept_scores = {}
+            for field, text in fields.items():
+                tokens = tokenize(text)
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                # A word of a short name says more than one of a long name
+                field_weight = FIELD_WEIGHTS[field] / (max(1, len(tokens)) if field == 'name' else 1)
+                for token, count in counts.items():
+                    score = field_weight * (1 + math.log(count))
+                    concept_scores[token] = max(concept_scores.get(token, 0), score)
+            for token, score in concept_scores.items():
+                scores.setdefault(token, []).append((n, score))
+
+        terms = sorted(scores)
+        postings = []
+        for term in terms:
+            entries = scores[term]
+            idf = math.log(1 + len(ids) / len(entries))
+            postings.append([(n, max(1, round(score * idf * WEIGHT_SCALE))) for n, score in entries])
+        return cls(ids, terms, postings)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != SEARCH_VERSION:
+            raise ValueError(f"{path}: unsupported search index version {data.get('version')}")
+        postings = []
+        offsets = data['offsets']
+        for t in range(len(data['terms'])):
+            start, end = offsets[t], offsets[t + 1]
+            entries = []
+            n = 0
+            for delta, weight in zip(data['docs'][start:end], data['weights'][start:end]):
+                n += delta
+                entries.append((n, weight))
+            postings.append(entries)
+        return cls(data['ids'], data['terms'], postings, data['stopwords'], data['min_prefix'])
+
+    def save(self, path):
+        """Atomically write the index as JSON with flat, delta-encoded postings.
+
+        Term t's postings are docs[offsets[t]:offsets[t + 1]] (each number
+        stored as the difference from the previous one) with the weights
+        at the same positions.
+        """
+        offsets = [0]
+        docs = []
+        weights = []
+        for entries in self.postings:
+            previous = 0
+            for n, weight in entries:
+                docs.append(n - previous)
+                weights.append(weight)
+                previous = n
+            offsets.append(len(docs))
+        data = {
+            'version': SEARCH_VERSION,
+            'ids': self.ids,
+            'stopwords': sorted(self.stopwords),
+            'min_prefix': self.min_prefix,
+            'terms': self.terms,
+            'offsets': offsets,
+            'docs': docs,
+            'weights': weights,
+        }
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(f"{path}.tmp", path)
+
+    def prefix_range(self, token):
+        """(start, end) of the terms that start with token (or equal it, when
+        token is shorter than min_prefix)."""
+        start = bisect.bisect_left(self.terms, token)
+        if len(token) < self.min_prefix:
+            return start, start + (start < len(self.terms) and self.terms[start] == token)
+        end = bisect.bisect_left(self.terms, token + '\uffff', start)
+        return start, end
+
+    def search(self, text, limit=None):
+        """Ids of the concepts matching every token of text, best first."""
+        tokens = tokenize(text, self.stopwords)
+        if not tokens:
+            return []
+        scores = None
+        for token in tokens:
+            best = {}
+            start, end = self.prefix_range(token)
+            for t in range(start, end):
+                factor = EXACT_BONUS if self.terms[t] == token else 1
+                for n, weight in self.postings[t]:
+                    if weight * factor > best.get(n, 0):
+                        best[n] = weight * factor
+            if scores is None:
+                scores = best
+            else:
+                scores = {n: score + best[n] for n, score in scores.items() if n in best}
+            if not scores:
+                return []
+        ranked = sorted(scores, key=lambda n: (-scores[n], n))
+        return [self.ids[n] for n in ranked[:limit]]
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Where the player data goes for each kind of concepts source.
+
+Usage: python3 -m pytest tests/
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+from build_player_data import build_player_data, player_data_dir  # noqa: E402
+from concept_stream import write_jsonl  # noqa: E402
+
+
+class PlayerDataDirTest(unittest.TestCase):
+
+    def test_shipped_concepts_file(self):
+        self.assertEqual(player_data_dir(os.path.join(REPO_PATH, 'music-theory-concepts.json')),
+                         os.path.join(REPO_PATH, 'player_data'))
+
+    def test_other_sources_get_their_own_directory(self):
+        dirs = {player_data_dir(os.path.join(REPO_PATH, name))
+                for name in ('music-theory-concepts.db', 'music-theory-concepts.jsonl', 'other.json')}
+        self.assertEqual(len(dirs), 3)
+        self.assertNotIn(os.path.join(REPO_PATH, 'player_data'), dirs)
+
+    def test_jsonl_build_leaves_player_data_alone(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(REPO_PATH, 'music-theory-concepts.json')) as f:
+                data = json.load(f)
+            source = os.path.join(tmp, 'music-theory-concepts.jsonl')
+            data['concepts'] = data['concepts'][:5]
+            data['relationships'] = []
+            write_jsonl(data, source)
+
+            written = build_player_data(source)
+            self.assertTrue(written)
+            self.assertTrue(all(path.startswith(source + '.player_data') for path in written))
+            self.assertFalse(os.path.exists(os.path.join(tmp, 'player_data')))
+
+
+if __name__ == '__main__':
+    unittest.main()
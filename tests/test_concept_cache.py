@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+The compiled concepts cache: rebuilt when its source changes, and safe to
+close while results read from it are still in use.
+
+Usage: python3 -m pytest tests/
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from concept_cache import cache_is_current, cache_path, load_compiled  # noqa: E402
+
+DATA = {
+    'domain': 'music theory',
+    'concepts': [
+        {'id': 'pitch', 'name': 'Pitch', 'difficulty': 1, 'prerequisites': [], 'tags': ['fundamental']},
+        {'id': 'interval', 'name': 'Interval', 'difficulty': 2, 'prerequisites': ['pitch']},
+    ],
+    'relationships': [{'from': 'interval', 'to': 'pitch', 'strength': 'mandatory'}],
+}
+
+
+class CompiledConceptsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'concepts.json')
+        self.write(DATA)
+
+    def write(self, data):
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+
+    def test_round_trip(self):
+        compiled = load_compiled(self.path)
+        self.addCleanup(compiled.close)
+        self.assertEqual(compiled.to_data(), DATA)
+
+    def test_rebuilt_when_source_changes(self):
+        compiled = load_compiled(self.path)
+        self.assertEqual(compiled['interval'].name, 'Interval')
+        compiled.close()
+
+        data = json.loads(json.dumps(DATA))
+        data['concepts'][1]['name'] = 'Intervals'
+        self.write(data)
+        self.assertFalse(cache_is_current(self.path, cache_path(self.path)))
+
+        compiled = load_compiled(self.path)
+        self.addCleanup(compiled.close)
+        self.assertTrue(cache_is_current(self.path, cache_path(self.path)))
+        self.assertEqual(compiled['interval'].name, 'Intervals')
+
+    def test_touch_keeps_the_cache(self):
+        load_compiled(self.path).close()
+        stat = os.stat(cache_path(self.path))
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertTrue(cache_is_current(self.path, cache_path(self.path)))
+
+    def test_close_with_results_in_use(self):
+        compiled = load_compiled(self.path)
+        numbers = compiled.list_numbers('prerequisites', 1)
+        record = compiled['pitch']
+        compiled.close()
+        self.assertEqual(list(numbers), [0])
+        self.assertEqual(list(record.tags), ['fundamental'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Learning order of the concept graph, with and without cycles.
+
+Usage: python3 -m pytest tests/
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from concept_graph import ConceptGraph  # noqa: E402
+
+
+def concept(concept_id, difficulty, prerequisites=()):
+    return {'id': concept_id, 'name': concept_id, 'difficulty': difficulty,
+            'prerequisites': list(prerequisites)}
+
+
+class TopologicalOrderTest(unittest.TestCase):
+
+    def test_prerequisites_first_then_easiest(self):
+        graph = ConceptGraph([
+            concept('chord', 3, ['interval']),
+            concept('interval', 2, ['pitch']),
+            concept('rhythm', 1),
+            concept('pitch', 1),
+        ])
+        self.assertEqual(graph.topological_order(), ['rhythm', 'pitch', 'interval', 'chord'])
+        self.assertEqual(graph.depths(), {'rhythm': 0, 'pitch': 0, 'interval': 1, 'chord': 2})
+
+    def test_cycle_after_its_outside_prerequisites(self):
+        # b has no prerequisite outside the a/b cycle, but the cycle as a
+        # whole depends on x, so neither member may come before x
+        graph = ConceptGraph([
+            concept('x', 5),
+            concept('a', 3, ['x', 'b']),
+            concept('b', 1, ['a']),
+        ])
+        self.assertEqual(graph.topological_order(), ['x', 'b', 'a'])
+        self.assertEqual(graph.cycles(), [['a', 'b']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+A concept database orders and selects concepts the same way as the JSON
+file it was imported from.
+
+Usage: python3 -m pytest tests/
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from concept_graph import ConceptGraph  # noqa: E402
+from concept_store import ConceptStore  # noqa: E402
+
+DATA = {
+    'concepts': [
+        {'id': 'cadence', 'name': 'Cadence', 'difficulty': 3.0},
+        {'id': 'pitch', 'name': 'Pitch', 'difficulty': 1},
+        {'id': 'interval', 'name': 'Interval', 'difficulty': 2, 'prerequisites': ['pitch']},
+    ],
+    'relationships': [],
+}
+
+
+class ConceptStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, data):
+        json_file = os.path.join(self.tmp.name, 'concepts.json')
+        with open(json_file, 'w') as f:
+            json.dump(data, f)
+        db_file = os.path.join(self.tmp.name, 'concepts.db')
+        with ConceptStore(db_file) as store:
+            store.import_document(data)
+        return json_file, db_file
+
+    def test_whole_number_float_difficulty(self):
+        json_file, db_file = self.write(DATA)
+        order = ['pitch', 'interval', 'cadence']
+        self.assertEqual(ConceptGraph.load(json_file).topological_order(), order)
+        self.assertEqual(ConceptGraph.load(db_file).topological_order(), order)
+        with ConceptStore(db_file) as store:
+            self.assertEqual(store.select_ids("SELECT id FROM concepts WHERE difficulty >= 3"), ['cadence'])
+
+    def test_fractional_difficulty_is_rejected(self):
+        data = json.loads(json.dumps(DATA))
+        data['concepts'][0]['difficulty'] = 2.5
+        with self.assertRaisesRegex(ValueError, 'cadence'):
+            self.write(data)
+        json_file = os.path.join(self.tmp.name, 'concepts.json')
+        with self.assertRaisesRegex(ValueError, 'cadence'):
+            ConceptGraph.load(json_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+The append-only JSON Lines concepts format: edits, deletions, and a build
+that matches the one from the JSON file.
+
+Usage: python3 -m pytest tests/
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+from concept_stream import append_records, iter_records, load_jsonl, write_jsonl  # noqa: E402
+from generate_canvas_course import PAGE_TYPES, add_build_arguments, build_course  # noqa: E402
+
+
+def concept(concept_id, **fields):
+    return {'id': concept_id, 'name': concept_id.title(), 'difficulty': 1, **fields}
+
+
+class JsonLinesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'concepts.jsonl')
+        write_jsonl({
+            'domain': 'music theory',
+            'concepts': [concept('pitch'), concept('interval', prerequisites=['pitch']), concept('scale')],
+            'relationships': [
+                {'from': 'interval', 'to': 'pitch', 'strength': 'mandatory'},
+                {'from': 'scale', 'to': 'interval', 'strength': 'recommended'},
+            ],
+        }, self.path)
+
+    def test_records_in_file_order(self):
+        kinds = [kind for kind, _, _, _ in iter_records(self.path)]
+        self.assertEqual(kinds, ['document', 'concept', 'concept', 'concept', 'relationship', 'relationship'])
+        # Small blocks split across workers give the same records
+        self.assertEqual([record for _, record, _, _ in iter_records(self.path, jobs=2, block_size=16)],
+                         [record for _, record, _, _ in iter_records(self.path)])
+
+    def test_later_line_replaces_earlier(self):
+        append_records(self.path, [concept('pitch', difficulty=2, name='Pitch (revised)')])
+        data = load_jsonl(self.path)
+        self.assertEqual([c['id'] for c in data['concepts']], ['pitch', 'interval', 'scale'])
+        self.assertEqual(data['concepts'][0]['name'], 'Pitch (revised)')
+        self.assertEqual(data['concepts'][0]['difficulty'], 2)
+        self.assertEqual(data['domain'], 'music theory')
+
+    def test_deletions(self):
+        append_records(self.path, [
+            {'id': 'scale', 'deleted': True},
+            {'from': 'interval', 'to': 'pitch', 'deleted': True},
+        ])
+        data = load_jsonl(self.path)
+        self.assertEqual([c['id'] for c in data['concepts']], ['pitch', 'interval'])
+        self.assertEqual(data['relationships'], [{'from': 'scale', 'to': 'interval', 'strength': 'recommended'}])
+
+        # A deleted concept can be added back; it goes to the end
+        append_records(self.path, [concept('scale')])
+        self.assertEqual([c['id'] for c in load_jsonl(self.path)['concepts']], ['pitch', 'interval', 'scale'])
+
+
+class JsonLinesBuildTest(unittest.TestCase):
+
+    def build(self, concepts_file, name):
+        parser = argparse.ArgumentParser()
+        add_build_arguments(parser)
+        package = os.path.join(self.tmp.name, f'{name}.imscc')
+        args = parser.parse_args(['--concepts', concepts_file, '--deterministic',
+                                  '--output-dir', os.path.join(self.tmp.name, name), '--package', package])
+        args.stream = False
+        args.no_tree = False
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_course(args, args.package)
+        with zipfile.ZipFile(package) as archive:
+            return {name: archive.read(name) for name in archive.namelist()}
+
+    def test_jsonl_build_matches_json_build(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        with open(os.path.join(REPO_PATH, 'music-theory-concepts.json')) as f:
+            data = json.load(f)
+        ids = {c['id'] for c in data['concepts'][:6]}
+        data['concepts'] = data['concepts'][:6]
+        data['relationships'] = [r for r in data['relationships'] if r['from'] in ids and r['to'] in ids]
+
+        json_file = os.path.join(self.tmp.name, 'concepts.json')
+        with open(json_file, 'w') as f:
+            json.dump(data, f)
+        jsonl_file = os.path.join(self.tmp.name, 'concepts.jsonl')
+        write_jsonl(data, jsonl_file)
+
+        from_json = self.build(json_file, 'json')
+        from_jsonl = self.build(jsonl_file, 'jsonl')
+        self.assertEqual(sum(name.startswith('wiki_content/') for name in from_json), 6 * len(PAGE_TYPES))
+        self.assertEqual(sorted(from_jsonl), sorted(from_json))
+        self.assertEqual(from_jsonl, from_json)
+
+
+if __name__ == '__main__':
+    unittest.main()
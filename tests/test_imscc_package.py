@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Patching .imscc packages in place and into a copy.
+
+Usage: python3 -m pytest tests/
+"""
+
+import io
+import os
+import struct
+import sys
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imscc_package import (  # noqa: E402
+    DATA_DESCRIPTOR_FLAG, LOCAL_HEADER_SIZE, CartridgeWriter, patch_archive,
+)
+
+ENTRIES = {
+    'imsmanifest.xml': '<manifest/>',
+    'wiki_content/pitch.html': '<p>pitch</p>' * 200,
+    'wiki_content/scale.html': '<p>scale</p>' * 200,
+}
+
+
+class Unseekable(io.RawIOBase):
+    """A write-only stream without seek, so zipfile writes data descriptors."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+def raw_data(path, name):
+    """The compressed bytes of one entry, as stored in the archive."""
+    with zipfile.ZipFile(path) as zipf, open(path, 'rb') as f:
+        info = zipf.getinfo(name)
+        f.seek(info.header_offset)
+        header = f.read(LOCAL_HEADER_SIZE)
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        f.seek(name_length + extra_length, os.SEEK_CUR)
+        return f.read(info.compress_size)
+
+
+class PatchArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'course.imscc')
+        with CartridgeWriter(self.path) as package:
+            for name, data in ENTRIES.items():
+                package.add(name, data)
+
+    def contents(self, path):
+        with zipfile.ZipFile(path) as zipf:
+            self.assertIsNone(zipf.testzip())
+            return {name: zipf.read(name).decode('utf-8') for name in zipf.namelist()}
+
+    def test_in_place(self):
+        patch_archive(self.path, {
+            'imsmanifest.xml': '<manifest><resources/></manifest>',
+            'wiki_content/rhythm.html': lambda dest: dest.write(b'<p>rhythm</p>'),
+        })
+        expected = dict(ENTRIES, **{'imsmanifest.xml': '<manifest><resources/></manifest>',
+                                    'wiki_content/rhythm.html': '<p>rhythm</p>'})
+        self.assertEqual(self.contents(self.path), expected)
+        with zipfile.ZipFile(self.path) as zipf:
+            self.assertEqual(len(zipf.infolist()), len(expected))
+
+    def test_unchanged_contents_are_not_rewritten(self):
+        size = os.path.getsize(self.path)
+        patch_archive(self.path, {'imsmanifest.xml': ENTRIES['imsmanifest.xml']})
+        self.assertEqual(os.path.getsize(self.path), size)
+
+    def test_separate_output(self):
+        output = os.path.join(self.tmp.name, 'patched.imscc')
+        patch_archive(self.path, {'imsmanifest.xml': '<manifest>new</manifest>'}, output=output)
+
+        self.assertEqual(self.contents(output), dict(ENTRIES, **{'imsmanifest.xml': '<manifest>new</manifest>'}))
+        self.assertEqual(self.contents(self.path), ENTRIES)
+        for name in ('wiki_content/pitch.html', 'wiki_content/scale.html'):
+            self.assertEqual(raw_data(output, name), raw_data(self.path, name))
+
+    def test_source_with_data_descriptors(self):
+        stream = Unseekable()
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for name, data in ENTRIES.items():
+                zipf.writestr(name, data)
+        with open(self.path, 'wb') as f:
+            f.write(stream.buffer.getvalue())
+        with zipfile.ZipFile(self.path) as zipf:
+            self.assertTrue(all(info.flag_bits & DATA_DESCRIPTOR_FLAG for info in zipf.infolist()))
+
+        output = os.path.join(self.tmp.name, 'patched.imscc')
+        patch_archive(self.path, {'wiki_content/rhythm.html': '<p>rhythm</p>'}, output=output)
+        self.assertEqual(self.contents(output), dict(ENTRIES, **{'wiki_content/rhythm.html': '<p>rhythm</p>'}))
+        with zipfile.ZipFile(output) as zipf:
+            self.assertFalse(any(info.flag_bits & DATA_DESCRIPTOR_FLAG for info in zipf.infolist()))
+
+        patch_archive(self.path, {'imsmanifest.xml': '<manifest>new</manifest>'})
+        self.assertEqual(self.contents(self.path), dict(ENTRIES, **{'imsmanifest.xml': '<manifest>new</manifest>'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
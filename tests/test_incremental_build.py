@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+An incremental rebuild must package only what the build produced, even
+when the output directory holds files from other scripts.
+
+Usage: python3 -m pytest tests/
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+import zipfile
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+from generate_canvas_course import add_build_arguments, build_course, package_hash  # noqa: E402
+from imscc_package import patch_archive  # noqa: E402
+
+
+def small_concepts(count=3):
+    """The first few concepts of the course, with prerequisites kept inside the subset"""
+    with open(os.path.join(REPO_PATH, 'music-theory-concepts.json')) as f:
+        data = json.load(f)
+    subset = data['concepts'][:count]
+    ids = {concept['id'] for concept in subset}
+    for concept in subset:
+        concept['prerequisites'] = [p for p in concept.get('prerequisites', []) if p in ids]
+        concept['related_concepts'] = [r for r in concept.get('related_concepts', []) if r in ids]
+    data['concepts'] = subset
+    data['relationships'] = []
+    return data
+
+
+class IncrementalBuildTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.concepts_file = os.path.join(self.tmp.name, 'concepts.json')
+        with open(self.concepts_file, 'w') as f:
+            json.dump(small_concepts(), f)
+        self.output_dir = os.path.join(self.tmp.name, 'course')
+        self.package = os.path.join(self.tmp.name, 'course.imscc')
+
+    def build(self, *options):
+        parser = argparse.ArgumentParser()
+        add_build_arguments(parser)
+        args = parser.parse_args(['--concepts', self.concepts_file, '--output-dir', self.output_dir,
+                                  '--package', self.package, *options])
+        args.stream = False
+        args.no_tree = False
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            build_course(args, args.package)
+        return output.getvalue()
+
+    def test_rebuild_skips_foreign_files(self):
+        self.build()
+        foreign = ['wiki_content/sound-visualization.html', 'web_resources/visualization.0123456789.css']
+        for name in foreign:
+            with open(os.path.join(self.output_dir, name), 'w') as f:
+                f.write('not part of the build')
+
+        output = self.build()
+        self.assertIn('Warning: skipping 2 files', output)
+
+        with zipfile.ZipFile(self.package) as archive:
+            names = archive.namelist()
+            manifest = archive.read('imsmanifest.xml')
+        hrefs = {elem.get('href') for elem in ET.fromstring(manifest).iter() if elem.get('href')}
+
+        for name in foreign:
+            self.assertNotIn(name, names)
+        unreferenced = set(names) - hrefs - {'imsmanifest.xml', 'course_settings.json'}
+        self.assertEqual(unreferenced, set())
+        self.assertTrue(any(name.startswith('wiki_content/') for name in names))
+        self.assertTrue(any(name.startswith('web_resources/') for name in names))
+
+    def test_patched_package_is_rebuilt(self):
+        self.build('--deterministic')
+        digest = package_hash(self.package)
+        self.assertIsNotNone(digest)
+        self.assertIn('is up to date', self.build('--deterministic'))
+
+        # A patched package no longer matches its inputs, in place or copied
+        copied = os.path.join(self.tmp.name, 'copied.imscc')
+        patch_archive(self.package, {'extra.txt': 'patched'}, output=copied)
+        self.assertIsNone(package_hash(copied))
+        patch_archive(self.package, {'extra.txt': 'patched'})
+        self.assertIsNone(package_hash(self.package))
+
+        self.assertNotIn('is up to date', self.build('--deterministic'))
+        self.assertEqual(package_hash(self.package), digest)
+        with zipfile.ZipFile(self.package) as archive:
+            self.assertNotIn('extra.txt', archive.namelist())
+
+
+if __name__ == '__main__':
+    unittest.main()
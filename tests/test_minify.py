@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+What the minifier must keep as it is, and what it may squeeze.
+
+Usage: python3 -m pytest tests/
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from minify import minify_css, minify_html, minify_js  # noqa: E402
+
+
+class MinifyHtmlTest(unittest.TestCase):
+
+    def test_whitespace_and_comments(self):
+        self.assertEqual(minify_html('<div>\n  <!-- note -->\n  <p>  hi \n  there  </p>\n</div>'),
+                         '<div><p>hi there</p></div>')
+
+    def test_pre_and_textarea_are_kept(self):
+        html = '<div>\n  <pre>  a\n   b </pre>\n  <textarea>  x\n  y </textarea>\n</div>'
+        self.assertEqual(minify_html(html), '<div><pre>  a\n   b </pre><textarea>  x\n  y </textarea></div>')
+
+    def test_quoted_attribute_values_are_kept(self):
+        html = '<p   title="a   b"  data-x=\'  c  \'  style="color:  red ;  margin: 0">x</p>'
+        self.assertEqual(minify_html(html), '<p title="a   b" data-x=\'  c  \' style="color:red;margin:0">x</p>')
+
+    def test_scripts_and_styles(self):
+        html = '<head>\n<style>\n  a { color: red; }\n</style>\n<script>\n  // hi\n  var a = 1;\n</script>\n</head>'
+        self.assertEqual(minify_html(html), '<head><style>a{color:red}</style><script>var a=1;</script></head>')
+
+
+class MinifyCssTest(unittest.TestCase):
+
+    def test_comments_and_strings(self):
+        self.assertEqual(minify_css('a  {  color: red ;  /* c */ content: "  /* x */  " }'),
+                         'a{color:red;content:"  /* x */  "}')
+
+
+class MinifyJsTest(unittest.TestCase):
+
+    def test_unary_operators_stay_apart(self):
+        self.assertEqual(minify_js('var c = a + +b;\nvar d = a - -b;\nvar e = a+ ++b;'),
+                         'var c=a+ +b;var d=a- -b;var e=a+ ++b;')
+
+    def test_regex_after_condition(self):
+        self.assertEqual(minify_js('if (x) /a  b\\/\\/ c/.test(s);'), 'if(x)/a  b\\/\\/ c/.test(s);')
+        self.assertEqual(minify_js('while (f(a) / 2) /x  y/g.exec(s)'), 'while(f(a)/2)/x  y/g.exec(s)')
+
+    def test_division_after_parenthesis(self):
+        self.assertEqual(minify_js('var r = (a) / 2 // half\n  / b;'), 'var r=(a)/2\n/b;')
+
+    def test_comment_markers_in_strings(self):
+        self.assertEqual(minify_js('var s = "http://x // y"; // gone\nvar t = \'a /* b */ c\'; /* gone */'),
+                         'var s="http://x // y";var t=\'a /* b */ c\';')
+
+    def test_template_literals(self):
+        self.assertEqual(minify_js('var t = `a  ${ b  +  `c  ${d}` }  // e`;\nfoo()'),
+                         'var t=`a  ${ b  +  `c  ${d}` }  // e`;foo()')
+
+    def test_line_breaks_that_end_statements(self):
+        self.assertEqual(minify_js('return\nx'), 'return\nx')
+        self.assertEqual(minify_js('let a = b\n(c)'), 'let a=b\n(c)')
+
+    def test_untokenizable_script_is_only_stripped(self):
+        self.assertEqual(minify_js('  var s = "open\n'), 'var s = "open')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Closure cache files for each kind of concepts source.
+
+Usage: python3 -m pytest tests/
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+from concept_stream import write_jsonl  # noqa: E402
+from prerequisite_closure import PrerequisiteClosure, closure_path  # noqa: E402
+
+
+class ClosurePathTest(unittest.TestCase):
+
+    def test_shipped_concepts_file(self):
+        self.assertEqual(closure_path(os.path.join(REPO_PATH, 'music-theory-concepts.json')),
+                         os.path.join(REPO_PATH, 'music-theory-concepts.closure.json'))
+
+    def test_sources_sharing_a_stem(self):
+        paths = {closure_path(os.path.join(REPO_PATH, name))
+                 for name in ('concepts.json', 'concepts.jsonl', 'concepts.db', 'music-theory-concepts.db')}
+        self.assertEqual(len(paths), 4)
+        self.assertNotIn(os.path.join(REPO_PATH, 'music-theory-concepts.closure.json'), paths)
+
+    def test_json_and_jsonl_keep_separate_closures(self):
+        with open(os.path.join(REPO_PATH, 'music-theory-concepts.json')) as f:
+            data = json.load(f)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_file = os.path.join(tmp, 'concepts.json')
+            with open(json_file, 'w') as f:
+                json.dump(data, f)
+            jsonl_file = os.path.join(tmp, 'concepts.jsonl')
+            write_jsonl(data, jsonl_file)
+
+            _, rebuilt = PrerequisiteClosure.load_or_build(json_file)
+            self.assertTrue(rebuilt)
+            _, rebuilt = PrerequisiteClosure.load_or_build(jsonl_file)
+            self.assertTrue(rebuilt)
+            # Neither build replaced the other's cache
+            for source in (json_file, jsonl_file):
+                _, rebuilt = PrerequisiteClosure.load_or_build(source)
+                self.assertFalse(rebuilt)
+
+
+if __name__ == '__main__':
+    unittest.main()
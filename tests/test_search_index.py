@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Search tokens, prefix matches and ranking, in search_index.py and in the
+player's copy of the ranking (index.html).
+
+Usage: python3 -m pytest tests/
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+from concept_record import Concept  # noqa: E402
+from search_index import SearchIndex, tokenize  # noqa: E402
+
+CONCEPTS = [
+    Concept('interval', 'Interval', 'The distance between two pitches', tags=['fundamental']),
+    Concept('compound-interval', 'Compound Intervals', 'Intervals larger than an octave'),
+    Concept('pitch', 'Pitch', 'How high or low a sound is', tags=['fundamental']),
+    Concept('major-triad', 'Major Triad', 'A chord of a root, a major third and a perfect fifth',
+            tags=['harmony', 'chord']),
+    Concept('minor-triad', 'Minor Triad', 'A chord of a root, a minor third and a perfect fifth',
+            tags=['harmony', 'chord']),
+    Concept('octave', 'Octave', 'The interval between a pitch and the one at twice its frequency'),
+]
+
+QUERIES = ['inter', 'interval', 'Intervals', 'maj tri', 'triad', 'chord fifth', 'pitch', 'i', 'oc',
+           'the of', 'fundamental pitch', 'xyz', '']
+
+
+class TokenizeTest(unittest.TestCase):
+
+    def test_words_are_lowercased_without_stopwords(self):
+        self.assertEqual(tokenize('The Major-Triad, and C_sharp 7ths!'),
+                         ['major', 'triad', 'c', 'sharp', '7ths'])
+
+    def test_letters_beyond_ascii(self):
+        self.assertEqual(tokenize('Ündine’s Étude'), ['ündine', 's', 'étude'])
+
+
+class SearchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.index = SearchIndex.from_concepts(CONCEPTS)
+
+    def test_prefix_matches(self):
+        self.assertEqual(set(self.index.search('inter')), {'interval', 'compound-interval', 'octave'})
+        self.assertEqual(self.index.search('oc'), ['octave', 'compound-interval'])
+
+    def test_short_tokens_only_match_whole_words(self):
+        self.assertEqual(self.index.search('i'), [])
+
+    def test_every_token_must_match(self):
+        self.assertEqual(self.index.search('maj tri'), ['major-triad'])
+        self.assertEqual(self.index.search('fundamental pitch'), ['pitch', 'interval'])
+        self.assertEqual(self.index.search('xyz'), [])
+
+    def test_stopwords_alone_match_nothing(self):
+        self.assertEqual(self.index.search('the of'), [])
+
+    def test_ranking(self):
+        # A short name beats a long one, a name beats a description
+        self.assertEqual(self.index.search('interval'), ['interval', 'compound-interval', 'octave'])
+        # Whole words count double: "intervals" is in the compound concept
+        self.assertEqual(self.index.search('intervals')[0], 'compound-interval')
+        # Equal scores keep file order
+        self.assertEqual(self.index.search('triad'), ['major-triad', 'minor-triad'])
+        self.assertEqual(self.index.search('triad', limit=1), ['major-triad'])
+
+    def test_saved_index_gives_the_same_results(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'search.json')
+            self.index.save(path)
+            loaded = SearchIndex.load(path)
+        for query in QUERIES:
+            self.assertEqual(loaded.search(query), self.index.search(query), query)
+
+
+@unittest.skipUnless(shutil.which('node'), "node is not installed")
+class PlayerSearchTest(unittest.TestCase):
+    """The player's searchConcepts() must rank exactly like SearchIndex.search()."""
+
+    def player_search(self, path, queries):
+        with open(os.path.join(REPO_PATH, 'index.html'), encoding='utf-8') as f:
+            html = f.read()
+        source = re.search(r'\n( *async function loadSearchIndex\(\).*?)\n *// Load the facet bitmaps',
+                           html, re.S).group(1)
+        script = f"""
+            let searchIndex = null;
+            const fs = require('fs');
+            const fetch = async () => ({{ok: true, json: async () => JSON.parse(fs.readFileSync({json.dumps(path)}))}});
+            {source}
+            loadSearchIndex().then(() => {{
+                const results = {json.dumps(queries)}.map(query => searchConcepts(query));
+                process.stdout.write(JSON.stringify(results));
+            }});
+        """
+        result = subprocess.run(['node', '-e', script], capture_output=True, text=True, check=True)
+        return json.loads(result.stdout)
+
+    def test_same_results_as_python(self):
+        index = SearchIndex.from_concepts(CONCEPTS)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'search.json')
+            index.save(path)
+            results = self.player_search(path, QUERIES)
+        for query, result in zip(QUERIES, results):
+            self.assertEqual(result, index.search(query), query)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+The streaming manifest patcher must produce the same manifest as the
+tree-based one, and patching twice must change nothing.
+
+Usage: python3 -m pytest tests/
+"""
+
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import update_imscc  # noqa: E402
+from update_imscc import CP, add_visualizations, patch_imscc, scan_manifest, write_patched_manifest  # noqa: E402
+
+CONCEPTS = [
+    {'id': 'pitch', 'name': 'Pitch'},
+    {'id': 'scale', 'name': 'Scale'},
+]
+
+# Text before, between and after child elements, as a hand-edited
+# manifest may have
+MIXED_MANIFEST = f"""<?xml version="1.0" encoding="UTF-8"?>
+<manifest xmlns="{CP[1:-1]}" identifier="m1">
+  <metadata>Course metadata<schema>IMS Common Cartridge</schema>edited by hand<schemaversion>1.1.0</schemaversion>
+    last line
+  </metadata>
+  <organizations>
+    <organization identifier="org_1" structure="rooted-hierarchy">
+      <title>Course</title>
+      <item identifier="s1">Pitch section<title>Pitch</title>
+        <item identifier="i1" identifierref="r1"><title>Lesson: Pitch</title></item>after the lesson
+      </item>
+      <item identifier="s2">
+        <title>Scale</title>
+        <item identifier="i2" identifierref="r2"><title>Lesson: Scale</title></item>
+      </item>
+    </organization>
+  </organizations>
+  <resources>
+    <resource identifier="r1" type="webcontent"><file href="wiki_content/pitch.html"/>note on r1</resource>
+    <resource identifier="r2" type="webcontent"><file href="wiki_content/scale.html"/></resource>
+  </resources>
+</manifest>
+"""
+
+def shape(elem):
+    """Tag, attributes, stripped text and tail, and children of an element."""
+    return (elem.tag, sorted(elem.attrib.items()), (elem.text or '').strip(), (elem.tail or '').strip(),
+            [shape(child) for child in elem])
+
+
+def sequential_ids():
+    counter = itertools.count(1)
+    return lambda: f"gen{next(counter)}"
+
+
+class PatchedManifestTest(unittest.TestCase):
+
+    def tree_patch(self, manifest, links):
+        with mock.patch.object(update_imscc, 'generate_id', sequential_ids()):
+            root = ET.fromstring(manifest)
+            add_visualizations(root, CONCEPTS, links)
+        return root
+
+    def stream_patch(self, manifest, links):
+        with mock.patch.object(update_imscc, 'generate_id', sequential_ids()):
+            hrefs = scan_manifest(io.BytesIO(manifest.encode('utf-8')))
+            out = io.StringIO()
+            write_patched_manifest(io.BytesIO(manifest.encode('utf-8')), out, CONCEPTS, hrefs, links)
+        return ET.fromstring(out.getvalue().encode('utf-8'))
+
+    def assertSamePatch(self, manifest, links=None):
+        with mock.patch('builtins.print'):
+            tree = self.tree_patch(manifest, links)
+            stream = self.stream_patch(manifest, links)
+        self.assertEqual(shape(stream), shape(tree))
+
+    def test_mixed_content(self):
+        self.assertSamePatch(MIXED_MANIFEST)
+
+    def test_mixed_content_is_kept(self):
+        with mock.patch('builtins.print'):
+            root = self.stream_patch(MIXED_MANIFEST, None)
+        metadata = root.find(f'{CP}metadata')
+        self.assertEqual(metadata.text.strip(), 'Course metadata')
+        self.assertEqual(metadata.find(f'{CP}schema').tail.strip(), 'edited by hand')
+        self.assertEqual(metadata.find(f'{CP}schemaversion').tail.strip(), 'last line')
+        section = root.find(f".//{CP}item[@identifier='s1']")
+        self.assertEqual(section.text.strip(), 'Pitch section')
+        self.assertEqual(section.find(f"{CP}item[@identifier='i1']").tail.strip(), 'after the lesson')
+        self.assertEqual(len(section.findall(f'{CP}item')), 2)
+
+    def test_generated_manifest(self):
+        # Patching a second time adds nothing, in both modes
+        with mock.patch('builtins.print'):
+            once = self.tree_patch(MIXED_MANIFEST, None)
+            text = ET.tostring(once, encoding='unicode')
+            self.assertEqual(shape(self.tree_patch(text, None)), shape(once))
+            self.assertEqual(shape(self.stream_patch(text, None)), shape(once))
+        self.assertEqual(len(once.findall(f'.//{CP}item')), 6)
+        self.assertEqual(len(once.findall(f'.//{CP}resource')), 4)
+
+
+class PatchImsccTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        tmp = Path(self.tmp.name)
+        self.concepts_file = tmp / 'concepts.json'
+        self.concepts_file.write_text(json.dumps({'concepts': CONCEPTS}))
+        self.wiki_content = tmp / 'course' / 'wiki_content'
+        self.wiki_content.mkdir(parents=True)
+        (tmp / 'course' / 'web_resources').mkdir()
+        (tmp / 'course' / 'web_resources' / 'visualization.0123456789.css').write_text('body{}')
+        for concept in CONCEPTS:
+            (self.wiki_content / f"{concept['id']}-visualization.html").write_text(
+                '<link rel="stylesheet" href="../web_resources/visualization.0123456789.css">')
+        self.imscc = tmp / 'course.imscc'
+
+    def write_imscc(self):
+        with zipfile.ZipFile(self.imscc, 'w') as zipf:
+            zipf.writestr('imsmanifest.xml', MIXED_MANIFEST)
+            for concept in CONCEPTS:
+                zipf.writestr(f"wiki_content/{concept['id']}.html", concept['name'])
+
+    def manifest(self):
+        with zipfile.ZipFile(self.imscc) as zipf:
+            self.assertIsNone(zipf.testzip())
+            return zipf.read('imsmanifest.xml')
+
+    def test_second_patch_changes_nothing(self):
+        for stream_manifest in (False, True):
+            with self.subTest(stream_manifest=stream_manifest), mock.patch('builtins.print'):
+                self.write_imscc()
+                patch_imscc(self.imscc, self.concepts_file, self.wiki_content,
+                            stream_manifest=stream_manifest)
+                once = self.manifest()
+                root = ET.fromstring(once)
+                # Two visualization items, their two resources and the shared stylesheet
+                self.assertEqual(len(root.findall(f'.//{CP}item')), 6)
+                self.assertEqual(len(root.findall(f'.//{CP}resource')), 5)
+
+                patch_imscc(self.imscc, self.concepts_file, self.wiki_content,
+                            stream_manifest=stream_manifest)
+                self.assertEqual(self.manifest(), once)
+
+
+if __name__ == '__main__':
+    unittest.main()
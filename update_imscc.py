@@ -3,13 +3,23 @@
 Update the IMSCC file to include visualization pages for all concepts.
 """
 
-import json
+import argparse
+import io
 import xml.etree.ElementTree as ET
 import zipfile
 import os
 import shutil
 from pathlib import Path
 
+from concept_cache import load_compiled
+from concept_store import ConceptStore, is_store_path
+from concept_stream import is_jsonl_path, load_jsonl
+from imscc_package import CartridgeWriter, CompressionPolicy, add_compression_arguments, patch_archive
+from web_resources import linked_resources
+from xml_writer import XMLWriter
+
+REPO_PATH = Path(__file__).resolve().parent
+
 # Define namespaces
 NS = {
     '': 'http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1',
@@ -18,6 +28,9 @@ NS = {
     'xsi': 'http://www.w3.org/2001/XMLSchema-instance'
 }
 
+# Qualified-name prefix for elements in the content packaging namespace
+CP = '{' + NS[''] + '}'
+
 # Register namespaces
 for prefix, uri in NS.items():
     if prefix:
@@ -30,66 +43,385 @@ def generate_id():
     import uuid
     return 'i' + uuid.uuid4().hex
 
-def update_manifest(manifest_path, concepts):
+def collect_visualizations(concepts, wiki_content_source):
+    """Find the visualization pages of the concepts and the shared resources they link to
+
+    Returns ({page href: path}, {page href: [resource hrefs]}); the shared
+    resources live next to wiki_content_source, under web_resources/.
+    """
+    pages = {}
+    links = {}
+    for concept in concepts:
+        viz_file = wiki_content_source / f'{concept["id"]}-visualization.html'
+        if viz_file.exists():
+            viz_href = f'wiki_content/{viz_file.name}'
+            pages[viz_href] = viz_file
+            links[viz_href] = linked_resources(viz_file.read_text(encoding='utf-8'))
+    return pages, links
+
+def resource_files(links, wiki_content_source):
+    """Map each shared resource the pages link to onto its file"""
+    hrefs = sorted({href for page_links in links.values() for href in page_links})
+    return {href: wiki_content_source.parent / href for href in hrefs}
+
+def update_manifest(manifest_path, concepts, links=None):
     """Update the manifest XML to include visualization items"""
 
     # Parse the XML
     tree = ET.parse(manifest_path)
-    root = tree.getroot()
+    add_visualizations(tree.getroot(), concepts, links)
+
+    # Write the updated XML
+    tree.write(manifest_path, encoding='utf-8', xml_declaration=True)
+    print(f'\nUpdated manifest file: {manifest_path}')
+
+class ManifestIndex:
+    """Identifier, title and href lookups over a parsed manifest, built in one pass"""
+
+    def __init__(self, org, resources):
+        self.items = {}       # identifier -> item
+        self.parent = {}      # item -> enclosing section (or the organization)
+        self.children = {}    # section -> its child items
+        self.by_ref = {}      # identifierref -> items pointing at that resource
+        self.titles = {}      # title text -> items with that title
+        self.resources = {}   # identifier -> resource
+        self.hrefs = {}       # file href -> identifier of the resource holding it
+
+        stack = [org]
+        while stack:
+            parent = stack.pop()
+            children = parent.findall(f'{CP}item')
+            self.children[parent] = children
+            for item in children:
+                self.add_item(parent, item)
+                stack.append(item)
+
+        for resource in resources.findall(f'{CP}resource'):
+            self.add_resource(resource)
+
+    def add_item(self, parent, item):
+        self.parent[item] = parent
+        self.children.setdefault(item, [])
+        self.items[item.get('identifier')] = item
+        if item.get('identifierref'):
+            self.by_ref.setdefault(item.get('identifierref'), []).append(item)
+        self.titles.setdefault(item.findtext(f'{CP}title'), []).append(item)
+
+    def add_resource(self, resource):
+        self.resources[resource.get('identifier')] = resource
+        for file_elem in resource.findall(f'{CP}file'):
+            self.hrefs[file_elem.get('href')] = resource.get('identifier')
+
+    def find_section(self, concept):
+        """Find the section holding a concept's pages
+
+        The section is located through the item that references the concept's
+        lesson page, so two sections sharing a display name cannot be mixed up;
+        the title is only used when it is unique.
+        """
+        lesson_ref = self.hrefs.get(f'wiki_content/{concept["id"]}.html')
+        for item in self.by_ref.get(lesson_ref, []):
+            return self.parent[item]
+
+        sections = [item for item in self.titles.get(concept['name'], []) if self.children[item]]
+        return sections[0] if len(sections) == 1 else None
+
+def add_visualizations(root, concepts, links=None):
+    """Add a visualization item and resource for each concept to a parsed manifest
+
+    links maps visualization hrefs to the shared resources the page links
+    to (see collect_visualizations); each gets a webcontent resource of its
+    own, listed as a <dependency> of the visualization.
+    """
+    links = links or {}
 
     # Find the organizations and resources sections
-    orgs = root.find('{http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1}organizations')
-    org = orgs.find('{http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1}organization')
-    resources = root.find('{http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1}resources')
+    orgs = root.find(f'{CP}organizations')
+    org = orgs.find(f'{CP}organization')
+    resources = root.find(f'{CP}resources')
+    index = ManifestIndex(org, resources)
+
+    def add_resource(href):
+        resource = ET.SubElement(resources, f'{CP}resource')
+        resource.set('identifier', generate_id())
+        resource.set('type', 'webcontent')
+
+        file_elem = ET.SubElement(resource, f'{CP}file')
+        file_elem.set('href', href)
+        index.add_resource(resource)
+        return resource
+
+    def add_dependencies(resource, hrefs):
+        present = {dep.get('identifierref') for dep in resource.findall(f'{CP}dependency')}
+        for href in hrefs:
+            dependency_id = index.hrefs.get(href) or add_resource(href).get('identifier')
+            if dependency_id not in present:
+                ET.SubElement(resource, f'{CP}dependency').set('identifierref', dependency_id)
+                present.add(dependency_id)
 
     # Process each concept
     for concept in concepts:
         concept_id = concept['id']
         concept_name = concept['name']
 
-        # Find the concept's parent item in the organization
-        # Look for items with title matching the concept name
-        for item in org.findall('.//{http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1}item'):
-            title_elem = item.find('{http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1}title')
-            if title_elem is not None and title_elem.text == concept_name:
-                # Check if visualization already exists
-                viz_exists = False
-                for child_item in item.findall('{http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1}item'):
-                    child_title = child_item.find('{http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1}title')
-                    if child_title is not None and 'Visualization' in child_title.text:
-                        viz_exists = True
-                        break
+        section = index.find_section(concept)
+        if section is None:
+            continue
+
+        # Add the resource unless it exists, bringing its dependencies up to date
+        viz_href = f'wiki_content/{concept_id}-visualization.html'
+        viz_resource_id = index.hrefs.get(viz_href)
+        if viz_resource_id is None:
+            viz_resource_id = add_resource(viz_href).get('identifier')
+        add_dependencies(index.resources[viz_resource_id], links.get(viz_href, []))
+
+        # Check if visualization already exists
+        if any(index.parent[item] is section for item in index.by_ref.get(viz_resource_id, [])):
+            continue
+
+        # Add visualization item
+        viz_item = ET.SubElement(section, f'{CP}item')
+        viz_item.set('identifier', generate_id())
+        viz_item.set('identifierref', viz_resource_id)
+
+        viz_title = ET.SubElement(viz_item, f'{CP}title')
+        viz_title.text = f'Visualization: {concept_name}'
+        index.add_item(section, viz_item)
+        index.children[section].append(viz_item)
+
+        print(f'  Added visualization for: {concept_name}')
+
+def scan_manifest(source):
+    """First streaming pass: map each resource file href to its resource identifier"""
+    hrefs = {}
+    parents = []
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            parents.append(elem)
+            continue
+
+        parents.pop()
+        if elem.tag == f'{CP}file' and parents and parents[-1].tag == f'{CP}resource':
+            hrefs[elem.get('href')] = parents[-1].get('identifier')
+
+        # Detach finished elements so only the open path stays in memory
+        if parents:
+            parents[-1].remove(elem)
+    return hrefs
+
+def write_patched_manifest(source, out, concepts, hrefs, links=None):
+    """Second streaming pass: copy the manifest to out, inserting visualizations
+
+    Elements are written as soon as they end and are then detached, so the
+    whole tree is never held in memory. Sections are recognised by a child
+    item that references the concept's lesson page (via hrefs from
+    scan_manifest); new resources are appended at the end of <resources>.
+    Visualization resources list the shared resources in links (see
+    add_visualizations) as dependencies. Whitespace-only text between
+    elements is replaced by fresh indentation; other text, including text
+    that follows a child element, is kept without its surrounding
+    whitespace.
+    """
+    lesson_refs = {}
+    for concept in concepts:
+        lesson_ref = hrefs.get(f'wiki_content/{concept["id"]}.html')
+        if lesson_ref is not None:
+            lesson_refs[lesson_ref] = concept
+
+    prefixes = {'http://www.w3.org/XML/1998/namespace': 'xml'}
+    pending_ns = {}
+    new_resources = []
+
+    def resource_id(href):
+        if href not in hrefs:
+            hrefs[href] = generate_id()
+            new_resources.append((hrefs[href], href, []))
+        return hrefs[href]
+
+    # Identifiers of the shared resources each visualization depends on,
+    # and the visualizations that already have a resource
+    dependencies = {viz_href: [resource_id(href) for href in page_links]
+                    for viz_href, page_links in (links or {}).items()}
+    viz_hrefs = {hrefs[viz_href]: viz_href for viz_href in dependencies if viz_href in hrefs}
+    writer = XMLWriter(out)
+    writer.declaration()
+
+    def qname(tag):
+        if tag[0] != '{':
+            return tag
+        uri, local = tag[1:].split('}', 1)
+        prefix = prefixes.get(uri, '')
+        return f'{prefix}:{local}' if prefix else local
+
+    def start(entry):
+        if not entry['started']:
+            writer.start(qname(entry['elem'].tag), entry['attrs'])
+            entry['started'] = True
+            write_text(entry['elem'].text)
+
+    def write_text(text):
+        # Surrounding whitespace becomes the writer's indentation, so
+        # patching the output again gives the same bytes
+        if text and text.strip():
+            writer.text(text.strip())
+
+    def write_tail(entry):
+        # A child's tail is only known once the parser has moved past it,
+        # at the next sibling or at the end of the parent
+        if entry['last'] is not None:
+            write_text(entry['last'].tail)
+            entry['last'] = None
+
+    # Each open element: the element, its attributes (with namespace
+    # declarations), whether its start tag is written, its children's refs
+    # and its last finished child, whose tail text is still to be written
+    stack = []
+    for event, data in ET.iterparse(source, events=('start-ns', 'start', 'end')):
+        if event == 'start-ns':
+            prefix, uri = data
+            prefixes[uri] = prefix
+            pending_ns[f'xmlns:{prefix}' if prefix else 'xmlns'] = uri
+            continue
+
+        if event == 'start':
+            # Only elements with children get a separate start tag
+            if stack:
+                start(stack[-1])
+                write_tail(stack[-1])
+            attrs = dict(pending_ns)
+            attrs.update((qname(name), value) for name, value in data.attrib.items())
+            pending_ns = {}
+            stack.append({'elem': data, 'attrs': attrs, 'started': False, 'refs': [], 'last': None})
+            continue
+
+        entry = stack.pop()
+        elem = entry['elem']
+        write_tail(entry)
+
+        if elem.tag in (f'{CP}item', f'{CP}dependency'):
+            if stack and elem.get('identifierref'):
+                stack[-1]['refs'].append(elem.get('identifierref'))
+
+            concept = next((lesson_refs[ref] for ref in entry['refs'] if ref in lesson_refs), None)
+            if concept is not None:
+                viz_href = f'wiki_content/{concept["id"]}-visualization.html'
+                viz_resource_id = hrefs.get(viz_href)
+                if viz_resource_id is None or viz_resource_id not in entry['refs']:
+                    if viz_resource_id is None:
+                        viz_resource_id = hrefs[viz_href] = generate_id()
+                        new_resources.append((viz_resource_id, viz_href,
+                                              dependencies.get(viz_href, [])))
+
+                    start(entry)
+                    writer.start(qname(f'{CP}item'), {'identifier': generate_id(),
+                                                       'identifierref': viz_resource_id})
+                    writer.element(qname(f'{CP}title'), f'Visualization: {concept["name"]}')
+                    writer.end()
+                    print(f'  Added visualization for: {concept["name"]}')
+
+        elif elem.tag == f'{CP}resource' and elem.get('identifier') in viz_hrefs:
+            viz_href = viz_hrefs[elem.get('identifier')]
+            missing = [d for d in dependencies[viz_href] if d not in entry['refs']]
+            if missing:
+                start(entry)
+            for dependency_id in missing:
+                writer.element(qname(f'{CP}dependency'), attrs={'identifierref': dependency_id})
+
+        elif elem.tag == f'{CP}resources' and new_resources:
+            start(entry)
+            for new_id, href, dependency_ids in new_resources:
+                writer.start(qname(f'{CP}resource'), {'identifier': new_id, 'type': 'webcontent'})
+                writer.element(qname(f'{CP}file'), attrs={'href': href})
+                for dependency_id in dependency_ids:
+                    writer.element(qname(f'{CP}dependency'), attrs={'identifierref': dependency_id})
+                writer.end()
+
+        if entry['started']:
+            writer.end()
+        else:
+            text = elem.text if elem.text and elem.text.strip() else None
+            writer.element(qname(elem.tag), text, entry['attrs'])
+
+        # Detach finished elements so only the open path stays in memory
+        if stack:
+            stack[-1]['elem'].remove(elem)
+            stack[-1]['last'] = elem
+
+    writer.close()
+
+def load_concepts(concepts_file):
+    """Load the id and name of every concept, from the compiled concepts cache,
+    a concept database or a JSON Lines file"""
+    if is_store_path(concepts_file):
+        with ConceptStore(concepts_file) as store:
+            concepts = store.select('id', 'name')
+    elif is_jsonl_path(concepts_file):
+        concepts = [{'id': c['id'], 'name': c['name']} for c in load_jsonl(concepts_file)['concepts']]
+    else:
+        concepts = load_compiled(concepts_file).select('id', 'name')
+
+    print(f'\nLoaded {len(concepts)} concepts')
+    return concepts
 
-                if not viz_exists:
-                    # Add visualization item
-                    viz_item_id = generate_id()
-                    viz_resource_id = generate_id()
+def patch_imscc(imscc_path, concepts_file, wiki_content_source, output_path=None,
+                stream_manifest=False, policy=None):
+    """Patch the IMSCC file with visualization pages without extracting it
 
-                    # Create the item element
-                    viz_item = ET.SubElement(item, '{http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1}item')
-                    viz_item.set('identifier', viz_item_id)
-                    viz_item.set('identifierref', viz_resource_id)
+    Only imsmanifest.xml, the *-visualization.html entries and the shared
+    resources they link to are written; every other entry keeps its
+    compressed bytes. With stream_manifest the manifest is patched with
+    iterparse while it is copied into the new archive, instead of being
+    parsed into a tree.
+    """
 
-                    viz_title = ET.SubElement(viz_item, '{http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1}title')
-                    viz_title.text = f'Visualization: {concept_name}'
+    print('=' * 60)
+    print('Patching IMSCC file with visualization pages')
+    print('=' * 60)
 
-                    # Add resource
-                    resource = ET.SubElement(resources, '{http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1}resource')
-                    resource.set('identifier', viz_resource_id)
-                    resource.set('type', 'webcontent')
+    concepts = load_concepts(concepts_file)
 
-                    file_elem = ET.SubElement(resource, '{http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1}file')
-                    file_elem.set('href', f'wiki_content/{concept_id}-visualization.html')
+    # Collect visualization pages
+    print(f'\nCollecting visualization files...')
+    pages, links = collect_visualizations(concepts, wiki_content_source)
+    shared = resource_files(links, wiki_content_source)
+    replacements = {href: path.read_bytes() for href, path in {**pages, **shared}.items()}
 
-                    print(f'  Added visualization for: {concept_name}')
+    print(f'  Found {len(pages)} visualization files and {len(shared)} shared resources')
 
-                break
+    # Update the manifest read straight from the archive
+    print(f'\nUpdating manifest...')
+    with zipfile.ZipFile(imscc_path, 'r') as source:
+        if stream_manifest:
+            with source.open('imsmanifest.xml') as manifest:
+                hrefs = scan_manifest(manifest)
+
+            def write_manifest(dest):
+                out = io.TextIOWrapper(dest, encoding='utf-8')
+                with source.open('imsmanifest.xml') as manifest:
+                    write_patched_manifest(manifest, out, concepts, hrefs, links)
+                out.flush()
+                out.detach()
+
+            replacements['imsmanifest.xml'] = write_manifest
+        else:
+            tree = ET.ElementTree(ET.fromstring(source.read('imsmanifest.xml')))
+            add_visualizations(tree.getroot(), concepts, links)
+
+            manifest = io.BytesIO()
+            tree.write(manifest, encoding='utf-8', xml_declaration=True)
+            replacements['imsmanifest.xml'] = manifest.getvalue()
+
+        # Write only the changed entries; source stays open so the streamed
+        # manifest can still be read while the archive is patched in place
+        print(f'\nPatching {imscc_path}...')
+        patch_archive(imscc_path, replacements, output_path, policy)
 
-    # Write the updated XML
-    tree.write(manifest_path, encoding='utf-8', xml_declaration=True)
-    print(f'\nUpdated manifest file: {manifest_path}')
+    print(f'\n' + '=' * 60)
+    print(f'Successfully patched: {output_path or imscc_path}')
+    print('=' * 60)
 
-def create_updated_imscc():
+def create_updated_imscc(imscc_path, concepts_file, wiki_content_source,
+                         policy=None, workers=1):
     """Create updated IMSCC file with visualization pages"""
 
     print('=' * 60)
@@ -97,18 +429,10 @@ def create_updated_imscc():
     print('=' * 60)
 
     # Paths
-    repo_path = Path('/home/user/pla-2026')
-    imscc_path = repo_path / 'music_theory_course.imscc'
     extract_dir = Path('/tmp/imscc_extract')
-    wiki_content_source = repo_path / 'canvas_music_theory_course' / 'wiki_content'
 
     # Load concepts
-    concepts_file = repo_path / 'music-theory-concepts.json'
-    with open(concepts_file, 'r') as f:
-        data = json.load(f)
-        concepts = data['concepts']
-
-    print(f'\nLoaded {len(concepts)} concepts')
+    concepts = load_concepts(concepts_file)
 
     # Extract existing IMSCC
     print(f'\nExtracting {imscc_path}...')
@@ -119,42 +443,38 @@ def create_updated_imscc():
     with zipfile.ZipFile(imscc_path, 'r') as zip_ref:
         zip_ref.extractall(extract_dir)
 
-    # Copy visualization files to wiki_content
+    # Copy visualization files to wiki_content and the shared resources
+    # they link to to web_resources
     print(f'\nCopying visualization files...')
-    wiki_dest = extract_dir / 'wiki_content'
-    viz_count = 0
-
-    for concept in concepts:
-        concept_id = concept['id']
-        viz_file = wiki_content_source / f'{concept_id}-visualization.html'
+    pages, links = collect_visualizations(concepts, wiki_content_source)
+    shared = resource_files(links, wiki_content_source)
+    for href, path in {**pages, **shared}.items():
+        dest_file = extract_dir / href
+        dest_file.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, dest_file)
 
-        if viz_file.exists():
-            dest_file = wiki_dest / f'{concept_id}-visualization.html'
-            shutil.copy2(viz_file, dest_file)
-            viz_count += 1
-
-    print(f'  Copied {viz_count} visualization files')
+    print(f'  Copied {len(pages)} visualization files and {len(shared)} shared resources')
 
     # Update manifest
     print(f'\nUpdating manifest...')
     manifest_path = extract_dir / 'imsmanifest.xml'
-    update_manifest(manifest_path, concepts)
+    update_manifest(manifest_path, concepts, links)
 
     # Create new IMSCC file
     print(f'\nCreating updated IMSCC file...')
-    new_imscc_path = repo_path / 'music_theory_course.imscc'
+    new_imscc_path = imscc_path
 
     # Remove old file
     if new_imscc_path.exists():
         new_imscc_path.unlink()
 
-    # Create new ZIP
-    with zipfile.ZipFile(new_imscc_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+    # Create new ZIP, compressing entries in parallel
+    with CartridgeWriter(new_imscc_path, policy, workers) as package:
         for root, dirs, files in os.walk(extract_dir):
             for file in files:
                 file_path = Path(root) / file
-                arcname = file_path.relative_to(extract_dir)
-                zipf.write(file_path, arcname)
+                arcname = file_path.relative_to(extract_dir).as_posix()
+                package.add_file(arcname, file_path)
 
     # Verify
     print(f'\nVerifying updated IMSCC...')
@@ -171,5 +491,32 @@ def create_updated_imscc():
     print(f'Successfully updated: {new_imscc_path}')
     print('=' * 60)
 
+def main():
+    parser = argparse.ArgumentParser(
+        description='Add the visualization pages to an existing IMSCC package')
+    parser.add_argument('--imscc', type=Path, default=REPO_PATH / 'music_theory_course.imscc',
+                        help='Package to update')
+    parser.add_argument('--concepts', type=Path, default=REPO_PATH / 'music-theory-concepts.json',
+                        help='Concepts JSON file')
+    parser.add_argument('--wiki-content', type=Path,
+                        default=REPO_PATH / 'canvas_music_theory_course' / 'wiki_content',
+                        help='Directory holding the *-visualization.html pages')
+    parser.add_argument('--patch', action='store_true',
+                        help='Patch the archive without extracting and recompressing it')
+    parser.add_argument('--output', type=Path,
+                        help='With --patch, write the patched package here instead of in place')
+    parser.add_argument('--stream-manifest', action='store_true',
+                        help='With --patch, patch the manifest with iterparse instead of loading the whole tree')
+    add_compression_arguments(parser)
+    args = parser.parse_args()
+
+    policy = CompressionPolicy(args.compression)
+    if args.patch:
+        patch_imscc(args.imscc, args.concepts, args.wiki_content, args.output,
+                    stream_manifest=args.stream_manifest, policy=policy)
+    else:
+        create_updated_imscc(args.imscc, args.concepts, args.wiki_content,
+                             policy, args.compress_workers)
+
 if __name__ == '__main__':
-    create_updated_imscc()
+    main()
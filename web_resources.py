@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Shared stylesheets and scripts for the generated course pages.
+
+Styles and scripts that every page of a kind would otherwise inline are
+written once under web_resources/ and linked from the pages. File names
+carry a hash of the content (lesson.3f2a9c1b0d.css), so browsers and
+Canvas can cache them indefinitely: an edited file gets a new name, and
+the pages linking to it are re-rendered because the name is part of their
+inputs. In imsmanifest.xml every file is a webcontent resource that the
+pages using it list as a <dependency>. With set_minified(True), as the
+builds' --minify option does, the files are served minified (see
+minify.py) under the hash of the minified text.
+"""
+
+import hashlib
+import os
+import re
+
+from minify import minify_css, minify_js
+
+WEB_RESOURCES_DIR = 'web_resources'
+HASH_LENGTH = 10
+
+# The shared resources linked by each kind of page, registered by the
+# modules that render them
+PAGE_RESOURCES = {}
+
+# Whether resources are served minified
+minified = False
+
+LINK = re.compile(r'''(?:href|src)="\.\./(''' + WEB_RESOURCES_DIR + r'''/[^"]+)"''')
+
+
+class WebResource:
+    """A stylesheet or script with a content-hashed file name."""
+
+    def __init__(self, name, text):
+        self.name = name
+        self.source = text
+        self._minified = None
+
+    @property
+    def text(self):
+        """The file's contents, minified while set_minified(True) is in effect."""
+        if not minified:
+            return self.source
+        if self._minified is None:
+            minify = minify_css if self.name.endswith('.css') else minify_js
+            self._minified = minify(self.source)
+        return self._minified
+
+    @property
+    def filename(self):
+        stem, extension = os.path.splitext(self.name)
+        digest = hashlib.sha256(self.text.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+        return f"{WEB_RESOURCES_DIR}/{stem}.{digest}{extension}"
+
+    @property
+    def href(self):
+        """The file's path relative to a page in wiki_content/."""
+        return f"../{self.filename}"
+
+    def tag(self):
+        """The <link> or <script> element that loads the file."""
+        if self.filename.endswith('.css'):
+            return f'<link rel="stylesheet" href="{self.href}">'
+        return f'<script src="{self.href}"></script>'
+
+    def __repr__(self):
+        return f"WebResource({self.filename!r})"
+
+
+def set_minified(enabled):
+    """Serve every resource minified, or as written; call it in every
+    process that renders pages."""
+    global minified
+    minified = enabled
+
+
+def linked_resources(html):
+    """File names of the shared resources a page links to, in order."""
+    return list(dict.fromkeys(LINK.findall(html)))
+
+
+def write_resources(resources, course_dir):
+    """Write the resources under course_dir, skipping files already there."""
+    written = []
+    for resource in resources:
+        path = os.path.join(course_dir, resource.filename)
+        if os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(resource.text)
+        written.append(path)
+    return written
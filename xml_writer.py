@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Incremental XML writers for the cartridge manifest and QTI quizzes.
+
+Elements are written to the output stream as soon as they are produced, so
+memory stays constant per element instead of growing with the document.
+"""
+
+import shutil
+import tempfile
+from xml.sax.saxutils import escape, quoteattr
+
+IMSCC_NAMESPACES = {
+    'xmlns': 'http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1',
+    'xmlns:lom': 'http://ltsc.ieee.org/xsd/imsccv1p1/LOM/resource',
+    'xmlns:lomimscc': 'http://ltsc.ieee.org/xsd/imsccv1p1/LOM/manifest',
+    'xmlns:xsi': 'http://www.w3.org/2001/XMLSchema-instance',
+}
+
+
+class XMLWriter:
+    """Write an XML document element by element to a text stream.
+
+    indent is the string used per nesting level, or None to write the
+    document without any whitespace between elements. level is the nesting
+    depth to start at, for writing fragments that are spliced into a
+    document later.
+    """
+
+    def __init__(self, stream, indent='  ', level=0):
+        self.stream = stream
+        self.indent = indent
+        self.level = level
+        self.open_tags = []
+
+    def _newline(self):
+        if self.indent is not None:
+            self.stream.write('\n' + self.indent * self.level)
+
+    def _open(self, tag, attrs):
+        parts = [tag]
+        for name, value in (attrs or {}).items():
+            parts.append(f"{name}={quoteattr(str(value))}")
+        return ' '.join(parts)
+
+    def declaration(self):
+        self.stream.write('<?xml version="1.0" encoding="UTF-8"?>')
+
+    def start(self, tag, attrs=None):
+        """Open an element that will have child elements."""
+        self._newline()
+        self.stream.write(f"<{self._open(tag, attrs)}>")
+        self.open_tags.append(tag)
+        self.level += 1
+
+    def end(self):
+        """Close the most recently opened element."""
+        tag = self.open_tags.pop()
+        self.level -= 1
+        self._newline()
+        self.stream.write(f"</{tag}>")
+
+    def element(self, tag, text=None, attrs=None):
+        """Write a leaf element with optional text content."""
+        self._newline()
+        if text is None:
+            self.stream.write(f"<{self._open(tag, attrs)}/>")
+        else:
+            self.stream.write(f"<{self._open(tag, attrs)}>{escape(str(text))}</{tag}>")
+
+    def text(self, text):
+        """Write character data inside the most recently opened element."""
+        self.stream.write(escape(str(text)))
+
+    def close(self):
+        """Close every element that is still open."""
+        while self.open_tags:
+            self.end()
+        if self.indent is not None:
+            self.stream.write('\n')
+
+
+class ManifestWriter:
+    """Stream an imsmanifest.xml document one section at a time.
+
+    Organization items are written as sections are added. Their resources
+    belong to a later part of the document, so they are spooled to a
+    temporary file (in memory until it grows large) and copied in on close().
+    """
+
+    SPOOL_SIZE = 1024 * 1024
+
+    def __init__(self, stream, identifier, title, indent='  '):
+        self.writer = XMLWriter(stream, indent)
+        self.resources = tempfile.SpooledTemporaryFile(
+            max_size=self.SPOOL_SIZE, mode='w+', encoding='utf-8')
+        self.resource_writer = XMLWriter(self.resources, indent, level=2)
+
+        w = self.writer
+        w.declaration()
+        w.start('manifest', {'identifier': identifier, **IMSCC_NAMESPACES})
+
+        # Metadata
+        w.start('metadata')
+        w.element('schema', 'IMS Common Cartridge')
+        w.element('schemaversion', '1.1.0')
+        w.start('lom:lom')
+        w.start('lom:general')
+        w.start('lom:title')
+        w.element('lom:string', title)
+        w.end()
+        w.end()
+        w.end()
+        w.end()
+
+        # Organizations (module structure)
+        w.start('organizations')
+        w.start('organization', {'identifier': 'org_1', 'structure': 'rooted-hierarchy'})
+        w.element('title', title)
+
+    def add_section(self, identifier, title, pages):
+        """Add a module with one item per page.
+
+        pages is a list of (item_id, resource_id, title, href) tuples, with
+        an optional fifth element listing the identifiers of the resources
+        the page depends on; a webcontent resource is written for each page.
+        """
+        w = self.writer
+        w.start('item', {'identifier': identifier})
+        w.element('title', title)
+        for item_id, resource_id, page_title, href, *dependencies in pages:
+            w.start('item', {'identifier': item_id, 'identifierref': resource_id})
+            w.element('title', page_title)
+            w.end()
+            self.add_resource(resource_id, href, *dependencies)
+        w.end()
+
+    def add_resource(self, identifier, href, dependencies=()):
+        """Add a webcontent resource with a single file and its dependencies."""
+        r = self.resource_writer
+        r.start('resource', {'identifier': identifier, 'type': 'webcontent'})
+        r.element('file', attrs={'href': href})
+        for dependency in dependencies:
+            r.element('dependency', attrs={'identifierref': dependency})
+        r.end()
+
+    def close(self):
+        w = self.writer
+        w.end()  # organization
+        w.end()  # organizations
+
+        w.start('resources')
+        self.resources.seek(0)
+        shutil.copyfileobj(self.resources, w.stream)
+        self.resources.close()
+        w.end()
+
+        w.close()